@@ -0,0 +1,75 @@
+"""Run the benchmark suite.
+
+Example::
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --only state config --baseline results.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# CladeAgent reads its settings from the environment; benchmarks replace
+# the Claude client and MCP servers, so placeholders are enough
+os.environ.setdefault("CLAUDE_API_KEY", "bench")
+os.environ.setdefault("MCP_SERVERS", "[]")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from clade_mcp_agent.logging import configure_logging  # noqa: E402
+from .harness import compare, format_table, load_baseline, write_report  # noqa: E402
+from .suite import BENCHMARKS  # noqa: E402
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmark groups to run")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON report path")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--servers", type=int, default=4, help="fake MCP servers for the agent fan-out")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="fake MCP server latency")
+    parser.add_argument("--payload-bytes", type=int, default=1024, help="fake MCP tool result size")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of failing tool calls")
+    parser.add_argument("--claude-latency-ms", type=float, default=5.0, help="fake Claude endpoint latency")
+    parser.add_argument("--history", type=int, default=1000, help="state history length")
+    parser.add_argument("--chain-depth", type=int, default=10000, help="depth of the child state chain")
+    parser.add_argument("--history-entries", type=int, default=1_000_000, help="entries in the history benchmark")
+    parser.add_argument("--config-servers", type=int, default=50, help="servers in the benchmarked config")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+async def run(options: argparse.Namespace) -> dict:
+    """Run the selected benchmark groups."""
+    results = {}
+    for name in options.only or BENCHMARKS:
+        print(f"running {name}...", file=sys.stderr)
+        results.update(await BENCHMARKS[name](options))
+    return results
+
+
+def main(argv=None) -> int:
+    """Run benchmarks, write the report and compare with a baseline.
+
+    Returns:
+        1 if a regression beyond the threshold was found, else 0
+    """
+    options = parse_args(argv)
+    configure_logging()
+    results = asyncio.run(run(options))
+    params = {k: v for k, v in vars(options).items() if k not in ("output", "baseline", "only")}
+    write_report(options.output, results, params)
+
+    comparison = None
+    if options.baseline:
+        comparison = compare(results, load_baseline(options.baseline), options.threshold)
+    print(format_table(results, comparison))
+    return 1 if comparison and any(row["regression"] for row in comparison) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
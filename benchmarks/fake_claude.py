@@ -0,0 +1,94 @@
+"""Fake Claude Messages API shared by the tests and benchmarks."""
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from aiohttp import web
+
+
+class FakeClaudeServer:
+    """Local HTTP stand-in for the Anthropic Messages API.
+
+    Replies echo the last user message unless ``reply`` is set, and are
+    streamed as server-sent events, one word per delta, when the request
+    asks for a stream. Queue entries in ``errors`` as (status, headers) to
+    fail the next requests.
+
+    Args:
+        latency: Seconds to wait before answering each request
+        chunk_delay: Seconds to wait before each streamed word
+    """
+
+    def __init__(self, latency: float = 0.0, chunk_delay: float = 0.0):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.url: Optional[str] = None
+        self.requests: List[Dict[str, Any]] = []
+        self.errors: List[Tuple[int, Dict[str, str]]] = []
+        self.reply: Union[str, Callable[[Dict[str, Any]], str], None] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def _reply_text(self, body: Dict[str, Any]) -> str:
+        if self.reply is not None:
+            return self.reply(body) if callable(self.reply) else self.reply
+        return body["messages"][-1]["content"]
+
+    async def handle_messages(self, request: web.Request) -> web.StreamResponse:
+        """Serve POST /v1/messages."""
+        body = await request.json()
+        self.requests.append(body)
+        if self.errors:
+            status, headers = self.errors.pop(0)
+            error = {"type": "error", "error": {"type": "rate_limit_error", "message": "slow down"}}
+            return web.json_response(error, status=status, headers=headers)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        text = self._reply_text(body)
+        usage = {"input_tokens": len(json.dumps(body["messages"])) // 4, "output_tokens": len(text.split())}
+        message = {
+            "id": f"msg_{len(self.requests)}", "type": "message", "role": "assistant",
+            "model": body["model"], "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 0},
+        }
+        if not body.get("stream"):
+            message.update(content=[{"type": "text", "text": text}], stop_reason="end_turn", usage=usage)
+            return web.json_response(message)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(event_type: str, data: Dict[str, Any]) -> None:
+            data["type"] = event_type
+            await response.write(f"event: {event_type}\ndata: {json.dumps(data)}\n\n".encode())
+
+        await send("message_start", {"message": message})
+        await send("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        for i, word in enumerate(text.split(" ")):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            delta = word if i == 0 else " " + word
+            await send("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": delta}})
+        await send("content_block_stop", {"index": 0})
+        await send("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                     "usage": {"output_tokens": usage["output_tokens"]}})
+        await send("message_stop", {})
+        await response.write_eof()
+        return response
+
+    async def start(self) -> str:
+        """Start serving on a free local port and return the base URL."""
+        app = web.Application()
+        app.router.add_post("/v1/messages", self.handle_messages)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
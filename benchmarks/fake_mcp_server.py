@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""Configurable fake MCP server for benchmarks, run over stdio.
+
+Behaviour is tuned through environment variables:
+
+- ``BENCH_LATENCY_MS``: delay before each tool call answers
+- ``BENCH_PAYLOAD_BYTES``: size of each tool result
+- ``BENCH_FAILURE_RATE``: fraction of tool calls that fail, between 0 and 1
+- ``BENCH_SEED``: seed for the failure draws, so runs are reproducible
+"""
+import asyncio
+import os
+import random
+from mcp.server.fastmcp import FastMCP
+
+LATENCY = float(os.environ.get("BENCH_LATENCY_MS", "0")) / 1000
+PAYLOAD = "x" * int(os.environ.get("BENCH_PAYLOAD_BYTES", "64"))
+FAILURE_RATE = float(os.environ.get("BENCH_FAILURE_RATE", "0"))
+rng = random.Random(int(os.environ.get("BENCH_SEED", "0")))
+
+mcp = FastMCP("bench", log_level="WARNING")
+
+
+@mcp.tool()
+async def echo(text: str = "") -> str:
+    """Return the text followed by the configured payload."""
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    if rng.random() < FAILURE_RATE:
+        raise RuntimeError("injected failure")
+    return text + PAYLOAD
+
+
+@mcp.resource("bench://payload")
+def payload() -> str:
+    """Return the configured payload."""
+    return PAYLOAD
+
+
+if __name__ == "__main__":
+    mcp.run()
@@ -0,0 +1,211 @@
+"""Timing, statistics and baseline comparison for benchmarks."""
+import asyncio
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+# Metrics where a higher value in the current run is a regression
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_METRIC = "throughput_per_s"
+# Retained memory, reported by benchmarks that measure it; higher is a regression
+MEMORY_METRIC = "retained_kib"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], wall_time: float, errors: int = 0) -> Dict[str, Any]:
+    """Summarize per-operation latencies in seconds.
+
+    Args:
+        latencies: Duration of each operation
+        wall_time: Total elapsed time of the run
+        errors: Number of operations that raised
+
+    Returns:
+        Percentiles and mean in milliseconds, throughput and counts
+    """
+    values = sorted(latencies)
+    ms = 1000
+    return {
+        "iterations": len(values),
+        "errors": errors,
+        "p50_ms": percentile(values, 50) * ms,
+        "p95_ms": percentile(values, 95) * ms,
+        "p99_ms": percentile(values, 99) * ms,
+        "mean_ms": (sum(values) / len(values) * ms) if values else 0.0,
+        "max_ms": (values[-1] * ms) if values else 0.0,
+        THROUGHPUT_METRIC: len(values) / wall_time if wall_time > 0 else 0.0,
+    }
+
+
+def run_sync(call: Callable[[], Any], iterations: int, warmup: int = 5) -> Dict[str, Any]:
+    """Time a synchronous operation.
+
+    Args:
+        call: The operation to run
+        iterations: Number of timed runs
+        warmup: Number of untimed runs first
+
+    Returns:
+        The summary from ``summarize``
+    """
+    for _ in range(warmup):
+        call()
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - op_started)
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run_async(
+    call: Callable[[], Awaitable[Any]],
+    iterations: int,
+    concurrency: int = 1,
+    warmup: int = 5,
+) -> Dict[str, Any]:
+    """Time an async operation with a fixed number of concurrent callers.
+
+    Args:
+        call: The operation to run
+        iterations: Number of timed runs in total
+        concurrency: Number of runs in flight at once
+        warmup: Number of untimed runs first
+
+    Returns:
+        The summary from ``summarize``, plus the concurrency used
+    """
+    for _ in range(warmup):
+        try:
+            await call()
+        except Exception:
+            pass
+    latencies: List[float] = []
+    errors = 0
+    remaining = iterations
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            op_started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - op_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - started, errors)
+    result["concurrency"] = concurrency
+    return result
+
+
+def measure_memory(build: Callable[[], Any]) -> Dict[str, Any]:
+    """Measure the memory held by what an operation builds.
+
+    Args:
+        build: Operation returning the objects to measure; they are kept
+            alive until the measurement is taken
+
+    Returns:
+        Retained and peak allocation in KiB, and the build time
+    """
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        built = build()
+        elapsed = time.perf_counter() - started
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del built
+    return {MEMORY_METRIC: retained / 1024, "peak_kib": peak / 1024, "build_ms": elapsed * 1000}
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and interpreter the benchmarks ran on."""
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_report(path: Union[str, Path], results: Dict[str, Dict[str, Any]], params: Dict[str, Any]) -> None:
+    """Write results as JSON with stable key order, so reports diff cleanly."""
+    report = {"environment": environment(), "params": params, "results": results}
+    Path(path).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float = 0.2,
+) -> List[Dict[str, Any]]:
+    """Compare results against a baseline report's results.
+
+    Args:
+        results: Current results by benchmark name
+        baseline: Baseline results by benchmark name
+        threshold: Relative change counted as a regression, 0.2 for 20%
+
+    Returns:
+        One row per benchmark and metric present in both, with the
+        relative change and whether it is a regression
+    """
+    rows = []
+    for name in sorted(results.keys() & baseline.keys()):
+        for metric in LATENCY_METRICS + (THROUGHPUT_METRIC, MEMORY_METRIC):
+            old, new = baseline[name].get(metric), results[name].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > threshold if metric != THROUGHPUT_METRIC else change < -threshold
+            rows.append({"benchmark": name, "metric": metric, "baseline": old,
+                         "current": new, "change": change, "regression": worse})
+    return rows
+
+
+def load_baseline(path: Union[str, Path]) -> Dict[str, Dict[str, Any]]:
+    """Read the results section of a previously written report."""
+    return json.loads(Path(path).read_text())["results"]
+
+
+def format_table(results: Dict[str, Dict[str, Any]], comparison: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Render results, and any comparison, as a plain text table."""
+    lines = [f"{'benchmark':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10} {'errors':>7}"]
+    for name, r in results.items():
+        if MEMORY_METRIC in r:
+            lines.append(f"{name:<32} retained {r[MEMORY_METRIC]:.1f} KiB, peak {r['peak_kib']:.1f} KiB, "
+                         f"built in {r['build_ms']:.1f} ms")
+            continue
+        lines.append(f"{name:<32} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+                     f"{r[THROUGHPUT_METRIC]:>10.1f} {r['errors']:>7}")
+    if comparison:
+        lines.append("")
+        for row in comparison:
+            flag = "REGRESSION" if row["regression"] else ""
+            lines.append(f"{row['benchmark']:<32} {row['metric']:<18} {row['change']:>+8.1%} {flag}")
+    return "\n".join(lines)
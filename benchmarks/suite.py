@@ -0,0 +1,271 @@
+"""Benchmark definitions."""
+import json
+import os
+import sys
+import tempfile
+from argparse import Namespace
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict
+
+from clade_mcp_agent.agent import CladeAgent
+from clade_mcp_agent.claude_client import ClaudeClient
+from clade_mcp_agent.config import ServerConfig
+from clade_mcp_agent.config_handler import ConfigHandler
+from clade_mcp_agent.context import ContextCompiler
+from clade_mcp_agent.history import CompactHistoryLog, HistoryLog
+from clade_mcp_agent.mcp_client import MCPClient
+from clade_mcp_agent.metrics import MetricsRegistry, payload_size
+from clade_mcp_agent import serialization
+from clade_mcp_agent.state import ConversationState
+from clade_mcp_agent.state_store import StateStore
+from .fake_claude import FakeClaudeServer
+from .harness import measure_memory, run_async, run_sync
+
+FAKE_SERVER = Path(__file__).with_name("fake_mcp_server.py")
+
+Benchmark = Callable[[Namespace], Awaitable[Dict[str, Dict[str, Any]]]]
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    """Register a benchmark group under a name."""
+    def register(func: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def server_env(options: Namespace) -> Dict[str, str]:
+    """Environment configuring the fake MCP server."""
+    return {
+        "BENCH_LATENCY_MS": str(options.latency_ms),
+        "BENCH_PAYLOAD_BYTES": str(options.payload_bytes),
+        "BENCH_FAILURE_RATE": str(options.failure_rate),
+        "BENCH_SEED": str(options.seed),
+        # The server is started as "python"; make sure it is this interpreter's
+        "PATH": os.pathsep.join([str(Path(sys.executable).parent), os.environ.get("PATH", "")]),
+    }
+
+
+async def call_echo(client: MCPClient, text: str) -> Any:
+    """Call the fake server's echo tool, raising on tool errors so they are counted."""
+    result = await client.call_tool("echo", {"text": text})
+    if getattr(result, "isError", False):
+        raise RuntimeError("tool call failed")
+    return result
+
+
+@benchmark("mcp_client")
+async def bench_mcp_client(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Round trips through MCPClient.call_tool, sequential and concurrent."""
+    client = MCPClient("bench")
+    await client.connect_to_server(str(FAKE_SERVER), server_env(options))
+    try:
+        results = {
+            "mcp_client.call_tool": await run_async(
+                lambda: call_echo(client, "hi"), options.iterations
+            ),
+            "mcp_client.call_tool_concurrent": await run_async(
+                lambda: call_echo(client, "hi"), options.iterations, concurrency=options.concurrency
+            ),
+        }
+    finally:
+        await client.disconnect()
+    return results
+
+
+@benchmark("agent")
+async def bench_agent(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """CladeAgent.process_command fanned out to several fake servers."""
+    claude = FakeClaudeServer(latency=options.claude_latency_ms / 1000)
+    await claude.start()
+    agent = CladeAgent()
+    agent.claude = ClaudeClient(api_key="bench", base_url=claude.url, max_retries=0)
+    # Commands go to the fake server's echo tool through the agent's default server factory
+    config = ServerConfig(host="localhost", server_path=FAKE_SERVER, env_vars=server_env(options),
+                          command_tool="echo", command_argument="text")
+    agent.mcp_clients = {f"server{i}": agent.server_factory(f"server{i}", config) for i in range(options.servers)}
+    try:
+        await agent.start()
+        results = {
+            f"agent.process_command_x{options.servers}": await run_async(
+                lambda: agent.process_command("ping"), options.iterations, concurrency=options.concurrency
+            ),
+        }
+    finally:
+        await agent.stop()
+        await claude.stop()
+    return results
+
+
+@benchmark("state")
+async def bench_state(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Serialization of a conversation state with a long history, in each format."""
+    state = ConversationState(current_task="bench")
+    for i in range(options.history):
+        state.add_message("user" if i % 2 else "assistant", f"message {i} " + "x" * 64)
+    dumped = state.model_dump_json()
+    n = options.history
+    results = {
+        # The previous model_dump_json: build a dict, then encode it with the stdlib
+        f"state.dump_{n}_stdlib_json": run_sync(
+            lambda: json.dumps(state.model_dump(), default=str), options.iterations
+        ),
+        f"state.dump_{n}": run_sync(state.model_dump_json, options.iterations),
+        f"state.load_{n}_stdlib_json": run_sync(
+            lambda: ConversationState(**json.loads(dumped)), options.iterations
+        ),
+        f"state.load_{n}": run_sync(lambda: ConversationState.model_validate_json(dumped), options.iterations),
+    }
+    if serialization.msgpack is not None:
+        packed = serialization.dump_msgpack(state)
+        results[f"state.dump_{n}_msgpack"] = run_sync(
+            lambda: serialization.dump_msgpack(state), options.iterations)
+        results[f"state.load_{n}_msgpack"] = run_sync(
+            lambda: serialization.load_msgpack(packed), options.iterations)
+    return results
+
+
+@benchmark("context")
+async def bench_context(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Compiling a long conversation into Claude context, cold and turn by turn."""
+    state = ConversationState(current_task="bench")
+    for i in range(options.history):
+        state.add_message("user" if i % 2 else "assistant", f"message {i} " + "x" * 64)
+    n = options.history
+
+    def next_turn():
+        state.add_message("user", "next")
+        compiler.compile(state)
+
+    cold = run_sync(lambda: ContextCompiler().compile(state), max(1, options.iterations // 10))
+    compiler = ContextCompiler()
+    compiler.compile(state)
+    return {
+        f"context.compile_{n}_cold": cold,
+        f"context.compile_{n}_next_turn": run_sync(next_turn, options.iterations),
+    }
+
+
+@benchmark("state_store")
+async def bench_state_store(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Persisting one new message: journal append versus a full snapshot."""
+    state = ConversationState(current_task="bench")
+    for i in range(options.history):
+        state.add_message("user" if i % 2 else "assistant", f"message {i} " + "x" * 64)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StateStore(Path(tmp) / "states.db", compact_every=10 ** 9)
+        try:
+            store.save(state)
+            results = {
+                f"state_store.add_message_{options.history}": run_sync(
+                    lambda: state.add_message("user", "hello"), options.iterations
+                ),
+                f"state_store.save_{options.history}": run_sync(lambda: store.save(state), options.iterations),
+                f"state_store.load_{options.history}": run_sync(
+                    lambda: store.load(state.state_id), max(1, options.iterations // 10)
+                ),
+            }
+        finally:
+            store.close()
+    return results
+
+
+@benchmark("state_chain")
+async def bench_state_chain(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Memory held by a deep chain of child states, each adding one history entry."""
+    def build_chain():
+        state = ConversationState(current_task="bench")
+        chain = [state]
+        for i in range(options.chain_depth):
+            state = state.create_child_state(current_task=f"step {i}")
+            state.add_history_entry("step", {"index": i})
+            chain.append(state)
+        return chain
+
+    depth = options.chain_depth
+    return {
+        f"state.child_chain_{depth}": measure_memory(build_chain),
+        f"state.child_chain_{depth}_dump": run_sync(
+            lambda: build_chain()[-1].model_dump_json(), max(1, options.iterations // 100)
+        ),
+    }
+
+
+@benchmark("history")
+async def bench_history(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Memory and scan time of long histories, plain and compact."""
+    n = options.history_entries
+    started = datetime(2024, 1, 1)
+
+    def build(log_class):
+        log = log_class()
+        for i in range(n):
+            log.append({
+                "type": "status_update" if i % 2 else "message",
+                "data": {"status": "running"},
+                "timestamp": (started + timedelta(microseconds=i + 1)).isoformat(),
+            })
+        return log
+
+    results = {}
+    for label, log_class in (("plain", HistoryLog), ("compact", CompactHistoryLog)):
+        results[f"history.{label}_{n}"] = measure_memory(lambda: build(log_class))
+        log = build(log_class)
+        results[f"history.{label}_{n}_scan"] = run_sync(
+            lambda: sum(1 for entry in log if entry["type"] == "message"), max(1, options.iterations // 100)
+        )
+        middle = started + timedelta(microseconds=n // 2)
+        log.latest("message")  # build the index outside the timing
+        results[f"history.{label}_{n}_latest"] = run_sync(lambda: log.latest("message"), options.iterations)
+        results[f"history.{label}_{n}_between_100"] = run_sync(
+            lambda: log.between(middle, middle + timedelta(microseconds=100)), options.iterations
+        )
+    return results
+
+
+@benchmark("config")
+async def bench_config(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Loading and validating a config file with many servers."""
+    with tempfile.TemporaryDirectory() as tmp:
+        servers = {}
+        for i in range(options.config_servers):
+            server_file = Path(tmp) / f"server{i}.py"
+            server_file.touch(mode=0o755)
+            servers[f"server{i}"] = {"server_path": str(server_file), "env_vars": {"INDEX": str(i)}}
+        config_path = Path(tmp) / "servers.json"
+        config_path.write_text(json.dumps({"servers": servers}))
+        handler = ConfigHandler()
+        handler.reload_server_configs(config_path)
+        lazy = ConfigHandler(lazy_paths=True)
+        return {
+            f"config.load_server_configs_{options.config_servers}": run_sync(
+                lambda: handler.load_server_configs(config_path), options.iterations
+            ),
+            f"config.load_server_configs_{options.config_servers}_lazy": run_sync(
+                lambda: lazy.load_server_configs(config_path), options.iterations
+            ),
+            "config.reload_unchanged": run_sync(
+                lambda: handler.reload_server_configs(config_path), options.iterations
+            ),
+        }
+
+
+@benchmark("metrics")
+async def bench_metrics(options: Namespace) -> Dict[str, Dict[str, Any]]:
+    """Overhead of recording one request in the metrics registry."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("bench_seconds", "Benchmark latency", ("server", "method", "name"))
+    errors = registry.counter("bench_errors_total", "Benchmark errors", ("server", "method", "error"))
+
+    def record():
+        latency.labels("server0", "call_tool", "echo").observe(0.003)
+        errors.labels("server0", "call_tool", "ToolError").inc()
+
+    # What each MCP request costs on top when metrics_mcp_payloads is on
+    result = {"content": [{"type": "text", "text": "x" * options.payload_bytes}]}
+    return {
+        "metrics.record_request": run_sync(record, options.iterations * 100),
+        "metrics.measure_payload": run_sync(lambda: payload_size(result), options.iterations * 100),
+    }
@@ -1,8 +1,20 @@
 """Main agent implementation coordinating Claude and MCP servers."""
-from typing import List, Dict
-from .config import settings
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Dict, Optional, Union
+from .config import ServerConfig, get_settings
+from .config_handler import ConfigHandler, ConfigLoadError, ServerConfigDiff
+from .batcher import COMMAND_PROMPT, EnhancementBatcher
 from .claude_client import ClaudeClient
+from .completion_cache import CompletionCache
+from .scheduler import ClaudeScheduler
 from .mcp_client import MCPClient
+from .supervisor import ServerSupervisor
+from .state import TaskState
+from .task_executor import SubtaskExecutor
+from .metrics import measure_payloads, start_metrics_server
+from .tracing import span, start_trace
 from .logging import get_logger
 
 logger = get_logger(__name__)
@@ -12,66 +24,433 @@ class CladeAgent:
     
     def __init__(self):
         """Initialize the agent."""
-        self.claude = ClaudeClient()
+        self.settings = get_settings()
+        cache = None
+        if self.settings.claude_cache_enabled:
+            cache = CompletionCache(ttl=self.settings.claude_cache_ttl,
+                                    db_path=self.settings.claude_cache_path)
+        rate_limited = bool(self.settings.claude_requests_per_minute or self.settings.claude_tokens_per_minute)
+        self.claude = ClaudeClient(
+            api_key=self.settings.claude_api_key,
+            model=self.settings.claude_model,
+            max_tokens=self.settings.claude_max_tokens,
+            cache=cache,
+            # The scheduler handles 429s itself when quotas are configured
+            **({"max_retries": 0} if rate_limited else {})
+        )
+        if rate_limited:
+            self.claude = ClaudeScheduler(
+                self.claude,
+                requests_per_minute=self.settings.claude_requests_per_minute,
+                tokens_per_minute=self.settings.claude_tokens_per_minute,
+                max_concurrency=self.settings.claude_max_concurrency
+            )
+        # With the completion cache enabled, enhancement requests are made
+        # deterministic so repeated commands are answered from the cache
+        self._enhance_params = {"temperature": 0} if self.settings.claude_cache_enabled else {}
+        self.enhancer: Optional[EnhancementBatcher] = None
+        if self.settings.claude_batch_size > 1:
+            self.enhancer = EnhancementBatcher(
+                self.claude,
+                max_batch=self.settings.claude_batch_size,
+                max_delay=self.settings.claude_batch_delay,
+                **self._enhance_params
+            )
+        # settings.mcp_servers only holds addresses, not the ServerConfig a
+        # supervisor needs to launch a server; servers that should be restarted
+        # after a crash come from a config file through watch_config
         self.mcp_clients: Dict[str, MCPClient] = {
             server: MCPClient(server)
-            for server in settings.mcp_servers
+            for server in self.settings.mcp_servers
         }
+        self.startup_timings: Dict[str, Dict] = {}
+        self._startup_tasks: Dict[str, asyncio.Task] = {}
+        self._startup: Optional[asyncio.Task] = None
+        self._metrics_server = None
+        self._executor: Optional[SubtaskExecutor] = None
+        # Creates the client of a server started from a config file
+        self.server_factory: Callable[[str, ServerConfig], Any] = ServerSupervisor
+        self._config_watch: Optional[asyncio.Task] = None
     
-    async def start(self):
-        """Start the agent and connect to all MCP servers."""
-        logger.info("Starting Clade Agent")
-        for server, client in self.mcp_clients.items():
+    async def _connect_server(
+        self, server: str, client: MCPClient, semaphore: asyncio.Semaphore
+    ) -> bool:
+        """Connect to a single MCP server and record how long it took.
+        
+        Args:
+            server: Name of the server
+            client: Client to connect
+            semaphore: Semaphore bounding the number of concurrent connections
+        
+        Returns:
+            True if the server connected successfully
+        """
+        async with semaphore:
+            start = time.perf_counter()
             try:
                 await client.connect()
             except Exception as e:
+                self.startup_timings[server] = {
+                    "status": "error",
+                    "duration": time.perf_counter() - start,
+                    "error": str(e)
+                }
                 logger.error("Failed to connect to MCP server",
                            server=server,
                            error=str(e))
+                return False
+            self.startup_timings[server] = {
+                "status": "connected",
+                "duration": time.perf_counter() - start
+            }
+            return True
+    
+    async def _finish_startup(self, tasks: Dict[str, asyncio.Task]) -> None:
+        """Wait for every startup task and report per-server timings."""
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        logger.info("MCP server startup complete",
+                   connected=sum(1 for t in self.startup_timings.values()
+                                 if t["status"] == "connected"),
+                   total=len(tasks),
+                   timings=self.startup_timings)
+    
+    async def start(
+        self,
+        max_concurrency: Optional[int] = None,
+        ready_count: Optional[int] = None,
+    ):
+        """Start the agent and connect to all MCP servers.
+        
+        Servers are connected in parallel, at most ``max_concurrency`` at a
+        time. By default this waits for every server. With ``ready_count``
+        set, it returns as soon as that many servers are connected (or every
+        connection attempt has finished) and the rest keep connecting in the
+        background; use ``wait_until_started`` to wait for them.
+        
+        Args:
+            max_concurrency: Maximum concurrent connections, defaults to
+                settings.mcp_startup_concurrency
+            ready_count: Number of connected servers after which to return
+        """
+        logger.info("Starting Clade Agent")
+        measure_payloads(self.settings.metrics_mcp_payloads)
+        if self.settings.metrics_port is not None and self._metrics_server is None:
+            self._metrics_server = await start_metrics_server(self.settings.metrics_host,
+                                                              self.settings.metrics_port)
+            logger.info("Serving metrics",
+                       host=self.settings.metrics_host,
+                       port=self.settings.metrics_port)
+        if max_concurrency is None:
+            max_concurrency = self.settings.mcp_startup_concurrency
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        self.startup_timings = {}
+        self._startup_tasks = {
+            server: asyncio.create_task(self._connect_server(server, client, semaphore))
+            for server, client in self.mcp_clients.items()
+        }
+        self._startup = asyncio.create_task(self._finish_startup(self._startup_tasks))
+        
+        if ready_count is None or ready_count >= len(self._startup_tasks):
+            await self._startup
+            return
+        
+        connected = 0
+        for next_done in asyncio.as_completed(self._startup_tasks.values()):
+            if await next_done:
+                connected += 1
+            if connected >= ready_count:
+                break
+        logger.info("Clade Agent ready",
+                   connected=connected,
+                   total=len(self._startup_tasks))
+    
+    async def wait_until_started(self) -> Dict[str, Dict]:
+        """Wait for all servers to finish connecting.
+        
+        Returns:
+            Per-server startup status and duration in seconds
+        """
+        if self._startup is not None:
+            await self._startup
+        return self.startup_timings
     
     async def stop(self):
         """Stop the agent and disconnect from all MCP servers."""
         logger.info("Stopping Clade Agent")
+        if self._config_watch is not None:
+            self._config_watch.cancel()
+            await asyncio.gather(self._config_watch, return_exceptions=True)
+            self._config_watch = None
+        pending = [task for task in self._startup_tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        if self._startup is not None:
+            pending.append(self._startup)
+        await asyncio.gather(*pending, return_exceptions=True)
         for client in self.mcp_clients.values():
             await client.disconnect()
+        if self._metrics_server is not None:
+            await self._metrics_server.cleanup()
+            self._metrics_server = None
+    
+    async def _stop_server(self, server: str) -> None:
+        """Disconnect a server and remove it from the agent."""
+        client = self.mcp_clients.pop(server, None)
+        connecting = self._startup_tasks.pop(server, None)
+        if connecting is not None and not connecting.done():
+            connecting.cancel()
+            await asyncio.gather(connecting, return_exceptions=True)
+        if client is None:
+            return
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logger.warning("Error stopping MCP server",
+                         server=server,
+                         error=str(e))
     
-    async def process_command(self, command: str, server: str = None) -> List[Dict]:
+    async def apply_server_diff(self, diff: ServerConfigDiff) -> Dict[str, Dict]:
+        """Start, stop and restart servers to match a config change.
+        
+        Removed servers are stopped, added ones started and changed ones
+        restarted with their new config. Every other server keeps running
+        and serving commands throughout.
+        
+        Args:
+            diff: Per-server changes, as returned by ``ConfigHandler.reload_server_configs``
+        
+        Returns:
+            Startup status and duration of each started server
+        """
+        starting = {**diff.added, **diff.changed}
+        stopping = [name for name in (*diff.removed, *diff.changed, *diff.added) if name in self.mcp_clients]
+        await asyncio.gather(*(self._stop_server(name) for name in stopping))
+        
+        semaphore = asyncio.Semaphore(self.settings.mcp_startup_concurrency)
+        for name, config in starting.items():
+            client = self.mcp_clients[name] = self.server_factory(name, config)
+            # Broadcasts leave the server out until it has connected
+            self._startup_tasks[name] = asyncio.create_task(self._connect_server(name, client, semaphore))
+        await asyncio.gather(*(self._startup_tasks[name] for name in starting))
+        logger.info("Applied server config changes",
+                   added=sorted(diff.added),
+                   removed=sorted(diff.removed),
+                   changed=sorted(diff.changed))
+        return {name: self.startup_timings[name] for name in starting}
+    
+    async def watch_config(
+        self,
+        handler: ConfigHandler,
+        config_path: Optional[Union[str, Path]] = None,
+        interval: Optional[float] = None,
+    ) -> None:
+        """Run the servers of a config file and follow changes to it.
+        
+        The config's servers are started before this returns. After that the
+        files are checked every ``interval`` seconds and each change is
+        applied with ``apply_server_diff``, so only the servers it touches
+        are stopped or started. A change that fails to load is logged and
+        the running servers are kept. ``stop`` ends the watch.
+        
+        Args:
+            handler: Handler loading the config
+            config_path: Overlay config file, as passed to ``ConfigHandler.load_config``
+            interval: Seconds between checks, defaults to settings.mcp_config_poll_interval
+        
+        Raises:
+            ConfigLoadError: If the config cannot be loaded initially
+        """
+        if interval is None:
+            interval = self.settings.mcp_config_poll_interval
+        if self._config_watch is not None:
+            self._config_watch.cancel()
+            await asyncio.gather(self._config_watch, return_exceptions=True)
+        await self._apply_config(handler, config_path)
+        self._config_watch = asyncio.create_task(self._poll_config(handler, config_path, interval))
+    
+    async def _apply_config(self, handler: ConfigHandler, config_path: Optional[Union[str, Path]]) -> None:
+        """Apply a changed config, committing it to the handler only once it is applied."""
+        # Parsing and validating a large config must not stall the event loop
+        diff = await asyncio.to_thread(handler.reload_server_configs, config_path, False)
+        if diff:
+            await self.apply_server_diff(diff)
+        handler.commit_server_configs()
+    
+    async def _poll_config(
+        self, handler: ConfigHandler, config_path: Optional[Union[str, Path]], interval: float
+    ) -> None:
+        """Apply changes to a watched config until cancelled."""
+        failed_signature = None
+        while True:
+            await asyncio.sleep(interval)
+            signature = handler.config_signature(config_path)
+            if signature == failed_signature:
+                continue
+            try:
+                await self._apply_config(handler, config_path)
+            except Exception as e:
+                # Reported once; the change is diffed again from the last
+                # applied config when the files change again
+                failed_signature = signature
+                if isinstance(e, ConfigLoadError):
+                    logger.error("Failed to reload config, keeping the running servers",
+                               error=str(e))
+                else:
+                    logger.error("Failed to apply config change",
+                               error_type=type(e).__name__,
+                               error=str(e))
+    
+    async def _send_to_server(
+        self, server: str, client: MCPClient, command: str, timeout: Optional[float]
+    ) -> Dict:
+        """Send a command to a single server, bounded by a per-server timeout.
+        
+        Args:
+            server: Name of the target server
+            client: Client connected to the server
+            command: The command to send
+            timeout: Seconds to wait for the server, or None to wait indefinitely
+        
+        Returns:
+            A success, error or timeout response entry for the server
+        """
+        with span("agent.send_command", server=server) as hop:
+            result = await self._send_with_timeout(server, client, command, timeout)
+            if hop is not None:
+                hop.set(status=result["status"])
+            return result
+    
+    async def _send_with_timeout(
+        self, server: str, client: MCPClient, command: str, timeout: Optional[float]
+    ) -> Dict:
+        """Send a command to a server and turn failures into response entries."""
+        try:
+            response = await asyncio.wait_for(client.send_command(command), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("MCP server timed out",
+                         server=server,
+                         command=command,
+                         timeout=timeout)
+            return {
+                "server": server,
+                "status": "timeout",
+                "timeout": timeout
+            }
+        except Exception as e:
+            logger.error("Failed to process command",
+                       server=server,
+                       command=command,
+                       error=str(e))
+            return {
+                "server": server,
+                "status": "error",
+                "error": str(e)
+            }
+        return {
+            "server": server,
+            "status": "success",
+            "response": response
+        }
+    
+    async def process_command(
+        self,
+        command: str,
+        server: str = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> List[Dict]:
         """Process a command using Claude and send to MCP servers.
         
+        The command is dispatched to all target servers concurrently. Each
+        server gets at most ``timeout`` seconds, and the whole fan-out is cut
+        off after ``deadline`` seconds. Servers that miss either limit are
+        reported with ``"status": "timeout"``.
+        
         Args:
             command: The command to process
             server: Optional specific server to target, if None sends to all
-            
+            timeout: Per-server timeout in seconds, defaults to settings.mcp_command_timeout
+            deadline: Overall deadline in seconds, defaults to settings.mcp_command_deadline
+        
         Returns:
-            List of responses from MCP servers
+            List of responses from MCP servers, in target order
         """
-        # Get Claude's interpretation/enhancement of the command
-        enhanced_command = await self.claude.get_completion(
-            f"Process this MCP server command: {command}"
-        )
+        if timeout is None:
+            timeout = self.settings.mcp_command_timeout
+        if deadline is None:
+            deadline = self.settings.mcp_command_deadline
         
-        # Send to specified server or all servers
-        responses = []
-        targets = ([self.mcp_clients[server]]
-                  if server else self.mcp_clients.values())
+        # Every hop of the command is recorded as a span of one trace
+        with start_trace("process_command", command=command, target=server or "*"):
+            # Get Claude's interpretation/enhancement of the command, batched
+            # with concurrent commands when micro-batching is enabled
+            with span("agent.enhance"):
+                if self.enhancer is not None:
+                    enhanced_command = await self.enhancer.enhance(command)
+                else:
+                    enhanced_command = await self.claude.get_completion(
+                        COMMAND_PROMPT.format(command=command), **self._enhance_params
+                    )
         
-        for client in targets:
-            try:
-                response = await client.send_command(enhanced_command)
-                responses.append({
-                    "server": client.server_url,
-                    "status": "success",
-                    "response": response
-                })
-            except Exception as e:
-                responses.append({
-                    "server": client.server_url,
-                    "status": "error",
-                    "error": str(e)
-                })
-                logger.error("Failed to process command",
-                           server=client.server_url,
-                           command=enhanced_command,
-                           error=str(e))
+            # Send to specified server or all servers
+            # Servers still connecting in the background are left out of broadcasts
+            targets = ({server: self.mcp_clients[server]}
+                      if server else
+                      {name: client for name, client in self.mcp_clients.items()
+                       if name not in self._startup_tasks or self._startup_tasks[name].done()})
+            tasks = {
+                name: asyncio.create_task(
+                    self._send_to_server(name, client, enhanced_command, timeout)
+                )
+                for name, client in targets.items()
+            }
+            if not tasks:
+                return []
+        
+            _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
         
-        return responses
+            responses = []
+            for name, task in tasks.items():
+                if task in pending:
+                    logger.warning("MCP server missed command deadline",
+                                 server=name,
+                                 command=enhanced_command,
+                                 deadline=deadline)
+                    responses.append({
+                        "server": name,
+                        "status": "timeout",
+                        "timeout": deadline
+                    })
+                else:
+                    responses.append(task.result())
+        
+            return responses
+    
+    async def run_task(self, task: TaskState, fail_fast: bool = False) -> Dict[str, Dict]:
+        """Run a task's subtasks on the MCP servers, overlapping independent ones.
+        
+        Subtasks run in dependency order with at most
+        settings.task_max_concurrency tool calls in flight, and at most
+        settings.task_server_concurrency per server. See ``SubtaskExecutor``.
+        
+        Args:
+            task: The task to run
+            fail_fast: Stop at the first failing subtask
+        
+        Returns:
+            Status and result or error of each subtask run or skipped
+        """
+        if self._executor is None:
+            self._executor = SubtaskExecutor(
+                self.mcp_clients,
+                max_concurrency=self.settings.task_max_concurrency,
+                per_server_concurrency=self.settings.task_server_concurrency,
+                timeout=self.settings.mcp_command_timeout
+            )
+        with start_trace("run_task", task=task.task_name, subtasks=len(task.subtasks)):
+            return await self._executor.run(task, fail_fast=fail_fast)
@@ -0,0 +1,146 @@
+"""Micro-batching of Claude command-enhancement requests."""
+import asyncio
+import json
+from typing import Any, List, Optional, Set, Tuple
+from .claude_client import ClaudeClient
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+COMMAND_PROMPT = "Process this MCP server command: {command}"
+
+BATCH_PROMPT = (
+    "Process each of the following MCP server commands. Reply with only a JSON "
+    "array of strings holding the processed commands, one per input command and "
+    "in the same order.\n{commands}"
+)
+
+
+def parse_batch_reply(reply: str, expected: int) -> Optional[List[str]]:
+    """Extract the answers from a reply to a batched prompt.
+
+    Args:
+        reply: Claude's reply, possibly with text around the JSON array
+        expected: Number of commands in the batch
+
+    Returns:
+        The processed commands in input order, or None if the reply is unusable
+    """
+    start, end = reply.find("["), reply.rfind("]")
+    if start < 0 or end < start:
+        return None
+    try:
+        answers = json.loads(reply[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(answers, list) or len(answers) != expected:
+        return None
+    return [a if isinstance(a, str) else json.dumps(a) for a in answers]
+
+
+class EnhancementBatcher:
+    """Collects concurrent command enhancements into combined Claude requests.
+
+    Requests are held for at most ``max_delay`` seconds, or until
+    ``max_batch`` are waiting, and then sent as one prompt asking for a JSON
+    array of answers. A lone request is sent with the plain single-command
+    prompt. If a combined reply cannot be split back up, the batch falls
+    back to one request per command, so callers always get their own answer.
+
+    A combined request may generate ``max_tokens`` per command it carries,
+    and batches are capped so that stays within ``max_output_tokens``.
+    """
+
+    def __init__(
+        self,
+        claude: ClaudeClient,
+        max_batch: int = 16,
+        max_delay: float = 0.005,
+        max_output_tokens: int = 8192,
+        **params: Any,
+    ):
+        """Initialize the batcher.
+
+        Args:
+            claude: Client, or scheduler, used to send requests
+            max_batch: Maximum number of commands in one request
+            max_delay: Seconds the first command of a batch may wait for others
+            max_output_tokens: Most tokens a combined request may generate
+            **params: Extra request parameters such as temperature; ``max_tokens``
+                applies per command and defaults to the client's
+        """
+        self.claude = claude
+        self.max_tokens = params.pop("max_tokens", claude.max_tokens)
+        self.max_batch = max(1, min(max_batch, max_output_tokens // self.max_tokens))
+        self.max_delay = max_delay
+        self.params = params
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.fallbacks = 0
+
+    async def enhance(self, command: str) -> str:
+        """Get Claude's enhancement of a command, batched with concurrent ones.
+
+        Args:
+            command: The command to enhance
+
+        Returns:
+            The enhanced command
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((command, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send everything collected so far as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(command, future) for command, future in self._pending if not future.done()]
+        self._pending = []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _complete(self, command: str) -> str:
+        """Enhance a single command."""
+        return await self.claude.get_completion(COMMAND_PROMPT.format(command=command),
+                                                max_tokens=self.max_tokens, **self.params)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Send a batch and hand each caller its answer."""
+        commands = [command for command, _ in batch]
+        try:
+            answers = None
+            if len(batch) > 1:
+                self.batches_sent += 1
+                # Every answer needs the room a single request would have had
+                reply = await self.claude.get_completion(
+                    BATCH_PROMPT.format(commands=json.dumps(commands)),
+                    max_tokens=self.max_tokens * len(batch), **self.params
+                )
+                answers = parse_batch_reply(reply, len(batch))
+                if answers is None:
+                    self.fallbacks += 1
+                    logger.warning("Could not split batched command enhancement, retrying individually",
+                                 batch_size=len(batch))
+            if answers is None:
+                answers = await asyncio.gather(*(self._complete(c) for c in commands),
+                                               return_exceptions=True)
+        except Exception as e:
+            answers = [e] * len(batch)
+
+        for (_, future), answer in zip(batch, answers):
+            if future.done():
+                continue
+            if isinstance(answer, BaseException):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
@@ -0,0 +1,197 @@
+"""Registry of MCP server capabilities discovered through list calls."""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+CAPABILITY_KINDS = ("tools", "resources", "prompts")
+
+class CapabilityRegistry:
+    """In-memory registry of server tools, resources and prompts.
+    
+    Entries are keyed by a fingerprint of the server executable (path, mtime,
+    size and content hash) and its environment, so a changed binary or
+    environment never reuses stale results. When a cache path is given the
+    registry is persisted as JSON and reloaded on the next start.
+    
+    ``put`` and ``invalidate`` write the file straight away unless asked
+    not to; code on the event loop batches its changes and calls ``flush``,
+    which writes once, in a thread.
+    """
+    
+    def __init__(self, cache_path: Optional[Union[str, Path]] = None):
+        """Initialize the registry.
+        
+        Args:
+            cache_path: Optional JSON file to persist the registry to
+        """
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._by_server: Dict[str, str] = {}
+        self._file_hashes: Dict[Tuple[str, int, int], str] = {}
+        # Whether there are changes not yet written to the cache file
+        self._dirty = False
+        self._write_lock = threading.Lock()
+        if self.cache_path and self.cache_path.exists():
+            self.load()
+    
+    def _file_hash(self, path: Path, stat: os.stat_result) -> str:
+        """Hash an executable's contents, once per (path, mtime, size)."""
+        stamp = (str(path), stat.st_mtime_ns, stat.st_size)
+        if stamp not in self._file_hashes:
+            digest = hashlib.sha256()
+            with path.open("rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(chunk)
+            self._file_hashes[stamp] = digest.hexdigest()
+        return self._file_hashes[stamp]
+    
+    def fingerprint(self, server_path: Union[str, Path], env: Optional[Dict[str, str]] = None) -> str:
+        """Compute the cache key for a server executable and environment.
+        
+        Args:
+            server_path: Path to the server executable or script
+            env: Environment variables the server is started with
+        
+        Returns:
+            A hex digest identifying this server build and environment
+        """
+        path = Path(server_path).resolve()
+        stat = path.stat()
+        key = {
+            "path": str(path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": self._file_hash(path, stat),
+            "env": sorted((env or {}).items()),
+        }
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+    
+    def get(self, key: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Return the cached capability lists for a fingerprint.
+        
+        Args:
+            key: Fingerprint from ``fingerprint``
+        
+        Returns:
+            Mapping of capability kind to cached items; kinds that are not
+            cached are absent
+        """
+        entry = self._entries.get(key, {})
+        return {kind: entry[kind] for kind in CAPABILITY_KINDS if kind in entry}
+    
+    def put(
+        self,
+        key: str,
+        server_name: Optional[str],
+        capabilities: Dict[str, List[Dict[str, Any]]],
+        save: bool = True,
+    ) -> None:
+        """Store capability lists for a fingerprint.
+        
+        Args:
+            key: Fingerprint from ``fingerprint``
+            server_name: Name used to look the server up later
+            capabilities: Mapping of capability kind to items
+            save: Write the cache file now; otherwise leave it to ``flush``
+        """
+        entry = self._entries.setdefault(key, {})
+        entry.update({k: v for k, v in capabilities.items() if k in CAPABILITY_KINDS})
+        if server_name:
+            entry["server"] = server_name
+            self._by_server[server_name] = key
+        self._dirty = True
+        if save:
+            self.save()
+    
+    def invalidate(self, key: str, kind: Optional[str] = None, save: bool = True) -> None:
+        """Drop cached capabilities for a fingerprint.
+        
+        Args:
+            key: Fingerprint from ``fingerprint``
+            kind: Capability kind to drop, or None to drop all of them
+            save: Write the cache file now; otherwise leave it to ``flush``
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        for k in ([kind] if kind else CAPABILITY_KINDS):
+            entry.pop(k, None)
+        logger.debug("Invalidated cached capabilities",
+                    server=entry.get("server"),
+                    kind=kind or "all")
+        self._dirty = True
+        if save:
+            self.save()
+    
+    def lookup(self, server_name: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Return the cached capabilities of a server by name.
+        
+        Args:
+            server_name: Name the server was registered under
+        
+        Returns:
+            Mapping of capability kind to cached items
+        """
+        key = self._by_server.get(server_name)
+        return self.get(key) if key else {}
+    
+    def find_tool(self, tool_name: str) -> List[str]:
+        """Return the names of servers that expose a tool.
+        
+        Args:
+            tool_name: Name of the tool
+        
+        Returns:
+            Names of servers whose cached tool list contains the tool
+        """
+        return [
+            server for server, key in self._by_server.items()
+            if any(t.get("name") == tool_name for t in self._entries[key].get("tools", []))
+        ]
+    
+    def load(self) -> None:
+        """Load the registry from the cache file."""
+        try:
+            with self.cache_path.open() as f:
+                self._entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable capability cache",
+                         path=str(self.cache_path),
+                         error=str(e))
+            self._entries = {}
+        self._by_server = {
+            entry["server"]: key
+            for key, entry in self._entries.items()
+            if "server" in entry
+        }
+    
+    def _snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy the entries, sharing the item lists, which are replaced rather than modified."""
+        self._dirty = False
+        return {key: dict(entry) for key, entry in self._entries.items()}
+    
+    def _write(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        with self._write_lock:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(entries))
+            os.replace(tmp_path, self.cache_path)
+    
+    def save(self) -> None:
+        """Write the registry to the cache file, if one is configured."""
+        if not self.cache_path:
+            return
+        self._write(self._snapshot())
+    
+    async def flush(self) -> None:
+        """Write unsaved changes to the cache file in a thread, off the event loop."""
+        if not self.cache_path or not self._dirty:
+            return
+        await asyncio.to_thread(self._write, self._snapshot())
@@ -1,29 +1,290 @@
 """Claude API client implementation."""
-from typing import Dict, Any
-from anthropic import Anthropic
+import json
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, AsyncIterator, Optional
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+from .completion_cache import CompletionCache
+from .context import MESSAGE_OVERHEAD, ContextCompiler, estimate_tokens
+from .metrics import (
+    CLAUDE_BYTES_RECEIVED, CLAUDE_BYTES_SENT, CLAUDE_ERRORS, CLAUDE_IN_FLIGHT,
+    CLAUDE_REQUEST_DURATION, CLAUDE_TIME_TO_FIRST_TOKEN, CLAUDE_TOKENS,
+)
+from .state import BaseState
+from .tracing import open_span
+
+DEFAULT_MODEL = 'claude-3-5-sonnet-latest'
+
+# Model of the request being sent, so the transport can label its size
+_sending_model: ContextVar[Optional[str]] = ContextVar('claude_sending_model', default=None)
+
+
+async def _count_sent_bytes(request: httpx.Request) -> None:
+    """Count a request body as the HTTP transport sends it, retries included."""
+    model = _sending_model.get()
+    if model is not None:
+        CLAUDE_BYTES_SENT.labels(model).inc(len(request.content))
+
+
+class CompletionStats:
+    """Latency and throughput of a single Claude call."""
+    
+    def __init__(self, model: str):
+        """Initialize empty stats for a call.
+        
+        Args:
+            model: The model the call was sent to
+        """
+        self.model = model
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached = False
+    
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Seconds from sending the request to the first text delta."""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+    
+    @property
+    def total_time(self) -> Optional[float]:
+        """Seconds from sending the request to the end of the stream."""
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+    
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Output tokens per second, measured from the first token."""
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.output_tokens / elapsed if elapsed > 0 else None
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the stats as a plain dictionary."""
+        return {
+            'model': self.model,
+            'time_to_first_token': self.time_to_first_token,
+            'total_time': self.total_time,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'tokens_per_second': self.tokens_per_second,
+            'cached': self.cached,
+        }
+
+
+class ClaudeStream:
+    """Async iterator over the text deltas of one streamed Claude response.
+    
+    ``stats`` is filled in while the stream is consumed. With a cache, a
+    hit is yielded as a single delta without contacting the API, and a
+    fully consumed response is stored for the next identical request.
+    """
+    
+    def __init__(
+        self,
+        client: AsyncAnthropic,
+        request: Dict[str, Any],
+        cache: Optional[CompletionCache] = None,
+    ):
+        """Initialize the stream without sending the request yet.
+        
+        Args:
+            client: The async Anthropic client
+            request: Keyword arguments for ``messages.create``
+            cache: Optional cache, only used if the request is cacheable
+        """
+        self._client = client
+        self._request = request
+        self._cache = cache if cache is not None and cache.is_cacheable(request) else None
+        self.stats = CompletionStats(request['model'])
+    
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """Send the request and yield text deltas as they arrive."""
+        self.stats = stats = CompletionStats(self._request['model'])
+        if self._cache is None:
+            async for delta in self._stream(stats):
+                yield delta
+            return
+        
+        key = self._cache.make_key(self._request)
+        cached = await self._cache.get(key)
+        if cached is not None:
+            hop = open_span('claude.messages', model=self._request['model'], cached=True)
+            if hop is not None:
+                hop.end()
+            stats.cached = True
+            stats.first_token_at = stats.finished_at = time.perf_counter()
+            yield cached
+            return
+        parts = []
+        async for delta in self._stream(stats):
+            parts.append(delta)
+            yield delta
+        # Only reached when the stream was consumed to the end
+        await self._cache.put(key, ''.join(parts))
+    
+    async def _send(self, model: str) -> Any:
+        """Send the request, letting the transport label its size with the model."""
+        sending = _sending_model.set(model)
+        try:
+            return await self._client.messages.create(stream=True, **self._request)
+        finally:
+            _sending_model.reset(sending)
+    
+    async def _stream(self, stats: CompletionStats) -> AsyncIterator[str]:
+        """Stream the response from the API, recording stats and metrics."""
+        model = self._request['model']
+        # Not made current: the context would leak to the consumer between deltas
+        hop = open_span('claude.messages', model=model)
+        in_flight = CLAUDE_IN_FLIGHT.labels(model)
+        in_flight.inc()
+        received = 0
+        try:
+            stream = await self._send(model)
+            try:
+                async for event in stream:
+                    if event.type == 'message_start':
+                        stats.input_tokens = event.message.usage.input_tokens
+                    elif event.type == 'content_block_delta' and event.delta.type == 'text_delta':
+                        if stats.first_token_at is None:
+                            stats.first_token_at = time.perf_counter()
+                        received += len(event.delta.text.encode())
+                        yield event.delta.text
+                    elif event.type == 'message_delta':
+                        stats.output_tokens = event.usage.output_tokens
+            finally:
+                await stream.close()
+        except Exception as e:
+            CLAUDE_ERRORS.labels(model, type(e).__name__).inc()
+            if hop is not None:
+                hop.end(e)
+            raise
+        finally:
+            stats.finished_at = time.perf_counter()
+            in_flight.dec()
+            self._record(stats, received)
+            if hop is not None:
+                hop.set(input_tokens=stats.input_tokens, output_tokens=stats.output_tokens,
+                        time_to_first_token_ms=(stats.time_to_first_token or 0) * 1000)
+                hop.end()
+    
+    @staticmethod
+    def _record(stats: CompletionStats, received: int) -> None:
+        """Add a finished request to the Claude metrics."""
+        CLAUDE_REQUEST_DURATION.labels(stats.model).observe(stats.total_time)
+        if stats.time_to_first_token is not None:
+            CLAUDE_TIME_TO_FIRST_TOKEN.labels(stats.model).observe(stats.time_to_first_token)
+        CLAUDE_TOKENS.labels(stats.model, 'input').inc(stats.input_tokens)
+        CLAUDE_TOKENS.labels(stats.model, 'output').inc(stats.output_tokens)
+        CLAUDE_BYTES_RECEIVED.labels(stats.model).inc(received)
+    
+    async def text(self) -> str:
+        """Consume the stream and return the full response text."""
+        return ''.join([delta async for delta in self])
 
 
 class ClaudeClient:
     """Client for interacting with Claude API."""
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 1024,
+        cache: Optional[CompletionCache] = None,
+        context_compiler: Optional[ContextCompiler] = None,
+        **client_options: Any,
+    ):
         """Initialize the Claude client.
         
         Args:
             api_key: The Claude API key to use for authentication
+            model: Model used for requests
+            max_tokens: Maximum number of tokens to generate per request
+            cache: Optional cache for replies to requests with temperature 0
+            context_compiler: Renders states for ``process_state``; by default
+                one with the default token budget
+            **client_options: Extra options for ``AsyncAnthropic``, e.g. base_url
         """
-        self.client = Anthropic(api_key=api_key)
+        # Request sizes are counted by the transport, which has the body serialized already
+        http_client = client_options.setdefault('http_client', DefaultAsyncHttpxClient())
+        if _count_sent_bytes not in http_client.event_hooks['request']:
+            http_client.event_hooks['request'].append(_count_sent_bytes)
+        self.client = AsyncAnthropic(api_key=api_key, **client_options)
+        self.model = model
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.context_compiler = context_compiler or ContextCompiler()
+    
+    def _build_request(
+        self, message: str, context: Optional[Dict[str, Any]] = None, **params: Any
+    ) -> Dict[str, Any]:
+        """Build the keyword arguments for a messages request."""
+        request = {
+            'model': self.model,
+            'max_tokens': self.max_tokens,
+            'messages': [{'role': 'user', 'content': message}],
+        }
+        if context:
+            request['system'] = 'Context:\n' + json.dumps(context, default=str, sort_keys=True)
+        request.update(params)
+        return request
     
-    async def process_message(
-        self, message: str, context: Dict[str, Any]
+    def process_message(
+        self, message: str, context: Optional[Dict[str, Any]] = None, **params: Any
+    ) -> ClaudeStream:
+        """Process a message with context through Claude, streaming the reply.
+        
+        Args:
+            message: The message to process
+            context: Additional context for Claude, sent as the system prompt
+            **params: Extra request parameters such as temperature
+        
+        Returns:
+            A stream yielding text deltas as they arrive; its ``stats``
+            carry time-to-first-token and tokens/sec once consumed
+        """
+        return ClaudeStream(self.client, self._build_request(message, context, **params), self.cache)
+    
+    def process_state(self, state: BaseState, message: str, **params: Any) -> ClaudeStream:
+        """Send a message following a state's conversation, streaming the reply.
+        
+        The state is rendered by ``context_compiler`` within its token
+        budget, keeping room for the message.
+        
+        Args:
+            state: The state whose context and history precede the message
+            message: The new user message
+            **params: Extra request parameters such as temperature
+        
+        Returns:
+            A stream yielding text deltas as they arrive
+        """
+        compiled = self.context_compiler.compile(state, reserve_tokens=estimate_tokens(message) + MESSAGE_OVERHEAD)
+        request = self._build_request(message, **params)
+        request['messages'] = compiled.messages + request['messages']
+        if compiled.system:
+            request['system'] = compiled.system
+        return ClaudeStream(self.client, request, self.cache)
+    
+    async def get_completion(
+        self, message: str, context: Optional[Dict[str, Any]] = None, **params: Any
     ) -> str:
-        """Process a message with context through Claude.
+        """Get Claude's full reply to a message.
         
         Args:
             message: The message to process
             context: Additional context for Claude
-            
+            **params: Extra request parameters such as temperature
+        
         Returns:
-            The response from Claude
+            The response text
         """
-        raise NotImplementedError('Message processing not yet implemented')
+        return await self.process_message(message, context, **params).text()
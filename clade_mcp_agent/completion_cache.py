@@ -0,0 +1,157 @@
+"""Cache of deterministic Claude completions."""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+
+class CompletionCache:
+    """Two-tier cache for Claude responses to temperature 0 requests.
+
+    The first tier is an in-memory LRU. The optional second tier is a SQLite
+    database, so cached completions survive restarts. Disk access runs in a
+    worker thread to keep it off the event loop. Both tiers expire entries
+    after ``ttl`` seconds and are bounded in entry count.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 24 * 3600,
+        db_path: Optional[Union[str, Path]] = None,
+        max_db_entries: int = 100_000,
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of completions kept in memory
+            ttl: Seconds a completion stays valid
+            db_path: Optional SQLite database for the on-disk tier
+            max_db_entries: Maximum number of completions kept on disk
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS completions ('
+                'key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS completions_created ON completions(created_at)')
+            self._db.commit()
+            self._db_count = self._db.execute('SELECT COUNT(*) FROM completions').fetchone()[0]
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Hash a request's model, parameters, messages and context.
+
+        Args:
+            request: Keyword arguments of the messages request
+
+        Returns:
+            A hex digest that is equal for equivalent requests
+        """
+        canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def is_cacheable(request: Dict[str, Any]) -> bool:
+        """Return whether a request is deterministic enough to cache."""
+        return request.get('temperature') == 0
+
+    def _remember(self, key: str, text: str, created_at: float) -> None:
+        """Put a completion in the memory tier, evicting the oldest if full."""
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._db_lock:
+            return self._db.execute(
+                'SELECT text, created_at FROM completions WHERE key = ?', (key,)
+            ).fetchone()
+
+    def _db_put(self, key: str, text: str, created_at: float) -> None:
+        with self._db_lock:
+            cursor = self._db.execute(
+                'INSERT OR REPLACE INTO completions (key, text, created_at) VALUES (?, ?, ?)',
+                (key, text, created_at)
+            )
+            self._db_count += cursor.rowcount
+            if self._db_count > self.max_db_entries:
+                # Drop expired rows first, then the oldest ones
+                self._db.execute('DELETE FROM completions WHERE created_at < ?', (time.time() - self.ttl,))
+                excess = self._db.execute('SELECT COUNT(*) FROM completions').fetchone()[0] - self.max_db_entries
+                if excess > 0:
+                    self._db.execute(
+                        'DELETE FROM completions WHERE key IN '
+                        '(SELECT key FROM completions ORDER BY created_at LIMIT ?)', (excess,)
+                    )
+                self._db_count = self._db.execute('SELECT COUNT(*) FROM completions').fetchone()[0]
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached completion.
+
+        Args:
+            key: Key from ``make_key``
+
+        Returns:
+            The cached text, or None on a miss
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and now - entry[1] < self.ttl:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if self._db is not None:
+            row = await asyncio.to_thread(self._db_get, key)
+            if row is not None and now - row[1] < self.ttl:
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, text: str) -> None:
+        """Store a completion in both tiers.
+
+        Args:
+            key: Key from ``make_key``
+            text: The completion text
+        """
+        created_at = time.time()
+        self._remember(key, text, created_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, key, text, created_at)
+
+    def close(self) -> None:
+        """Close the on-disk tier."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit and miss counters."""
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self._memory),
+        }
@@ -1,13 +1,42 @@
 """Configuration management for the Clade MCP Agent."""
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
 from functools import lru_cache
-from pydantic import BaseModel, field_validator, Field, ConfigDict, model_validator
+from pydantic import BaseModel, field_validator, Field, ConfigDict, ValidationInfo, model_validator
 from pydantic_settings import BaseSettings
 import os
 import json
 from pathlib import Path
 import sys
 
+PATH_FIELDS = ("server_path", "config_path", "working_dir")
+
+class PathChecks:
+    """Memoized filesystem checks, shared by the configs validated in one load.
+
+    Large configs often point thousands of servers at a few executables;
+    each distinct path is then checked once instead of once per server.
+    Safe to share between threads.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._exists: Dict[Path, bool] = {}
+        self._executable: Dict[Path, bool] = {}
+
+    def exists(self, path: Path) -> bool:
+        """Return whether a path exists."""
+        found = self._exists.get(path)
+        if found is None:
+            found = self._exists[path] = path.exists()
+        return found
+
+    def executable(self, path: Path) -> bool:
+        """Return whether a path is executable by this process."""
+        found = self._executable.get(path)
+        if found is None:
+            found = self._executable[path] = os.access(path, os.X_OK)
+        return found
+
 class ServerConfig(BaseModel):
     """Configuration for a single MCP server instance."""
     host: str = Field(
@@ -34,6 +63,14 @@ class ServerConfig(BaseModel):
         default_factory=dict,
         description="Environment variables for the server process"
     )
+    command_tool: str = Field(
+        default="process_command",
+        description="Tool that receives the commands sent by the agent"
+    )
+    command_argument: str = Field(
+        default="command",
+        description="Argument of the command tool that holds the command"
+    )
 
     model_config = ConfigDict(
         validate_default=True,
@@ -49,8 +86,8 @@ class ServerConfig(BaseModel):
             raise ValueError("Port number must be between 1 and 65535")
         return v
 
-    def _validate_path(self, path_field: str) -> None:
-        """Validate a path field."""
+    def _resolve_path(self, path_field: str) -> None:
+        """Expand environment variables in a path field and require it to be absolute."""
         path = getattr(self, path_field)
         if path is None:
             return
@@ -63,24 +100,53 @@ class ServerConfig(BaseModel):
         if not path.is_absolute():
             raise ValueError(f"Path must be absolute: {path}")
 
+    def _check_path(self, path_field: str, checks: "PathChecks") -> None:
+        """Check that a resolved path field points at what it should on disk."""
+        path = getattr(self, path_field)
+        if path is None:
+            return
+
         # Validate based on field name
         if path_field == "server_path":
-            if not path.exists():
+            if not checks.exists(path):
                 raise ValueError(f"Server executable not found: {path}")
-            if not os.access(path, os.X_OK):
+            if not checks.executable(path):
                 raise ValueError(f"Server file is not executable: {path}")
-        elif path_field == "config_path" and not path.exists():
+        elif path_field == "config_path" and not checks.exists(path):
             raise ValueError(f"Config file not found: {path}")
-        elif path_field == "working_dir" and not path.exists():
+        elif path_field == "working_dir" and not checks.exists(path):
             raise ValueError(f"Working directory does not exist: {path}")
 
     @model_validator(mode='after')
-    def validate_paths(self) -> 'ServerConfig':
-        """Validate all path fields after initial validation."""
-        for path_field in ['server_path', 'config_path', 'working_dir']:
-            self._validate_path(path_field)
+    def validate_paths(self, info: ValidationInfo) -> 'ServerConfig':
+        """Validate all path fields after initial validation.
+
+        The validation context may carry ``path_checks``, a ``PathChecks``
+        shared by many configs, and ``lazy_paths``, to only expand and check
+        that the paths are absolute here and leave the filesystem checks to
+        ``check_paths``.
+        """
+        context = info.context or {}
+        checks = context.get("path_checks") or PathChecks()
+        for path_field in PATH_FIELDS:
+            self._resolve_path(path_field)
+            if not context.get("lazy_paths"):
+                self._check_path(path_field, checks)
         return self
 
+    def check_paths(self, checks: Optional["PathChecks"] = None) -> None:
+        """Check the path fields on disk, as deferred by lazy validation.
+
+        Args:
+            checks: Cache of filesystem checks to use
+
+        Raises:
+            ValueError: If a path does not exist or the server is not executable
+        """
+        checks = checks or PathChecks()
+        for path_field in PATH_FIELDS:
+            self._check_path(path_field, checks)
+
     def model_dump_json(self, **kwargs: Any) -> str:
         """Convert the model to JSON string, properly handling Path objects."""
         data = self.model_dump()
@@ -92,8 +158,27 @@ class ServerConfig(BaseModel):
 class Settings(BaseSettings):
     """Global settings for the MCP agent."""
     claude_api_key: str
+    claude_model: str = "claude-3-5-sonnet-latest"
+    claude_max_tokens: int = 1024
+    claude_cache_enabled: bool = False
+    claude_cache_path: Optional[str] = None
+    claude_cache_ttl: float = 24 * 3600
+    claude_requests_per_minute: Optional[float] = None
+    claude_tokens_per_minute: Optional[float] = None
+    claude_max_concurrency: int = 8
+    claude_batch_size: int = 1
+    claude_batch_delay: float = 0.005
     mcp_servers: List[str]
     log_level: str = "INFO"
+    mcp_command_timeout: float = 30.0
+    mcp_command_deadline: Optional[float] = 60.0
+    mcp_startup_concurrency: int = 8
+    mcp_config_poll_interval: float = 1.0
+    task_max_concurrency: int = 8
+    task_server_concurrency: int = 4
+    metrics_host: str = "127.0.0.1"
+    metrics_port: Optional[int] = None
+    metrics_mcp_payloads: bool = False
 
     model_config = ConfigDict(
         env_prefix="",
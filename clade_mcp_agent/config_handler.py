@@ -1,27 +1,112 @@
 """Configuration file handling and processing."""
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
-from .config import ServerConfig
+from typing import Any, Dict, List, Optional, Tuple, Union
+from .config import PathChecks, ServerConfig
 from .logging import get_logger
 
 logger = get_logger(__name__)
 
 class ConfigLoadError(Exception):
     """Raised when there is an error loading the configuration."""
-    pass
+    
+    def __init__(self, message: str, errors: Optional[Dict[str, str]] = None):
+        """Initialize the error.
+        
+        Args:
+            message: Description of the error
+            errors: Validation error of each invalid server, by server name
+        """
+        super().__init__(message)
+        self.errors = errors or {}
+
+# Identity of a file's contents: inode, modification time in ns and size
+FileSignature = Tuple[int, int, int]
+
+
+def file_signature(path: Union[str, Path]) -> Optional[FileSignature]:
+    """Return a file's (inode, mtime, size) signature, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+class ServerConfigDiff:
+    """Per-server changes between two sets of server configs."""
+    
+    def __init__(
+        self,
+        added: Dict[str, ServerConfig],
+        removed: Dict[str, ServerConfig],
+        changed: Dict[str, ServerConfig],
+    ):
+        """Initialize the diff.
+        
+        Args:
+            added: New servers and their configs
+            removed: Servers that are gone and their old configs
+            changed: Servers whose config changed and their new configs
+        """
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+    
+    @classmethod
+    def between(cls, old: Dict[str, ServerConfig], new: Dict[str, ServerConfig]) -> 'ServerConfigDiff':
+        """Compare two sets of server configs by server name."""
+        return cls(
+            added={name: config for name, config in new.items() if name not in old},
+            removed={name: config for name, config in old.items() if name not in new},
+            changed={name: config for name, config in new.items() if name in old and old[name] != config},
+        )
+    
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+    
+    def __repr__(self) -> str:
+        return (f"ServerConfigDiff(added={sorted(self.added)}, removed={sorted(self.removed)}, "
+                f"changed={sorted(self.changed)})")
 
 class ConfigHandler:
-    """Handles loading and processing of configuration files."""
+    """Handles loading and processing of configuration files.
     
-    def __init__(self, base_config_path: Optional[Union[str, Path]] = None):
+    Parsed JSON files are cached by their (inode, mtime, size) signature, so
+    loading an unchanged file again costs a ``stat`` rather than a parse.
+    ``reload_server_configs`` builds on this to watch a config: it returns
+    what changed per server since the last reload, or None while the files
+    are unchanged.
+    
+    Server configs are validated in bulk: filesystem checks are shared by
+    all servers of a load, servers are validated on a thread pool, and
+    every invalid server is reported at once. With ``lazy_paths`` the
+    checks are left to ``ServerConfig.check_paths`` when a server starts.
+    """
+    
+    def __init__(
+        self,
+        base_config_path: Optional[Union[str, Path]] = None,
+        lazy_paths: bool = False,
+        validation_workers: int = 4,
+    ):
         """Initialize the config handler.
         
         Args:
             base_config_path: Optional path to base config file
+            lazy_paths: Defer checking that server paths exist until the servers start
+            validation_workers: Threads validating server configs, 1 to validate inline
         """
         self.base_config_path = Path(base_config_path) if base_config_path else None
+        self.lazy_paths = lazy_paths
+        self.validation_workers = validation_workers
+        # Server configs from the last reload and the file signatures they were loaded from
+        self.server_configs: Dict[str, ServerConfig] = {}
+        self._loaded_signature: Optional[Tuple[Optional[FileSignature], ...]] = None
+        # Signature and configs of a reload waiting for commit_server_configs
+        self._pending: Optional[Tuple[Tuple[Optional[FileSignature], ...], Dict[str, ServerConfig]]] = None
+        self._file_cache: Dict[Path, Tuple[FileSignature, Dict[str, Any]]] = {}
         
     def _substitute_env_vars(self, value: Any) -> Any:
         """Recursively substitute environment variables in strings.
@@ -43,6 +128,9 @@ class ConfigHandler:
     def _load_json_file(self, file_path: Union[str, Path]) -> Dict[str, Any]:
         """Load and parse a JSON configuration file.
         
+        The parsed data is cached until the file's signature changes, so
+        callers must not modify it.
+        
         Args:
             file_path: Path to the JSON file
             
@@ -54,11 +142,17 @@ class ConfigHandler:
         """
         try:
             file_path = Path(file_path)
-            if not file_path.exists():
+            signature = file_signature(file_path)
+            if signature is None:
                 raise ConfigLoadError(f"Config file not found: {file_path}")
+            cached = self._file_cache.get(file_path)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
                 
             with file_path.open() as f:
-                return json.load(f)
+                data = json.load(f)
+            self._file_cache[file_path] = (signature, data)
+            return data
         except json.JSONDecodeError as e:
             raise ConfigLoadError(f"Invalid JSON in config file {file_path}: {e}")
         except Exception as e:
@@ -121,7 +215,7 @@ class ConfigHandler:
                 logger.error("Failed to load overlay config", error=str(e))
                 raise
         
-        # Substitute environment variables
+        # Substitute environment variables; this also copies the cached file data
         result = self._substitute_env_vars(result)
         
         return result
@@ -136,26 +230,113 @@ class ConfigHandler:
             Dictionary of server name to validated ServerConfig objects
             
         Raises:
-            ConfigLoadError: If there is an error loading or validating configs
+            ConfigLoadError: If there is an error loading or validating configs;
+                its ``errors`` hold the error of every invalid server
         """
         config_data = self.load_config(config_path)
         
         if "servers" not in config_data:
             raise ConfigLoadError("No 'servers' section in config file")
-            
+        
+        servers = list(config_data["servers"].items())
+        context = {"path_checks": PathChecks(), "lazy_paths": self.lazy_paths}
+        workers = min(self.validation_workers, len(servers))
+        if workers > 1:
+            # One chunk per thread; a task per server would cost more than validating it
+            chunks = [servers[i::workers] for i in range(workers)]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                outcomes = [outcome
+                            for chunk in pool.map(self._validate_servers, chunks, [context] * workers)
+                            for outcome in chunk]
+            # Restore the order of the config file
+            order = {name: i for i, (name, _) in enumerate(servers)}
+            outcomes.sort(key=lambda outcome: order[outcome[0]])
+        else:
+            outcomes = self._validate_servers(servers, context)
+        
         server_configs = {}
-        for server_name, server_data in config_data["servers"].items():
+        errors = {}
+        for server_name, config, error in outcomes:
+            if error is None:
+                server_configs[server_name] = config
+            else:
+                errors[server_name] = error
+        if errors:
+            raise ConfigLoadError(
+                "\n".join(f"Invalid config for server {name}: {error}" for name, error in errors.items()),
+                errors
+            )
+        logger.debug("Loaded server configs", servers=len(server_configs))
+        return server_configs
+
+    def _validate_servers(
+        self, servers: List[Tuple[str, Dict[str, Any]]], context: Dict[str, Any]
+    ) -> List[Tuple[str, Optional[ServerConfig], Optional[str]]]:
+        """Validate server configs, capturing each one's config or error."""
+        outcomes = []
+        for server_name, server_data in servers:
             try:
                 # Add server name if not in config
                 if "host" not in server_data:
                     server_data["host"] = server_name
-                    
-                server_configs[server_name] = ServerConfig(**server_data)
-                logger.debug("Loaded server config", server=server_name)
+                outcomes.append((server_name, ServerConfig.model_validate(server_data, context=context), None))
             except Exception as e:
-                logger.error("Invalid server config", 
+                logger.error("Invalid server config",
                            server=server_name,
                            error=str(e))
-                raise ConfigLoadError(f"Invalid config for server {server_name}: {e}")
-                
-        return server_configs 
+                outcomes.append((server_name, None, str(e)))
+        return outcomes
+
+    def config_signature(self, config_path: Optional[Union[str, Path]] = None) -> Tuple[Optional[FileSignature], ...]:
+        """Return the signatures of the base and overlay config files.
+        
+        Args:
+            config_path: Overlay config file, as passed to ``load_config``
+            
+        Returns:
+            One signature per file, None for a missing file
+        """
+        return (
+            file_signature(self.base_config_path) if self.base_config_path else None,
+            file_signature(config_path) if config_path else None,
+        )
+
+    def reload_server_configs(
+        self, config_path: Optional[Union[str, Path]] = None, commit: bool = True
+    ) -> Optional[ServerConfigDiff]:
+        """Reload the server configs if the config files changed.
+        
+        Changes are detected by the files' (inode, mtime, size) signatures, so
+        an unchanged config costs two ``stat`` calls. Environment variables
+        are only substituted again when a file changes. The first call
+        reports every server as added.
+        
+        Args:
+            config_path: Overlay config file, as passed to ``load_config``
+            commit: Make the new configs the baseline of the next reload
+                right away; with False, that waits for ``commit_server_configs``
+                so a change that fails to apply is diffed again later
+            
+        Returns:
+            The per-server changes since the last committed reload, or None
+            if the files did not change
+            
+        Raises:
+            ConfigLoadError: If the changed config cannot be loaded; the
+                previous server configs are kept
+        """
+        signature = self.config_signature(config_path)
+        if signature == self._loaded_signature:
+            return None
+        server_configs = self.load_server_configs(config_path)
+        diff = ServerConfigDiff.between(self.server_configs, server_configs)
+        self._pending = (signature, server_configs)
+        if commit:
+            self.commit_server_configs()
+        return diff
+    
+    def commit_server_configs(self) -> None:
+        """Make the configs of the last uncommitted reload the baseline of the next one."""
+        if self._pending is not None:
+            self._loaded_signature, self.server_configs = self._pending
+            self._pending = None
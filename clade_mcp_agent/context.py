@@ -0,0 +1,188 @@
+"""Rendering of states into Claude request context under a token budget."""
+import json
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+from .history import HistoryLog
+from .state import BaseState, ConversationState, TaskState
+
+CHARS_PER_TOKEN = 4
+# Tokens for the role and framing of each message
+MESSAGE_OVERHEAD = 4
+DEFAULT_BUDGET = 150_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the tokens in a text at about four characters per token, rounding up."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _to_text(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, default=str, sort_keys=True)
+
+
+class CompiledContext:
+    """A state rendered as a system prompt and a message history."""
+
+    __slots__ = ('system', 'messages', 'tokens', 'dropped')
+
+    def __init__(self, system: str, messages: List[Dict[str, str]], tokens: int, dropped: int):
+        self.system = system
+        self.messages = messages
+        self.tokens = tokens
+        self.dropped = dropped
+
+
+class _Rendered:
+    """Rendered entries of one state, with a running token total."""
+
+    __slots__ = ('source', 'items', 'prefix', 'last')
+
+    def __init__(self, source: Any):
+        self.source = source
+        self.items: List[Any] = []
+        # prefix[i] is the token count of items[:i]
+        self.prefix = [0]
+        # Last rendered entry of a list source, to notice it being replaced
+        self.last: Any = None
+
+    def extended_by(self, source: Any) -> bool:
+        """Return whether ``source`` is the rendered entries followed by any new ones."""
+        count = len(self.items)
+        if source is not self.source or len(source) < count:
+            return False
+        # A history log only grows; a list could have been edited in place
+        return isinstance(source, HistoryLog) or not count or source[count - 1] is self.last
+
+
+class ContextCompiler:
+    """Renders states into the Claude messages format within a token budget.
+
+    A ``ConversationState`` becomes a system prompt with the task, facts and
+    preferences, followed by its conversation as messages. Other states
+    list their history entries in the system prompt. When the entries do not
+    fit, the oldest are dropped, and a conversation is made to start with a
+    user message, so the same state and budget always give the same result.
+
+    Rendered entries are memoized per state along with running token totals.
+    A state whose history only grew since the last call has just its new
+    entries rendered, and the cut-off is found by bisection. The cost of a
+    turn is therefore the new entries plus the window sent, not the whole
+    history. Entries are treated as immutable once appended.
+    """
+
+    def __init__(self, budget_tokens: int = DEFAULT_BUDGET, max_states: int = 256):
+        """Initialize the compiler.
+
+        Args:
+            budget_tokens: Estimated input tokens a compiled context may use
+            max_states: Number of states whose rendering is memoized
+        """
+        self.budget_tokens = budget_tokens
+        self.max_states = max_states
+        self._memo: 'OrderedDict[str, _Rendered]' = OrderedDict()
+        self.rendered_entries = 0
+
+    def compile(self, state: BaseState, reserve_tokens: int = 0) -> CompiledContext:
+        """Render a state within the budget.
+
+        Args:
+            state: The state to render
+            reserve_tokens: Tokens of the budget kept for the rest of the
+                request, such as the new user message
+
+        Returns:
+            The system prompt, the messages before the new user message, the
+            estimated token count and the number of entries left out
+
+        Raises:
+            ValueError: If the state's own fields leave no room within the budget
+        """
+        system = self._render_system(state)
+        if isinstance(state, ConversationState):
+            rendered = self._update(state, state.conversation_history, self._render_message)
+            header = ''
+        else:
+            rendered = self._update(state, state.history, self._render_entry)
+            header = '\n\nRecent activity:' if len(state.history) else ''
+        available = self.budget_tokens - reserve_tokens - estimate_tokens(system + header)
+        if available < 0:
+            raise ValueError(
+                f"State {state.state_id} needs {self.budget_tokens - available} tokens, "
+                f"over the budget of {self.budget_tokens}"
+            )
+        total = rendered.prefix[-1]
+        start = bisect_left(rendered.prefix, total - available)
+        if isinstance(state, ConversationState):
+            while start < len(rendered.items) and rendered.items[start]['role'] != 'user':
+                start += 1
+            messages = rendered.items[start:]
+            tokens = estimate_tokens(system) + total - rendered.prefix[start]
+        else:
+            messages = []
+            if start < len(rendered.items):
+                system += header + ''.join(rendered.items[start:])
+            tokens = estimate_tokens(system)
+        return CompiledContext(system, messages, tokens, start)
+
+    def _update(self, state: BaseState, source: Any, render: Callable[[Any], Tuple[Any, int]]) -> _Rendered:
+        """Return the memoized rendering of a state's entries, rendering only new ones."""
+        rendered = self._memo.get(state.state_id)
+        count = len(rendered.items) if rendered is not None else 0
+        if rendered is None or not rendered.extended_by(source):
+            rendered = _Rendered(source)
+            count = 0
+        self._memo[state.state_id] = rendered
+        self._memo.move_to_end(state.state_id)
+        while len(self._memo) > self.max_states:
+            self._memo.popitem(last=False)
+        if len(source) > count:
+            for entry in source[count:]:
+                item, tokens = render(entry)
+                rendered.items.append(item)
+                rendered.prefix.append(rendered.prefix[-1] + tokens)
+            rendered.last = source[-1] if isinstance(source, list) else None
+            self.rendered_entries += len(source) - count
+        return rendered
+
+    @staticmethod
+    def _render_message(entry: Dict[str, Any]) -> Tuple[Dict[str, str], int]:
+        role = entry.get('role', 'user')
+        content = _to_text(entry.get('content', ''))
+        if role not in ('user', 'assistant'):
+            # Only user and assistant turns exist in the messages format
+            content = f"[{role}] {content}"
+            role = 'user'
+        return {'role': role, 'content': content}, estimate_tokens(content) + MESSAGE_OVERHEAD
+
+    @staticmethod
+    def _render_entry(entry: Dict[str, Any]) -> Tuple[str, int]:
+        line = f"\n{entry.get('timestamp', '')} {entry.get('type', 'entry')}: {_to_text(entry.get('data', {}))}"
+        return line, estimate_tokens(line)
+
+    @staticmethod
+    def _render_system(state: BaseState) -> str:
+        """Render the state's own fields."""
+        lines = []
+        if isinstance(state, ConversationState):
+            lines.append(f"Current task: {state.current_task}")
+            if state.relevant_facts:
+                lines.append('Relevant facts:')
+                lines.extend(f"- {fact}" for fact in state.relevant_facts)
+            if state.user_preferences:
+                lines.append(f"User preferences: {_to_text(state.user_preferences)}")
+        elif isinstance(state, TaskState):
+            lines.append(f"Task: {state.task_name}")
+            lines.append(f"Status: {state.task_status}")
+            if state.task_data:
+                lines.append(f"Task data: {_to_text(state.task_data)}")
+            if state.subtasks:
+                lines.append('Subtasks:')
+                lines.extend(f"- {subtask.get('name')}: {subtask.get('status')}" for subtask in state.subtasks)
+        if state.metadata:
+            lines.append(f"Metadata: {_to_text(state.metadata)}")
+        return '\n'.join(lines)
+
+    def forget(self, state_id: str) -> None:
+        """Drop the memoized rendering of a state."""
+        self._memo.pop(state_id, None)
@@ -0,0 +1,464 @@
+"""Persistent history log shared between parent and child states."""
+import copy
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, overload
+from pydantic_core import core_schema
+
+HistoryEntry = Dict[str, Any]
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+Moment = Union[datetime, str]
+
+
+def moment_to_ns(value: Any) -> Optional[int]:
+    """Convert a datetime or ISO-8601 string to nanoseconds since the epoch.
+
+    Naive values are taken as UTC, like the timestamps states write.
+
+    Returns:
+        The nanoseconds, or None if the value is not a time
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND * 1000
+
+
+class _HistoryIndex:
+    """Positions of one log's own entries by type and by timestamp."""
+
+    __slots__ = ("by_type", "times", "positions")
+
+    def __init__(self):
+        self.by_type: Dict[Any, array] = {}
+        # Timestamps in ascending order, and the position of each
+        self.times = array("q")
+        self.positions = array("q")
+
+    def add(self, position: int, entry: HistoryEntry) -> None:
+        """Index the entry at ``position``."""
+        positions = self.by_type.get(entry.get("type"))
+        if positions is None:
+            positions = self.by_type[entry.get("type")] = array("q")
+        positions.append(position)
+        ns = moment_to_ns(entry.get("timestamp"))
+        if ns is None:
+            return
+        if not self.times or ns >= self.times[-1]:
+            self.times.append(ns)
+            self.positions.append(position)
+        else:
+            # Out of order; rare, as entries are stamped when added
+            at = bisect_right(self.times, ns)
+            self.times.insert(at, ns)
+            self.positions.insert(at, position)
+
+
+class HistoryLog(Sequence):
+    """Append-only sequence of history entries with structural sharing.
+
+    A forked log references the log it was forked from, together with the
+    number of entries visible at fork time, and stores only the entries
+    appended after the fork. Forking is O(1) in time and memory however long
+    the history is, so a chain of child states costs memory proportional to
+    the entries each one adds rather than the square of the chain depth.
+
+    The log reads like a list: indexing, slicing, iteration, ``len`` and
+    equality cover the full history, and pydantic serializes it as a list.
+    Entries are shared with the parent rather than copied, so treat them as
+    immutable once appended.
+
+    Each log keeps its own entries in a list of dicts. Subclasses change the
+    storage by overriding the ``_own_*`` methods; logs with different
+    storage can be mixed in one chain.
+
+    ``by_type``, ``latest`` and ``between`` answer queries from indexes of
+    each log's own entries, built on the first query and updated on every
+    append after that. A lookup costs O(log n) per log in the fork chain
+    plus the entries returned.
+    """
+
+    __slots__ = ("_parent", "_parent_len", "_entries", "_depth", "_index", "_stamped")
+
+    def __init__(self, entries: Iterable[HistoryEntry] = ()):
+        """Initialize a log that owns all of its entries.
+
+        Args:
+            entries: Initial entries
+        """
+        self._parent: Optional[HistoryLog] = None
+        self._parent_len = 0
+        self._depth = 0
+        self._index: Optional[_HistoryIndex] = None
+        # Whether every own entry is known to have a timestamp
+        self._stamped = False
+        self._init_storage(entries)
+
+    def _init_storage(self, entries: Iterable[HistoryEntry]) -> None:
+        self._entries: List[HistoryEntry] = list(entries)
+
+    def _own_len(self) -> int:
+        return len(self._entries)
+
+    def _own_get(self, index: int) -> HistoryEntry:
+        return self._entries[index]
+
+    def _own_iter(self, start: int, stop: int) -> Iterator[HistoryEntry]:
+        if start == 0 and stop == len(self._entries):
+            return iter(self._entries)
+        return islice(self._entries, start, stop)
+
+    def own_entries(self) -> List[HistoryEntry]:
+        """Return the entries appended to this log since it was forked."""
+        return self._entries
+
+    def _own_append(self, entry: HistoryEntry) -> None:
+        self._entries.append(entry)
+
+    def append(self, entry: HistoryEntry) -> None:
+        """Add an entry to the end of the log."""
+        self._own_append(entry)
+        if "timestamp" not in entry:
+            self._stamped = False
+        if self._index is not None:
+            self._index.add(self._own_len() - 1, entry)
+
+    def _own_index(self) -> _HistoryIndex:
+        if self._index is None:
+            index = _HistoryIndex()
+            for position, entry in enumerate(self._own_iter(0, self._own_len())):
+                index.add(position, entry)
+            self._index = index
+        return self._index
+
+    def by_type(self, entry_type: str) -> List[HistoryEntry]:
+        """Return the entries of a type, oldest first."""
+        result = []
+        for node, count in self._segments():
+            positions = node._own_index().by_type.get(entry_type)
+            if positions:
+                result.extend(node._own_get(p) for p in positions[:bisect_left(positions, count)])
+        return result
+
+    def latest(self, entry_type: str) -> Optional[HistoryEntry]:
+        """Return the most recently added entry of a type, or None."""
+        for node, count in reversed(self._segments()):
+            positions = node._own_index().by_type.get(entry_type)
+            if positions:
+                stop = bisect_left(positions, count)
+                if stop:
+                    return node._own_get(positions[stop - 1])
+        return None
+
+    def between(self, start: Optional[Moment] = None, end: Optional[Moment] = None,
+                entry_type: Optional[str] = None) -> List[HistoryEntry]:
+        """Return the entries timestamped from ``start`` up to, not including, ``end``.
+
+        Args:
+            start: Earliest timestamp, or None for no lower bound
+            end: Timestamp to stop before, or None for no upper bound
+            entry_type: Only return entries of this type
+
+        Returns:
+            The entries in timestamp order, ties in the order they were added
+        """
+        low = moment_to_ns(start) if start is not None else None
+        high = moment_to_ns(end) if end is not None else None
+        if (start is not None and low is None) or (end is not None and high is None):
+            raise ValueError(f"Invalid time range: {start!r} to {end!r}")
+        matches = []
+        offset = 0
+        for node, count in self._segments():
+            index = node._own_index()
+            first = bisect_left(index.times, low) if low is not None else 0
+            last = bisect_left(index.times, high) if high is not None else len(index.times)
+            for i in range(first, last):
+                position = index.positions[i]
+                if position < count:
+                    matches.append((index.times[i], offset + position, node, position))
+            offset += count
+        matches.sort(key=lambda match: match[:2])
+        entries = (node._own_get(position) for _, _, node, position in matches)
+        if entry_type is None:
+            return list(entries)
+        return [entry for entry in entries if entry.get("type") == entry_type]
+
+    def stamp_missing(self, timestamp: str) -> None:
+        """Give entries without a timestamp the one given, inherited ones included.
+
+        Segments already stamped are skipped, so stamping a fork of a
+        stamped log only looks at the fork's own entries.
+        """
+        node: Optional[HistoryLog] = self
+        while node is not None and not node._stamped:
+            node._stamp_own(timestamp)
+            node._stamped = True
+            node = node._parent
+
+    def _stamp_own(self, timestamp: str) -> None:
+        for entry in self._entries:
+            if "timestamp" not in entry:
+                entry["timestamp"] = timestamp
+                self._index = None
+
+    def fork(self) -> "HistoryLog":
+        """Return a log of the same kind that starts with this log's current entries.
+
+        Entries appended to either log afterwards are not seen by the other.
+        """
+        child = type(self)()
+        if self._own_len() or self._parent is None:
+            child._parent = self
+            child._parent_len = len(self)
+            child._depth = self._depth + 1
+        else:
+            # Nothing of our own yet: share our parent directly
+            child._parent = self._parent
+            child._parent_len = self._parent_len
+            child._depth = self._depth
+        return child
+
+    copy = fork
+
+    def __copy__(self) -> "HistoryLog":
+        return self.fork()
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "HistoryLog":
+        return type(self)(copy.deepcopy(list(self), memo))
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (type(self), (list(self),))
+
+    @property
+    def depth(self) -> int:
+        """Number of forks between this log and the log that owns its first entries."""
+        return self._depth
+
+    def extend(self, entries: Iterable[HistoryEntry]) -> None:
+        """Add entries to the end of the log."""
+        for entry in entries:
+            self.append(entry)
+
+    def __len__(self) -> int:
+        return self._parent_len + self._own_len()
+
+    def _segments(self) -> List[Tuple["HistoryLog", int]]:
+        """Return (log, visible own entries) for each log in the chain, oldest first."""
+        segments = []
+        node: Optional[HistoryLog] = self
+        limit = len(self)
+        while node is not None:
+            segments.append((node, limit - node._parent_len))
+            limit = node._parent_len
+            node = node._parent
+        segments.reverse()
+        return segments
+
+    def __iter__(self) -> Iterator[HistoryEntry]:
+        return self.iter_from(0)
+
+    def iter_from(self, start: int) -> Iterator[HistoryEntry]:
+        """Iterate over the entries from index ``start`` on, skipping earlier segments whole."""
+        for node, count in self._segments():
+            if start >= count:
+                start -= count
+            else:
+                yield from node._own_iter(start, count)
+                start = 0
+
+    def __reversed__(self) -> Iterator[HistoryEntry]:
+        for node, count in reversed(self._segments()):
+            for i in range(count - 1, -1, -1):
+                yield node._own_get(i)
+
+    def _entry(self, index: int) -> HistoryEntry:
+        node = self
+        while index < node._parent_len:
+            node = node._parent
+        return node._own_get(index - node._parent_len)
+
+    @overload
+    def __getitem__(self, index: int) -> HistoryEntry: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[HistoryEntry]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[HistoryEntry, List[HistoryEntry]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return list(islice(self.iter_from(start), max(0, stop - start)))
+            return [self._entry(i) for i in range(start, stop, step)]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("history index out of range")
+        return self._entry(index)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (HistoryLog, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+    @classmethod
+    def _validate(cls, value: Any) -> "HistoryLog":
+        # A log passed in is forked, so the new model never shares appends with its owner
+        return value.fork() if isinstance(value, HistoryLog) else cls(value)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        entries_schema = handler.generate_schema(List[Dict[str, Any]])
+        from_entries = core_schema.no_info_after_validator_function(cls._validate, entries_schema)
+        return core_schema.json_or_python_schema(
+            json_schema=from_entries,
+            python_schema=core_schema.union_schema([
+                core_schema.no_info_after_validator_function(cls._validate, core_schema.is_instance_schema(HistoryLog)),
+                from_entries,
+            ]),
+            serialization=core_schema.plain_serializer_function_ser_schema(list, return_schema=entries_schema),
+        )
+
+
+# Entry types seen by any compact log; entries store an index into this table
+_TYPE_NAMES: List[str] = []
+_TYPE_IDS: Dict[str, int] = {}
+
+
+def _type_id(name: str) -> int:
+    type_id = _TYPE_IDS.get(name)
+    if type_id is None:
+        type_id = _TYPE_IDS[name] = len(_TYPE_NAMES)
+        _TYPE_NAMES.append(name)
+    return type_id
+
+
+def timestamp_to_ns(value: Any) -> Optional[int]:
+    """Convert an ISO-8601 UTC timestamp as written by ``isoformat()`` to nanoseconds since the epoch.
+
+    Returns:
+        The nanoseconds, or None if the value would not format back to the same string
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None or moment.isoformat() != value:
+        return None
+    return (moment - _EPOCH) // _MICROSECOND * 1000
+
+
+# Last formatted second; history timestamps are mostly close together
+_last_second: Tuple[int, str] = (0, _EPOCH.isoformat())
+
+
+def ns_to_timestamp(ns: int) -> str:
+    """Format nanoseconds since the epoch as an ISO-8601 UTC timestamp."""
+    global _last_second
+    microseconds = ns // 1000
+    seconds = microseconds // 1_000_000
+    cached = _last_second
+    if cached[0] != seconds:
+        cached = _last_second = (seconds, (_EPOCH + timedelta(seconds=seconds)).isoformat())
+    microseconds -= seconds * 1_000_000
+    return "%s.%06d" % (cached[1], microseconds) if microseconds else cached[1]
+
+
+class CompactHistoryLog(HistoryLog):
+    """History log that keeps its own entries in columns instead of dicts.
+
+    Entries shaped like those from ``add_history_entry`` (exactly ``type``,
+    ``data`` and an ``isoformat()`` timestamp) are stored as an interned
+    type id and int64 nanoseconds in arrays, plus a reference to ``data``.
+    That drops the per-entry dict and timestamp string, the bulk of an
+    entry's size when the data is small or shared. Entries are rebuilt as
+    dicts when read, so changing a read entry's top-level keys has no
+    effect; ``data`` is the stored object. Entries of any other shape are
+    kept as they are.
+    """
+
+    __slots__ = ("_types", "_times", "_data", "_raw")
+
+    def _init_storage(self, entries: Iterable[HistoryEntry]) -> None:
+        self._types = array("I")
+        self._times = array("q")
+        self._data: List[Any] = []
+        # Positions of entries kept as given
+        self._raw: Dict[int, HistoryEntry] = {}
+        for entry in entries:
+            self.append(entry)
+
+    def _own_len(self) -> int:
+        return len(self._data)
+
+    def _own_get(self, index: int) -> HistoryEntry:
+        if index < 0:
+            index += len(self._data)
+        if self._raw:
+            raw = self._raw.get(index)
+            if raw is not None:
+                return raw
+        return {
+            "type": _TYPE_NAMES[self._types[index]],
+            "data": self._data[index],
+            "timestamp": ns_to_timestamp(self._times[index]),
+        }
+
+    def _own_iter(self, start: int, stop: int) -> Iterator[HistoryEntry]:
+        names, types, times, data, raw = _TYPE_NAMES, self._types, self._times, self._data, self._raw
+        # ns_to_timestamp inlined, with its own cache of the formatted second
+        second, prefix = _last_second
+        for i in range(start, stop):
+            if raw and i in raw:
+                yield raw[i]
+                continue
+            microseconds = times[i] // 1000
+            if microseconds // 1_000_000 != second:
+                second = microseconds // 1_000_000
+                prefix = (_EPOCH + timedelta(seconds=second)).isoformat()
+            microseconds -= second * 1_000_000
+            yield {
+                "type": names[types[i]],
+                "data": data[i],
+                "timestamp": "%s.%06d" % (prefix, microseconds) if microseconds else prefix,
+            }
+
+    def own_entries(self) -> List[HistoryEntry]:
+        """Return the entries appended to this log since it was forked, rebuilt as dicts."""
+        return list(self._own_iter(0, len(self._data)))
+
+    def _own_append(self, entry: HistoryEntry) -> None:
+        ns = None
+        if type(entry) is dict and len(entry) == 3 and "data" in entry and isinstance(entry.get("type"), str):
+            ns = timestamp_to_ns(entry.get("timestamp"))
+        if ns is None:
+            self._raw[len(self._data)] = entry
+            self._types.append(0)
+            self._times.append(0)
+            self._data.append(None)
+            return
+        self._types.append(_type_id(entry["type"]))
+        self._times.append(ns)
+        self._data.append(entry["data"])
+
+    def _stamp_own(self, timestamp: str) -> None:
+        # Only entries kept as given can lack one
+        for entry in self._raw.values():
+            if "timestamp" not in entry:
+                entry["timestamp"] = timestamp
+                self._index = None
@@ -1,17 +1,180 @@
 """Logging configuration for the Clade MCP Agent."""
+import json
 import logging.handlers
+import queue
 import sys
+import threading
 import structlog
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from .config import get_settings
+from .tracing import current_span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+OVERFLOW_POLICIES = ("drop_new", "drop_old")
+
+class _FlushRequest:
+    """Queue entry asking the writer thread to signal once it gets there."""
+    
+    __slots__ = ("done",)
+    
+    def __init__(self):
+        self.done = threading.Event()
+
+def dumps_json(obj: Any, **kwargs: Any) -> str:
+    """Serialize a log event to compact JSON, with orjson when it is installed."""
+    default = kwargs.get("default", str)
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, default=default, separators=(",", ":"))
+
+class BackgroundLogHandler(logging.Handler):
+    """Hands records to a writer thread so logging never blocks the caller.
+    
+    ``emit`` only puts the record on a bounded queue. The writer thread
+    renders queued records in batches and writes each batch to the target
+    handlers with one write and flush per target, including any file
+    rotation. When the queue is full, the ``drop_new`` policy discards the
+    incoming record and ``drop_old`` discards the oldest queued one; either
+    way ``dropped`` is incremented.
+    """
+    
+    def __init__(
+        self,
+        targets: List[logging.Handler],
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        overflow: str = "drop_new",
+    ):
+        """Initialize the handler and start its writer thread.
+        
+        Args:
+            targets: Handlers the records are written to
+            queue_size: Maximum number of records waiting to be written
+            batch_size: Maximum number of records written at once
+            overflow: What to drop when the queue is full, "drop_new" or "drop_old"
+        """
+        super().__init__()
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        self.targets = targets
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[logging.LogRecord]]" = queue.Queue(queue_size)
+        self._writer = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._writer.start()
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        """Queue a record without blocking."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == "drop_old":
+                try:
+                    self._queue.get_nowait()
+                    self._queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+            self.dropped += 1
+    
+    def _next_batch(self) -> Tuple[List[logging.LogRecord], List["_FlushRequest"], bool]:
+        """Wait for a record, then take up to ``batch_size`` without waiting.
+        
+        Returns:
+            The records, flush requests seen and whether the handler is closing
+        """
+        item = self._queue.get()
+        batch: List[logging.LogRecord] = []
+        flushes: List[_FlushRequest] = []
+        while True:
+            if item is None:
+                return batch, flushes, True
+            if isinstance(item, _FlushRequest):
+                flushes.append(item)
+            else:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, flushes, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch, flushes, False
+    
+    def _run(self) -> None:
+        """Write queued records in batches until closed."""
+        closing = False
+        while not closing:
+            batch, flushes, closing = self._next_batch()
+            if batch:
+                self._write(batch)
+            for request in flushes:
+                request.done.set()
+    
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        """Render a batch once and write it to every target."""
+        lines = []
+        for record in batch:
+            try:
+                lines.append((record, self.format(record)))
+            except Exception:
+                self.handleError(record)
+        for target in self.targets:
+            try:
+                if isinstance(target, logging.StreamHandler):
+                    self._write_stream(target, lines)
+                else:
+                    for record, _ in lines:
+                        target.handle(record)
+            except Exception:
+                self.handleError(batch[0])
+    
+    @staticmethod
+    def _write_stream(target: logging.StreamHandler, lines: List) -> None:
+        """Write rendered lines to a stream or file handler with a single flush."""
+        rotating = isinstance(target, logging.handlers.RotatingFileHandler) and target.maxBytes > 0
+        with target.lock:
+            if getattr(target, "stream", None) is None:
+                target.stream = target._open()
+            for record, line in lines:
+                if record.levelno < target.level:
+                    continue
+                text = line + target.terminator
+                if rotating and target.stream.tell() + len(text) >= target.maxBytes:
+                    target.doRollover()
+                target.stream.write(text)
+            target.stream.flush()
+    
+    def flush(self) -> None:
+        """Wait until everything queued so far has been written."""
+        if self._writer.is_alive():
+            request = _FlushRequest()
+            self._queue.put(request, timeout=5)
+            request.done.wait(timeout=5)
+    
+    def close(self) -> None:
+        """Write the remaining records and stop the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        for target in self.targets:
+            target.close()
+        super().close()
 
 def configure_logging(
     log_file: Optional[Path] = None,
     max_bytes: int = 10 * 1024 * 1024,  # 10MB
     backup_count: int = 5,
     test_mode: bool = False,
-) -> None:
+    background: bool = False,
+    queue_size: int = 10000,
+    batch_size: int = 256,
+    overflow: str = "drop_new",
+) -> Optional[BackgroundLogHandler]:
     """Configure structured logging for the application.
     
     Args:
@@ -19,6 +182,15 @@ def configure_logging(
         max_bytes: Maximum size of each log file before rotation.
         backup_count: Number of backup files to keep.
         test_mode: Whether to configure logging for test environment.
+        background: Whether to render and write records on a background
+            thread, so logging calls never block on I/O (production mode).
+        queue_size: Maximum number of records waiting for the writer thread.
+        batch_size: Maximum number of records the writer thread writes at once.
+        overflow: Policy when the queue is full, "drop_new" or "drop_old".
+    
+    Returns:
+        The background handler, whose ``dropped`` counts discarded records,
+        or None when writing synchronously.
     """
     settings = get_settings()
     
@@ -46,10 +218,17 @@ def configure_logging(
     # Remove any existing handlers to prevent duplicate logging
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+        if isinstance(handler, BackgroundLogHandler):
+            handler.close()
         
-    # Add our handlers
-    for handler in handlers:
-        root_logger.addHandler(handler)
+    # Add our handlers, behind a writer thread in background mode
+    background_handler = None
+    if background:
+        background_handler = BackgroundLogHandler(handlers, queue_size, batch_size, overflow)
+        root_logger.addHandler(background_handler)
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
 
     # Configure structlog
     shared_processors = [
@@ -65,7 +244,16 @@ def configure_logging(
         renderer = structlog.dev.ConsoleRenderer(colors=True)
     else:
         # Use JSON renderer for production
-        renderer = structlog.processors.JSONRenderer()
+        renderer = structlog.processors.JSONRenderer(serializer=dumps_json)
+
+    if background:
+        # Leave rendering to the formatter, which runs on the writer thread
+        formatter = structlog.stdlib.ProcessorFormatter(
+            processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, renderer],
+            foreign_pre_chain=shared_processors,
+        )
+        background_handler.setFormatter(formatter)
+        renderer = structlog.stdlib.ProcessorFormatter.wrap_for_formatter
 
     structlog.configure(
         processors=[
@@ -86,6 +274,8 @@ def configure_logging(
         
     for handler in handlers:
         handler.setFormatter(formatter)
+    
+    return background_handler
 
 def add_context_processor(
     logger: Any,
@@ -94,6 +284,9 @@ def add_context_processor(
 ) -> Dict[str, Any]:
     """Add context information to log events.
     
+    The request and server are taken from the trace context of the current
+    request, carried in contextvars, unless the event already binds them.
+    
     Args:
         logger: The logger instance.
         method_name: The name of the logging method.
@@ -102,13 +295,18 @@ def add_context_processor(
     Returns:
         Updated event dictionary with context.
     """
-    # Add server ID if available in context
-    if hasattr(logger, "server_id"):
-        event_dict["server_id"] = logger.server_id
-        
-    # Add request ID if available in context
-    if hasattr(logger, "request_id"):
-        event_dict["request_id"] = logger.request_id
+    span = current_span()
+    if span is None:
+        return event_dict
+    
+    # Add request ID, the ID of the request's trace
+    event_dict.setdefault("request_id", span.trace_id)
+    event_dict.setdefault("span_id", span.span_id)
+    
+    # Add server ID if the current hop talks to a server
+    server = span.attributes.get("server")
+    if server is not None:
+        event_dict.setdefault("server_id", server)
         
     return event_dict
 
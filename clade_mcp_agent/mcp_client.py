@@ -1,17 +1,53 @@
 """MCP server client implementation."""
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable, Awaitable, AsyncIterator, Iterable, Tuple
+import asyncio
 from contextlib import AsyncExitStack
+from urllib.parse import urlsplit
 import structlog
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
+from .capabilities import CAPABILITY_KINDS, CapabilityRegistry
+from .metrics import MCP_BYTES_RECEIVED, MCP_BYTES_SENT, MCP_ERRORS, RequestTimer, payload_size, payloads_measured
+from .result_cache import ResultCache, canonical_arguments
+from .singleflight import SingleFlight
+from .tracing import span
 
 logger = structlog.get_logger()
 
+LIST_CHANGED_NOTIFICATIONS = {
+    types.ToolListChangedNotification: "tools",
+    types.ResourceListChangedNotification: "resources",
+    types.PromptListChangedNotification: "prompts",
+}
+
+def resource_label(uri: str) -> str:
+    """Return the metric label for a resource: its URI scheme, not the unbounded URI."""
+    return urlsplit(uri).scheme or "resource"
+
 class MCPClient:
     """Client for interacting with MCP servers following the Model Context Protocol."""
     
-    def __init__(self):
-        """Initialize the MCP client."""
+    def __init__(
+        self,
+        server_name: Optional[str] = None,
+        capability_registry: Optional[CapabilityRegistry] = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
+        """Initialize the MCP client.
+        
+        Args:
+            server_name: Optional name identifying the server this client talks to
+            capability_registry: Optional registry used to skip discovery calls
+                for servers whose capabilities are already known
+            result_cache: Optional cache for resources and cacheable tools
+        """
+        self.server_name = server_name
+        self.capability_registry = capability_registry
+        self.result_cache = result_cache
+        self.server_path: Optional[str] = None
+        self._in_flight = SingleFlight()
+        self.capabilities: Dict[str, List[Dict[str, Any]]] = {}
+        self._capability_key: Optional[str] = None
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
         self.stdio = None
@@ -26,6 +62,7 @@ class MCPClient:
         """
         if not server_script_path.endswith('.py'):
             raise ValueError("Server script must be a .py file")
+        self.server_path = server_script_path
             
         server_params = StdioServerParameters(
             command="python",
@@ -38,18 +75,76 @@ class MCPClient:
         self.stdio, self.write = stdio_transport
         
         # Initialize session
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+        self.session = await self.exit_stack.enter_async_context(
+            ClientSession(self.stdio, self.write, message_handler=self._handle_message)
+        )
         await self.session.initialize()
         
-        # List available capabilities
-        tools = await self.session.list_tools()
-        resources = await self.session.list_resources()
-        prompts = await self.session.list_prompts()
+        # List available capabilities, reusing cached results where possible;
+        # hashing the script and writing the registry happen off the event loop
+        if self.capability_registry:
+            self._capability_key = await asyncio.to_thread(
+                self.capability_registry.fingerprint, server_script_path, env
+            )
+        for kind in CAPABILITY_KINDS:
+            await self._discover(kind)
+        if self.capability_registry:
+            await self.capability_registry.flush()
         
         logger.info("Connected to MCP server",
-                   tools=[tool.name for tool in tools.tools],
-                   resources=[r.name for r in resources.resources],
-                   prompts=[p.name for p in prompts.prompts])
+                   tools=[tool["name"] for tool in self.capabilities["tools"]],
+                   resources=[r["name"] for r in self.capabilities["resources"]],
+                   prompts=[p["name"] for p in self.capabilities["prompts"]])
+    
+    async def list_capabilities(self, kind: str) -> List[Dict[str, Any]]:
+        """List the server's tools, resources or prompts.
+        
+        Results come from this client's cache, then the capability registry,
+        and only go over the wire when neither has them.
+        
+        Args:
+            kind: One of "tools", "resources" or "prompts"
+            
+        Returns:
+            The items as JSON-compatible dicts
+        """
+        items = await self._discover(kind)
+        if self.capability_registry:
+            await self.capability_registry.flush()
+        return items
+    
+    async def _discover(self, kind: str) -> List[Dict[str, Any]]:
+        """List capabilities of a kind, leaving registry changes unsaved."""
+        if kind not in CAPABILITY_KINDS:
+            raise ValueError(f"Unknown capability kind: {kind}")
+        if kind in self.capabilities:
+            return self.capabilities[kind]
+        
+        registry = self.capability_registry
+        items = registry.get(self._capability_key).get(kind) if self._capability_key else None
+        if items is None:
+            if not self.session:
+                raise RuntimeError("Not connected to MCP server")
+            result = await self._observed(f"list_{kind}", kind, None, getattr(self.session, f"list_{kind}"))
+            items = [item.model_dump(mode="json") for item in getattr(result, kind)]
+            if self._capability_key:
+                registry.put(self._capability_key, self.server_name, {kind: items}, save=False)
+        
+        self.capabilities[kind] = items
+        return items
+    
+    async def _handle_message(self, message: Any) -> None:
+        """Invalidate cached capabilities when the server reports a change."""
+        kind = LIST_CHANGED_NOTIFICATIONS.get(type(getattr(message, "root", message)))
+        if kind is None:
+            return
+        self.capabilities.pop(kind, None)
+        if self._capability_key:
+            self.capability_registry.invalidate(self._capability_key, kind, save=False)
+            await self.capability_registry.flush()
+        logger.info("MCP server capabilities changed",
+                   server=self.server_name,
+                   kind=kind)
     
     async def disconnect(self):
         """Close the connection to the MCP server."""
@@ -57,8 +152,76 @@ class MCPClient:
         self.session = None
         self.stdio = None
         self.write = None
+        self.capabilities = {}
+        self._capability_key = None
         logger.info("Disconnected from MCP server")
     
+    async def _observed(
+        self,
+        method: str,
+        name: str,
+        arguments: Any,
+        call: Callable[[], Awaitable[Any]],
+        label: Optional[str] = None,
+    ) -> Any:
+        """Make a request on the session, recording a span, latency, errors and sizes.
+        
+        Sizes are only recorded when ``metrics.measure_payloads`` is on.
+        
+        Args:
+            method: Session method, used as a metric label
+            name: Tool, resource or prompt name
+            arguments: Request arguments, counted as bytes sent
+            call: Performs the request
+            label: Metric label for the name, if not the name itself
+            
+        Returns:
+            The request's result
+        """
+        server = self.server_name or self.server_path
+        target = {"tool" if method == "call_tool" else "target": name}
+        with span(f"mcp.{method}", server=server, **target) as hop, RequestTimer(server, method, label or name):
+            result = await call()
+        if payloads_measured():
+            MCP_BYTES_SENT.labels(server).inc(payload_size(arguments))
+            MCP_BYTES_RECEIVED.labels(server).inc(payload_size(result))
+        if getattr(result, "isError", False):
+            MCP_ERRORS.labels(server, method, "ToolError").inc()
+            if hop is not None:
+                hop.error = "ToolError"
+        return result
+    
+    async def _cached_call(
+        self,
+        kind: str,
+        name: str,
+        arguments: Optional[Dict[str, Any]],
+        call: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Serve a call from the result cache, or make it and cache the result.
+        
+        Args:
+            kind: Either "tool" or "resource"
+            name: Tool name or resource path
+            arguments: Call arguments, part of the cache key
+            call: Performs the call on the session
+            
+        Returns:
+            The cached or fresh result
+        """
+        cache = self.result_cache
+        if cache is None or not cache.is_cacheable(kind, name):
+            return await call()
+        
+        key = cache.make_key(self.server_name or self.server_path, kind, name, arguments)
+        found, result = cache.get(key)
+        if found:
+            return result
+        result = await call()
+        if not getattr(result, "isError", False):
+            cache.put(key, result, cache.ttl_for(kind, name))
+        return result
+    
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """Call a tool on the MCP server.
         
@@ -72,12 +235,96 @@ class MCPClient:
         if not self.session:
             raise RuntimeError("Not connected to MCP server")
             
-        result = await self.session.call_tool(tool_name, arguments)
-        return result
+        return await self._cached_call(
+            "tool", tool_name, arguments,
+            lambda: self._observed("call_tool", tool_name, arguments,
+                                   lambda: self.session.call_tool(tool_name, arguments))
+        )
+    
+    async def _call_batch_item(self, index: int, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Call one tool of a batch, capturing any error in the result entry."""
+        try:
+            response = await self.call_tool(tool_name, arguments)
+        except Exception as e:
+            logger.warning("Batched tool call failed",
+                         server=self.server_name,
+                         tool=tool_name,
+                         error=str(e))
+            return {
+                "index": index,
+                "tool": tool_name,
+                "status": "error",
+                "error": str(e)
+            }
+        return {
+            "index": index,
+            "tool": tool_name,
+            "status": "success",
+            "response": response
+        }
+    
+    async def iter_tools_batch(
+        self, calls: Iterable[Tuple[str, Dict[str, Any]]], window: int = 32
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Pipeline many tool calls and yield results as they complete.
+        
+        At most ``window`` requests are outstanding on the session at once;
+        as soon as one finishes the next is sent. A failing call produces an
+        error entry instead of aborting the batch.
+        
+        Args:
+            calls: (tool_name, arguments) pairs
+            window: Maximum number of requests in flight
+            
+        Yields:
+            Result entries with the call's input ``index``, ``tool`` and a
+            ``status`` of "success" (with ``response``) or "error" (with ``error``)
+        """
+        if not self.session:
+            raise RuntimeError("Not connected to MCP server")
+        if window < 1:
+            raise ValueError("Batch window must be at least 1")
+        
+        calls = list(calls)
+        pending = iter(enumerate(calls))
+        completed: asyncio.Queue = asyncio.Queue()
+        
+        async def worker():
+            for index, (tool_name, arguments) in pending:
+                await completed.put(await self._call_batch_item(index, tool_name, arguments))
+        
+        workers = [asyncio.create_task(worker()) for _ in range(min(window, len(calls)))]
+        try:
+            for _ in range(len(calls)):
+                yield await completed.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def call_tools_batch(
+        self, calls: Iterable[Tuple[str, Dict[str, Any]]], window: int = 32
+    ) -> List[Dict[str, Any]]:
+        """Pipeline many tool calls and return the results in input order.
+        
+        Args:
+            calls: (tool_name, arguments) pairs
+            window: Maximum number of requests in flight
+            
+        Returns:
+            One result entry per call, as yielded by ``iter_tools_batch``
+        """
+        calls = list(calls)
+        results: List[Dict[str, Any]] = [None] * len(calls)
+        async for item in self.iter_tools_batch(calls, window):
+            results[item["index"]] = item
+        return results
     
     async def read_resource(self, resource_path: str) -> Any:
         """Read a resource from the MCP server.
         
+        Concurrent reads of the same resource share one upstream request.
+        
         Args:
             resource_path: Path to the resource
             
@@ -87,12 +334,22 @@ class MCPClient:
         if not self.session:
             raise RuntimeError("Not connected to MCP server")
             
-        result = await self.session.read_resource(resource_path)
-        return result
+        return await self._cached_call(
+            "resource", resource_path, None,
+            lambda: self._in_flight.do(
+                ("read_resource", resource_path),
+                lambda: self._observed("read_resource", resource_path, resource_path,
+                                       lambda: self.session.read_resource(resource_path),
+                                       label=resource_label(resource_path))
+            )
+        )
     
     async def get_prompt(self, prompt_name: str, arguments: Dict[str, Any]) -> Any:
         """Get a prompt from the MCP server.
         
+        Concurrent requests for the same prompt and arguments share one
+        upstream request.
+        
         Args:
             prompt_name: Name of the prompt
             arguments: Prompt arguments
@@ -103,5 +360,8 @@ class MCPClient:
         if not self.session:
             raise RuntimeError("Not connected to MCP server")
             
-        result = await self.session.get_prompt(prompt_name, arguments)
-        return result
+        return await self._in_flight.do(
+            ("get_prompt", prompt_name, canonical_arguments(arguments)),
+            lambda: self._observed("get_prompt", prompt_name, arguments,
+                                   lambda: self.session.get_prompt(prompt_name, arguments))
+        )
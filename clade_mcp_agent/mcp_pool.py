@@ -0,0 +1,244 @@
+"""Pool of MCP client sessions for a single server."""
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+from .config import ServerConfig
+from .mcp_client import MCPClient
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+class PooledSession:
+    """A pooled MCP client and its load accounting."""
+    
+    def __init__(self, client: MCPClient):
+        """Initialize the pooled session.
+        
+        Args:
+            client: The client owned by this pool slot
+        """
+        self.client = client
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.ready = asyncio.get_running_loop().create_future()
+        self.closing = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+class MCPClientPool:
+    """Keeps several sessions to one MCP server and spreads calls across them.
+    
+    Every session runs its own server subprocess, so CPU-heavy tool servers
+    can use more than one core. Calls go to the session with the fewest
+    in-flight requests. A new session is opened when every existing one is
+    busy and the pool is below ``max_size``, and sessions idle for longer
+    than ``idle_timeout`` are closed down to ``min_size``.
+    """
+    
+    def __init__(
+        self,
+        config: ServerConfig,
+        min_size: int = 1,
+        max_size: int = 4,
+        idle_timeout: float = 60.0,
+        server_name: Optional[str] = None,
+        client_factory: Callable[[Optional[str]], MCPClient] = MCPClient,
+        grow_backoff: float = 1.0,
+        grow_backoff_max: float = 30.0,
+    ):
+        """Initialize the pool.
+        
+        Args:
+            config: Configuration of the server to connect to
+            min_size: Number of sessions kept open even when idle
+            max_size: Maximum number of sessions
+            idle_timeout: Seconds a session may stay idle before it is closed
+            server_name: Optional name for the server, defaults to config.host
+            client_factory: Callable creating a client for a server name
+            grow_backoff: Seconds to wait before growing again after a new
+                session failed to start, doubled on every further failure
+            grow_backoff_max: Maximum wait between attempts to grow
+        """
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.server_name = server_name or config.host
+        self.client_factory = client_factory
+        self.grow_backoff = grow_backoff
+        self.grow_backoff_max = grow_backoff_max
+        self._sessions: List[PooledSession] = []
+        # Failed attempts to grow in a row, and when the next one may be made
+        self._grow_failures = 0
+        self._grow_after = 0.0
+        self._reaper: Optional[asyncio.Task] = None
+    
+    @property
+    def size(self) -> int:
+        """Number of sessions, including ones still connecting."""
+        return len(self._sessions)
+    
+    async def start(self) -> None:
+        """Open the minimum number of sessions and start idle reaping.
+        
+        Raises:
+            ValueError: If the server's paths are invalid; configs loaded
+                with lazy path checks are checked here
+        """
+        self.config.check_paths()
+        sessions = [self._spawn_session() for _ in range(self.min_size)]
+        await asyncio.gather(*(s.ready for s in sessions))
+        self._reaper = asyncio.create_task(self._reap_idle())
+        logger.info("Started MCP session pool",
+                   server=self.server_name,
+                   size=self.size)
+    
+    async def close(self) -> None:
+        """Close every session in the pool."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.closing.set()
+        await asyncio.gather(*(s.task for s in sessions if s.task), return_exceptions=True)
+        logger.info("Closed MCP session pool", server=self.server_name)
+    
+    async def _run_session(self, session: PooledSession) -> None:
+        """Own a session for its whole lifetime.
+        
+        The stdio transport has to be closed by the task that opened it, so
+        each session lives in a task of its own until it is told to close.
+        """
+        try:
+            await session.client.connect_to_server(
+                str(self.config.server_path),
+                self.config.env_vars or None
+            )
+        except Exception as e:
+            if session in self._sessions:
+                self._sessions.remove(session)
+            session.ready.set_exception(e)
+            return
+        session.ready.set_result(None)
+        self._grow_failures = 0
+        logger.debug("Opened pooled MCP session",
+                    server=self.server_name,
+                    size=self.size)
+        try:
+            await session.closing.wait()
+        finally:
+            await session.client.disconnect()
+    
+    def _spawn_session(self) -> PooledSession:
+        """Add a new session to the pool and start connecting it."""
+        session = PooledSession(self.client_factory(self.server_name))
+        self._sessions.append(session)
+        session.task = asyncio.create_task(self._run_session(session))
+        return session
+    
+    async def _acquire(self) -> PooledSession:
+        """Pick the least-loaded session, growing the pool if all are busy.
+        
+        Sessions that are still connecting take part in the choice with the
+        load already reserved on them, so a burst of calls spreads across the
+        new sessions instead of piling onto the first one. When a new session
+        fails to start, calls fall back to the existing sessions and the pool
+        does not try to grow again until a backoff has passed.
+        """
+        while True:
+            session = min(self._sessions, key=lambda s: s.in_flight, default=None)
+            can_grow = self.size < self.max_size and (session is None or time.monotonic() >= self._grow_after)
+            if (session is None or session.in_flight > 0) and can_grow:
+                session = self._spawn_session()
+            elif session is None:
+                raise RuntimeError("No MCP sessions available")
+            session.in_flight += 1
+            try:
+                await asyncio.shield(session.ready)
+            except Exception as e:
+                session.in_flight -= 1
+                if not self._sessions:
+                    raise
+                self._grow_failures += 1
+                delay = min(self.grow_backoff_max, self.grow_backoff * 2 ** (self._grow_failures - 1))
+                self._grow_after = time.monotonic() + delay
+                logger.warning("Failed to grow MCP session pool",
+                             server=self.server_name,
+                             retry_in=delay,
+                             error=str(e))
+                continue
+            except BaseException:
+                session.in_flight -= 1
+                raise
+            return session
+    
+    async def _dispatch(self, method: str, *args: Any) -> Any:
+        """Run a client method on the least-loaded session."""
+        session = await self._acquire()
+        try:
+            return await getattr(session.client, method)(*args)
+        finally:
+            session.in_flight -= 1
+            session.last_used = time.monotonic()
+    
+    async def _reap_idle(self) -> None:
+        """Periodically close sessions that have been idle for too long."""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            now = time.monotonic()
+            for session in list(self._sessions):
+                if self.size <= self.min_size:
+                    break
+                if (session.ready.done() and session.in_flight == 0
+                        and now - session.last_used >= self.idle_timeout):
+                    self._sessions.remove(session)
+                    session.closing.set()
+                    logger.debug("Reaped idle MCP session",
+                                server=self.server_name,
+                                size=self.size)
+    
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """Call a tool on the least-loaded session.
+        
+        Args:
+            tool_name: Name of the tool to call
+            arguments: Tool arguments
+        
+        Returns:
+            The tool's response
+        """
+        return await self._dispatch("call_tool", tool_name, arguments)
+    
+    async def read_resource(self, resource_path: str) -> Any:
+        """Read a resource through the least-loaded session.
+        
+        Args:
+            resource_path: Path to the resource
+        
+        Returns:
+            The resource data
+        """
+        return await self._dispatch("read_resource", resource_path)
+    
+    async def get_prompt(self, prompt_name: str, arguments: Dict[str, Any]) -> Any:
+        """Get a prompt through the least-loaded session.
+        
+        Args:
+            prompt_name: Name of the prompt
+            arguments: Prompt arguments
+        
+        Returns:
+            The prompt template
+        """
+        return await self._dispatch("get_prompt", prompt_name, arguments)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return the pool size and per-session in-flight counts."""
+        return {
+            "server": self.server_name,
+            "size": self.size,
+            "in_flight": [s.in_flight for s in self._sessions],
+        }
@@ -0,0 +1,354 @@
+"""In-process metrics with Prometheus text exposition."""
+import json
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from aiohttp import web
+
+# Latency buckets in seconds, from sub-millisecond tool calls to long completions
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter."""
+        self.value += amount
+
+
+class _GaugeValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the gauge."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the gauge."""
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        """Set the gauge."""
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One count per bucket plus the +Inf bucket, not cumulative
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class Metric:
+    """A named family of labelled values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initialize the family.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels values are keyed by
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _new_value(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *labelvalues: Any) -> Any:
+        """Return the value for a combination of label values, creating it if needed."""
+        key = tuple(str(v) for v in labelvalues)
+        value = self._values.get(key)
+        if value is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            value = self._values[key] = self._new_value()
+        return value
+
+    def clear(self) -> None:
+        """Drop all recorded values."""
+        self._values.clear()
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_value(self) -> _CounterValue:
+        return _CounterValue()
+
+
+class Gauge(Metric):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def _new_value(self) -> _GaugeValue:
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    """Distribution of observations in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """Initialize the family.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels values are keyed by
+            buckets: Upper bounds of the buckets, in increasing order
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_value(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Collection of metrics that can be rendered or snapshotted.
+
+    Updates are plain attribute arithmetic without locks, which is safe
+    because all instrumented code runs on the event loop thread.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} is already registered differently")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Register, or return the existing, counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Register, or return the existing, gauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Register, or return the existing, histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def reset(self) -> None:
+        """Drop all recorded values, keeping the metric definitions."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in list(metric._values.items()):
+                if isinstance(value, _HistogramValue):
+                    cumulative = 0
+                    bounds = value.bounds + (float("inf"),)
+                    for bound, count in zip(bounds, value.counts):
+                        cumulative += count
+                        labels = _format_labels(metric.labelnames, key, f'le="{_format_value(bound)}"')
+                        lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{metric.name}_sum{labels} {_format_value(value.sum)}")
+                    lines.append(f"{metric.name}_count{labels} {value.count}")
+                else:
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{metric.name}{labels} {_format_value(value.value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current values as plain data.
+
+        Histograms include their count, sum and estimated p50/p95/p99.
+        """
+        result = {}
+        for metric in self._metrics.values():
+            samples = []
+            for key, value in list(metric._values.items()):
+                sample: Dict[str, Any] = {"labels": dict(zip(metric.labelnames, key))}
+                if isinstance(value, _HistogramValue):
+                    sample.update(count=value.count, sum=value.sum,
+                                  p50=value.quantile(0.5), p95=value.quantile(0.95),
+                                  p99=value.quantile(0.99))
+                else:
+                    sample["value"] = value.value
+                samples.append(sample)
+            result[metric.name] = {"type": metric.kind, "help": metric.documentation, "samples": samples}
+        return result
+
+
+REGISTRY = MetricsRegistry()
+
+MCP_REQUEST_DURATION = REGISTRY.histogram(
+    "mcp_request_duration_seconds", "Latency of MCP server requests",
+    ("server", "method", "name"))
+MCP_IN_FLIGHT = REGISTRY.gauge(
+    "mcp_requests_in_flight", "MCP server requests waiting for a response",
+    ("server", "method"))
+MCP_ERRORS = REGISTRY.counter(
+    "mcp_request_errors_total", "Failed MCP server requests by error type",
+    ("server", "method", "error"))
+MCP_BYTES_SENT = REGISTRY.counter(
+    "mcp_sent_bytes_total", "Serialized size of MCP request arguments, when measured", ("server",))
+MCP_BYTES_RECEIVED = REGISTRY.counter(
+    "mcp_received_bytes_total", "Serialized size of MCP responses, when measured", ("server",))
+
+CLAUDE_REQUEST_DURATION = REGISTRY.histogram(
+    "claude_request_duration_seconds", "Latency of Claude requests until the last token", ("model",))
+CLAUDE_TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "claude_time_to_first_token_seconds", "Latency of Claude requests until the first token", ("model",))
+CLAUDE_IN_FLIGHT = REGISTRY.gauge(
+    "claude_requests_in_flight", "Claude requests still streaming", ("model",))
+CLAUDE_ERRORS = REGISTRY.counter(
+    "claude_request_errors_total", "Failed Claude requests by error type", ("model", "error"))
+CLAUDE_TOKENS = REGISTRY.counter(
+    "claude_tokens_total", "Tokens reported by Claude", ("model", "direction"))
+CLAUDE_BYTES_SENT = REGISTRY.counter(
+    "claude_sent_bytes_total", "Size of Claude request bodies as sent", ("model",))
+CLAUDE_BYTES_RECEIVED = REGISTRY.counter(
+    "claude_received_bytes_total", "UTF-8 size of Claude response text", ("model",))
+
+
+# MCP messages are serialized inside the stdio transport, so measuring them
+# means serializing every request and result again; it is off by default
+_measure_payloads = False
+
+
+def measure_payloads(enabled: bool = True) -> None:
+    """Turn the MCP byte counters on or off."""
+    global _measure_payloads
+    _measure_payloads = enabled
+
+
+def payloads_measured() -> bool:
+    """Return whether MCP requests and results are measured."""
+    return _measure_payloads
+
+
+def payload_size(value: Any) -> int:
+    """Return the serialized size of a request or response."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if hasattr(value, "model_dump_json"):
+        return len(value.model_dump_json())
+    return len(json.dumps(value, default=str))
+
+
+class RequestTimer:
+    """Times one MCP request and records it when the request ends."""
+
+    __slots__ = ("server", "method", "name", "started", "in_flight")
+
+    def __init__(self, server: str, method: str, name: str):
+        self.server = server
+        self.method = method
+        self.name = name
+        self.in_flight = MCP_IN_FLIGHT.labels(server, method)
+
+    def __enter__(self) -> "RequestTimer":
+        self.in_flight.inc()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        MCP_REQUEST_DURATION.labels(self.server, self.method, self.name).observe(
+            time.perf_counter() - self.started)
+        self.in_flight.dec()
+        if exc_type is not None:
+            MCP_ERRORS.labels(self.server, self.method, exc_type.__name__).inc()
+
+
+async def start_metrics_server(
+    host: str = "127.0.0.1", port: int = 9464, registry: MetricsRegistry = REGISTRY
+) -> web.AppRunner:
+    """Serve ``/metrics`` in the Prometheus text format.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on, 0 for any free port
+        registry: Registry to expose
+
+    Returns:
+        The runner; call ``cleanup()`` on it to stop serving
+    """
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
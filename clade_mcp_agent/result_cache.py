@@ -0,0 +1,143 @@
+"""Bounded LRU and TTL cache for MCP tool and resource results."""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+def canonical_arguments(arguments: Optional[Dict[str, Any]]) -> str:
+    """Serialize call arguments so that equal dicts give equal strings."""
+    return json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+class ResultCache:
+    """Opt-in cache for read-only MCP calls.
+    
+    Only resources and tools on the ``cacheable_tools`` allow-list are ever
+    cached. Entries expire after a per-tool TTL, and the least recently used
+    entries are evicted once the cached payloads exceed ``max_bytes``. Cached
+    objects are shared between callers and must not be mutated.
+    """
+    
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: float = 60.0,
+        cacheable_tools: Iterable[str] = (),
+        tool_ttls: Optional[Dict[str, float]] = None,
+        cache_resources: bool = True,
+        resource_ttl: Optional[float] = None,
+    ):
+        """Initialize the cache.
+        
+        Args:
+            max_bytes: Upper bound on the total size of cached payloads
+            default_ttl: Seconds an entry stays valid unless overridden
+            cacheable_tools: Names of tools that are safe to cache
+            tool_ttls: Per-tool TTL overrides in seconds
+            cache_resources: Whether read_resource results are cached
+            resource_ttl: TTL for resources, defaults to default_ttl
+        """
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.cacheable_tools = set(cacheable_tools)
+        self.tool_ttls = dict(tool_ttls or {})
+        self.cache_resources = cache_resources
+        self.resource_ttl = default_ttl if resource_ttl is None else resource_ttl
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def make_key(server: str, kind: str, name: str, arguments: Optional[Dict[str, Any]] = None) -> str:
+        """Build a cache key from the call target and canonicalized arguments.
+        
+        Args:
+            server: Server identifier
+            kind: Either "tool" or "resource"
+            name: Tool name or resource path
+            arguments: Call arguments
+        
+        Returns:
+            A key that is identical for equal argument dicts in any key order
+        """
+        return f"{server}\x00{kind}\x00{name}\x00{canonical_arguments(arguments)}"
+    
+    def is_cacheable(self, kind: str, name: str) -> bool:
+        """Return whether results of a call may be cached."""
+        if kind == "resource":
+            return self.cache_resources
+        return name in self.cacheable_tools
+    
+    def ttl_for(self, kind: str, name: str) -> float:
+        """Return the TTL in seconds for a tool or resource."""
+        if kind == "resource":
+            return self.resource_ttl
+        return self.tool_ttls.get(name, self.default_ttl)
+    
+    @staticmethod
+    def _payload_size(value: Any) -> int:
+        """Estimate the size of a result by its serialized length."""
+        if hasattr(value, "model_dump_json"):
+            return len(value.model_dump_json())
+        return len(json.dumps(value, default=str))
+    
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look up a cached result.
+        
+        Args:
+            key: Key from ``make_key``
+        
+        Returns:
+            A (found, value) tuple
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, size, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+            self.size_bytes -= size
+            self.expirations += 1
+        self.misses += 1
+        return False, None
+    
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        """Store a result, evicting least recently used entries as needed.
+        
+        Args:
+            key: Key from ``make_key``
+            value: Result to cache
+            ttl: Seconds the entry stays valid
+        """
+        size = self._payload_size(value)
+        if size > self.max_bytes or ttl <= 0:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size_bytes -= old[1]
+        self._entries[key] = (value, size, time.monotonic() + ttl)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            self.evictions += 1
+    
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
+        self.size_bytes = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+        }
@@ -0,0 +1,350 @@
+"""Client-side rate limiting and prioritization of Claude requests."""
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from anthropic import APIStatusError
+from .claude_client import ClaudeClient, CompletionStats
+from .context import MESSAGE_OVERHEAD, estimate_tokens as estimate_text_tokens
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Rate limited and overloaded responses, both safe to retry later
+RETRYABLE_STATUS = (429, 529)
+
+
+class TokenBucket:
+    """Continuously refilled token bucket."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """Initialize a full bucket.
+
+        Args:
+            per_minute: Tokens added per minute
+            capacity: Maximum number of tokens, one minute's worth by default
+        """
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Return seconds until ``amount`` tokens are available."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Remove tokens, capped at the capacity so huge requests still fit."""
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Return tokens that were over-estimated, or take more when negative."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Ticket:
+    """A request waiting for permission to be sent."""
+
+    __slots__ = ('priority', 'seq', 'cost', 'future', 'queued_at')
+
+    def __init__(self, priority: int, seq: int, cost: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.cost = cost
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class ClaudeScheduler:
+    """Admission control in front of a ``ClaudeClient``.
+
+    Requests are admitted in priority order, interactive before background
+    and first come first served within a class, once a slot is free under
+    ``max_concurrency`` and both the requests/min and tokens/min buckets can
+    cover them. Token cost is estimated up front from the prompt size plus
+    ``max_tokens`` and corrected with the reported usage afterwards.
+
+    A 429 or 529 response pauses all admissions for its ``retry-after``
+    (or a jittered backoff) and puts the request back in the queue with
+    its tokens returned, so
+    throughput stays near the quota instead of turning into a retry storm.
+    The wrapped client should be created with ``max_retries=0`` so the SDK
+    does not retry on its own.
+    """
+
+    def __init__(
+        self,
+        client: ClaudeClient,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        burst_seconds: float = 60.0,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            client: The client requests are sent through
+            requests_per_minute: Request quota, or None for no limit
+            tokens_per_minute: Input plus output token quota, or None for no limit
+            max_concurrency: Maximum number of requests in flight
+            max_retries: Times a rate limited request is re-queued before failing
+            backoff_base: Initial pause in seconds when a 429 has no retry-after
+            burst_seconds: Seconds' worth of quota that may be spent at once
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.request_bucket = (TokenBucket(requests_per_minute, requests_per_minute * burst_seconds / 60)
+                               if requests_per_minute else None)
+        self.token_bucket = (TokenBucket(tokens_per_minute, tokens_per_minute * burst_seconds / 60)
+                             if tokens_per_minute else None)
+        self._queue: List[Tuple[int, int, _Ticket]] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.max_in_flight = 0
+        self.rate_limited = 0
+        # Admission count and total queue wait per priority
+        self._waits: Dict[int, List[float]] = {INTERACTIVE: [0, 0.0], BACKGROUND: [0, 0.0]}
+
+    @property
+    def max_tokens(self) -> int:
+        """Default maximum tokens generated per request by the wrapped client."""
+        return self.client.max_tokens
+
+    def estimate_tokens(self, message: str, context: Optional[Dict[str, Any]], params: Dict[str, Any]) -> int:
+        """Estimate the tokens a request will use, counting text as the context compiler does."""
+        tokens = estimate_text_tokens(message) + MESSAGE_OVERHEAD
+        if context:
+            tokens += estimate_text_tokens(json.dumps(context, default=str))
+        return tokens + params.get('max_tokens', self.client.max_tokens)
+
+    def _delay(self, cost: int, now: float) -> float:
+        """Return seconds until a request of ``cost`` tokens may be sent."""
+        delay = self._blocked_until - now
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.wait_time(1, now))
+        if self.token_bucket is not None:
+            delay = max(delay, self.token_bucket.wait_time(cost, now))
+        return delay
+
+    def _schedule(self) -> None:
+        """Admit queued requests that fit, and set a timer for the next one."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            ticket = self._queue[0][2]
+            if ticket.future.done():
+                # Cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            if self._in_flight >= self.max_concurrency:
+                return
+            now = time.monotonic()
+            delay = self._delay(ticket.cost, now)
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._schedule)
+                return
+            heapq.heappop(self._queue)
+            if self.request_bucket is not None:
+                self.request_bucket.take(1)
+            if self.token_bucket is not None:
+                self.token_bucket.take(ticket.cost)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            waits = self._waits.setdefault(ticket.priority, [0, 0.0])
+            waits[0] += 1
+            waits[1] += now - ticket.queued_at
+            ticket.future.set_result(None)
+
+    async def _acquire(self, priority: int, seq: int, cost: int) -> None:
+        """Wait until a request may be sent."""
+        ticket = _Ticket(priority, seq, cost, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, seq, ticket))
+        self._schedule()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Admitted just before the caller gave up
+                self._release(cost, None)
+            raise
+
+    def _release(self, cost: int, used: Optional[int]) -> None:
+        """Free a slot and correct the token estimate with actual usage."""
+        self._in_flight -= 1
+        if self.token_bucket is not None and used is not None:
+            self.token_bucket.adjust(cost - used)
+        self._schedule()
+
+    def _rate_limited(self, error: APIStatusError, attempt: int) -> float:
+        """Pause admissions after a rate limited response.
+
+        Returns:
+            Seconds admissions are paused for
+        """
+        headers = error.response.headers
+        try:
+            if 'retry-after-ms' in headers:
+                delay = float(headers['retry-after-ms']) / 1000
+            else:
+                delay = float(headers['retry-after'])
+        except (KeyError, ValueError):
+            delay = random.uniform(0, self.backoff_base * 2 ** attempt)
+        self.rate_limited += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        logger.warning("Claude request rate limited",
+                      status=error.status_code,
+                      retry_in=delay,
+                      attempt=attempt + 1)
+        return delay
+
+    def process_message(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        priority: int = INTERACTIVE,
+        **params: Any,
+    ) -> 'ScheduledStream':
+        """Schedule a message, streaming Claude's reply once it is admitted.
+
+        Args:
+            message: The message to process
+            context: Additional context for Claude
+            priority: ``INTERACTIVE`` or ``BACKGROUND``
+            **params: Extra request parameters such as temperature
+
+        Returns:
+            A stream yielding text deltas as they arrive, with the ``stats``
+            and ``text`` of a ``ClaudeStream``
+        """
+        return ScheduledStream(self, message, context, priority, params)
+
+    async def get_completion(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        priority: int = INTERACTIVE,
+        **params: Any,
+    ) -> str:
+        """Schedule a message and return Claude's full reply.
+
+        Args:
+            message: The message to process
+            context: Additional context for Claude
+            priority: ``INTERACTIVE`` or ``BACKGROUND``
+            **params: Extra request parameters such as temperature
+
+        Returns:
+            The response text
+        """
+        return await self.process_message(message, context, priority, **params).text()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue, concurrency and rate limit metrics."""
+        def mean(priority):
+            count, total = self._waits[priority]
+            return total / count if count else None
+
+        return {
+            'queued': sum(1 for _, _, ticket in self._queue if not ticket.future.done()),
+            'in_flight': self._in_flight,
+            'max_in_flight': self.max_in_flight,
+            'rate_limited': self.rate_limited,
+            'mean_wait_interactive': mean(INTERACTIVE),
+            'mean_wait_background': mean(BACKGROUND),
+        }
+
+
+class ScheduledStream:
+    """A ``ClaudeStream`` sent through a ``ClaudeScheduler``.
+
+    Iterating waits for admission, then streams the reply. A rate limited
+    attempt is re-queued and sent again; its tokens are returned to the
+    bucket, since the API did not process it. ``stats`` are those of the
+    latest attempt, so they describe the answered request.
+    """
+
+    def __init__(
+        self,
+        scheduler: ClaudeScheduler,
+        message: str,
+        context: Optional[Dict[str, Any]],
+        priority: int,
+        params: Dict[str, Any],
+    ):
+        """Initialize the stream without queueing the request yet.
+
+        Args:
+            scheduler: Scheduler admitting the request
+            message: The message to process
+            context: Additional context for Claude
+            priority: ``INTERACTIVE`` or ``BACKGROUND``
+            params: Extra request parameters such as temperature
+        """
+        self._scheduler = scheduler
+        self._message = message
+        self._context = context
+        self._priority = priority
+        self._params = params
+        self.stats = CompletionStats(params.get('model', scheduler.client.model))
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """Wait for admission and yield text deltas as they arrive.
+
+        Raises:
+            APIStatusError: If the request fails, or is still rate limited
+                after ``max_retries`` attempts
+        """
+        scheduler = self._scheduler
+        cost = scheduler.estimate_tokens(self._message, self._context, self._params)
+        seq = next(scheduler._seq)
+        attempt = 0
+        while True:
+            await scheduler._acquire(self._priority, seq, cost)
+            stream = scheduler.client.process_message(self._message, self._context, **self._params)
+            used = None
+            started = False
+            try:
+                async for delta in stream:
+                    if not started:
+                        # The stream starts a fresh CompletionStats when sent
+                        self.stats = stream.stats
+                        started = True
+                    yield delta
+                if not stream.stats.cached:
+                    used = stream.stats.input_tokens + stream.stats.output_tokens
+                return
+            except APIStatusError as e:
+                if e.status_code not in RETRYABLE_STATUS or started:
+                    raise
+                # Rejected before any work was done: nothing was spent
+                used = 0
+                if attempt >= scheduler.max_retries:
+                    raise
+                scheduler._rate_limited(e, attempt)
+                attempt += 1
+            finally:
+                self.stats = stream.stats
+                scheduler._release(cost, used)
+
+    async def text(self) -> str:
+        """Consume the stream and return the full response text."""
+        return ''.join([delta async for delta in self])
@@ -0,0 +1,112 @@
+"""Binary serialization of state models."""
+import gc
+import struct
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Type
+from pydantic_core import to_jsonable_python
+from .history import HistoryLog
+from .state import BaseState
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# Header of the binary format: magic bytes and format version
+MSGPACK_MAGIC = b'CLST'
+MSGPACK_VERSION = 1
+_HEADER = struct.Struct('>4sH')
+
+
+def state_classes() -> Dict[str, Type[BaseState]]:
+    """Return BaseState and all of its subclasses by class name."""
+    classes = {}
+    pending = [BaseState]
+    while pending:
+        cls = pending.pop()
+        classes[cls.__name__] = cls
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Pause the cyclic garbage collector while building many containers.
+
+    A large history allocates hundreds of thousands of dicts, none of them
+    garbage, and each allocation threshold would otherwise trigger a
+    collection that scans them all again.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _require_msgpack() -> None:
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed; install the 'fast' extra to use the binary format")
+
+
+def _packable(value: Any) -> Any:
+    """Convert a value msgpack cannot pack natively, the way JSON mode would."""
+    if isinstance(value, HistoryLog):
+        return list(value)
+    return to_jsonable_python(value, fallback=str)
+
+
+def dump_msgpack(state: BaseState) -> bytes:
+    """Serialize a state to the versioned msgpack format.
+
+    The payload holds the state's class name and a map of its fields. The
+    fields are packed straight from the model, without building a dict of
+    the whole state first; entries are already plain data, so only values
+    msgpack has no type for, such as datetimes, are converted as in JSON.
+
+    Args:
+        state: The state to serialize
+
+    Returns:
+        Header followed by the msgpack payload
+    """
+    _require_msgpack()
+    packer = msgpack.Packer(default=_packable, autoreset=False)
+    fields = type(state).model_fields
+    packer.pack_array_header(2)
+    packer.pack(type(state).__name__)
+    packer.pack_map_header(len(fields))
+    for name in fields:
+        packer.pack(name)
+        packer.pack(getattr(state, name))
+    return _HEADER.pack(MSGPACK_MAGIC, MSGPACK_VERSION) + packer.bytes()
+
+
+def load_msgpack(data: bytes, cls: Optional[Type[BaseState]] = None) -> BaseState:
+    """Rebuild a state written by ``dump_msgpack``.
+
+    Args:
+        data: Serialized state
+        cls: Class to validate into; by default the class recorded in the data
+
+    Returns:
+        The state
+
+    Raises:
+        ValueError: If the data is not in a supported version of the format
+    """
+    _require_msgpack()
+    if len(data) < _HEADER.size:
+        raise ValueError("Data is too short to be a serialized state")
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MSGPACK_MAGIC:
+        raise ValueError("Data is not a serialized state")
+    if version != MSGPACK_VERSION:
+        raise ValueError(f"Unsupported state format version: {version}")
+    with _gc_paused():
+        class_name, fields = msgpack.unpackb(memoryview(data)[_HEADER.size:], strict_map_key=False)
+        if cls is None:
+            cls = state_classes().get(class_name, BaseState)
+        return cls.model_validate(fields)
@@ -0,0 +1,69 @@
+"""Coalescing of identical in-flight requests."""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class _Flight:
+    """A shared upstream call and the number of callers waiting on it."""
+    
+    __slots__ = ("task", "waiters")
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one upstream call.
+    
+    The first caller for a key starts the call; everyone who asks for the
+    same key while it is running waits on the same result. A waiter that is
+    cancelled only stops waiting. The upstream call is cancelled only once
+    every waiter has given up.
+    """
+    
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._flights: Dict[Hashable, _Flight] = {}
+    
+    def __len__(self) -> int:
+        """Number of distinct calls currently in flight."""
+        return len(self._flights)
+    
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        """Drop a finished flight so the next call for its key starts fresh."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the exception as retrieved even if every waiter left
+            flight.task.exception()
+    
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Run ``call`` unless an identical call is already in flight.
+        
+        Args:
+            key: Identifies equivalent calls
+            call: Starts the upstream call
+        
+        Returns:
+            The result of the shared call
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # Forget the flight first, so a caller arriving before the
+                # task has finished cancelling starts a fresh call
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
@@ -1,8 +1,8 @@
 """State management models for the Clade MCP Agent."""
-from typing import Dict, List, Optional, Any
+from typing import ClassVar, Dict, List, Optional, Any, Tuple
 from datetime import datetime
-from pydantic import BaseModel, Field, model_validator
-import json
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from .history import CompactHistoryLog, HistoryLog, Moment
 
 
 class BaseState(BaseModel):
@@ -10,17 +10,22 @@ class BaseState(BaseModel):
     
     state_id: str = Field(default_factory=lambda: f"state_{datetime.utcnow().isoformat()}")
     state_type: str = Field(default="base")
-    history: List[Dict[str, Any]] = Field(default_factory=list)
+    history: HistoryLog = Field(default_factory=HistoryLog)
     metadata: Dict[str, Any] = Field(default_factory=dict)
     parent_state_id: Optional[str] = None
+    # StateStore the state's changes are journaled to, set by the store
+    _store: Optional[Any] = PrivateAttr(default=None)
+    # Keep history in a CompactHistoryLog; set on subclasses with long histories
+    compact_history: ClassVar[bool] = False
     
     @model_validator(mode='after')
     def validate_state(self) -> 'BaseState':
         """Validate state after initial validation."""
-        # Ensure history entries have timestamps
-        for entry in self.history:
-            if 'timestamp' not in entry:
-                entry['timestamp'] = datetime.utcnow().isoformat()
+        if self.compact_history and not isinstance(self.history, CompactHistoryLog):
+            self.history = CompactHistoryLog(self.history)
+        # Ensure history entries have timestamps; segments inherited from a
+        # validated parent are already stamped and are skipped
+        self.history.stamp_missing(datetime.utcnow().isoformat())
         return self
     
     def add_history_entry(self, entry_type: str, data: Dict[str, Any]) -> None:
@@ -31,16 +36,45 @@ class BaseState(BaseModel):
             'timestamp': datetime.utcnow().isoformat()
         }
         self.history.append(entry)
+        self._journal('append', 'history', entry)
+    
+    def history_by_type(self, entry_type: str) -> List[Dict[str, Any]]:
+        """Return the history entries of a type, oldest first."""
+        return self.history.by_type(entry_type)
+    
+    def latest_history_entry(self, entry_type: str) -> Optional[Dict[str, Any]]:
+        """Return the most recent history entry of a type, or None."""
+        return self.history.latest(entry_type)
+    
+    def history_between(
+        self, start: Optional[Moment] = None, end: Optional[Moment] = None, entry_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the history entries timestamped from ``start`` up to, not including, ``end``.
+        
+        Args:
+            start: Earliest timestamp as a datetime or ISO string, or None
+            end: Timestamp to stop before, or None
+            entry_type: Only return entries of this type
+        """
+        return self.history.between(start, end, entry_type)
+    
+    def _journal(self, op: str, field: str, value: Any) -> None:
+        """Record a change with the attached state store, if any."""
+        if self._store is not None:
+            self._store.record(self, op, field, value)
     
     def model_dump_json(self, **kwargs: Any) -> str:
-        """Convert the model to JSON string, with special handling for datetime."""
-        data = self.model_dump()
-        return json.dumps(data, default=str)
+        """Convert the model to a JSON string with pydantic's native serializer.
+
+        Values JSON cannot represent are written as their ``str()``.
+        """
+        kwargs.setdefault('fallback', str)
+        return super().model_dump_json(**kwargs)
     
     def create_child_state(self, **kwargs: Any) -> 'BaseState':
         """Create a new state instance that inherits from this one."""
         kwargs['parent_state_id'] = self.state_id
-        kwargs['history'] = self.history.copy()  # Copy history from parent
+        kwargs['history'] = self.history.fork()  # Share history with parent
         return self.__class__(**kwargs)
 
 
@@ -61,6 +95,7 @@ class ConversationState(BaseState):
             'timestamp': datetime.utcnow().isoformat()
         }
         self.conversation_history.append(message)
+        self._journal('append', 'conversation_history', message)
         self.add_history_entry('message', message)
 
 
@@ -72,22 +107,88 @@ class TaskState(BaseState):
     task_status: str = Field(default="pending")
     task_data: Dict[str, Any] = Field(default_factory=dict)
     subtasks: List[Dict[str, Any]] = Field(default_factory=list)
+    # Position of the first subtask of each name, and the subtasks list and length it covers
+    _subtask_index: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _subtasks_indexed: Tuple[Optional[List[Dict[str, Any]]], int] = PrivateAttr(default=(None, 0))
     
-    def update_status(self, status: str, details: Optional[Dict[str, Any]] = None) -> None:
-        """Update task status and record in history."""
-        self.task_status = status
+    def update_status(
+        self, status: str, details: Optional[Dict[str, Any]] = None, subtask: Optional[str] = None
+    ) -> None:
+        """Update the status of the task, or of one of its subtasks, and record it in history.
+        
+        Args:
+            status: The new status
+            details: Extra data for the history entry
+            subtask: Name of the subtask to update instead of the task
+        
+        Raises:
+            ValueError: If there is no subtask with that name
+        """
         entry_data = {'status': status}
+        if subtask is None:
+            self.task_status = status
+            self._journal('set', 'task_status', status)
+        else:
+            index = self._subtask_position(subtask)
+            if index is None:
+                raise ValueError(f"Unknown subtask: {subtask}")
+            self.subtasks[index]['status'] = status
+            self._journal('patch', 'subtasks', {'index': index, 'changes': {'status': status}})
+            entry_data['subtask'] = subtask
         if details:
             entry_data.update(details)
         self.add_history_entry('status_update', entry_data)
     
-    def add_subtask(self, name: str, data: Optional[Dict[str, Any]] = None) -> None:
-        """Add a subtask to the task state."""
+    def add_subtask(
+        self,
+        name: str,
+        data: Optional[Dict[str, Any]] = None,
+        depends_on: Optional[List[str]] = None,
+        server: Optional[str] = None,
+        tool: Optional[str] = None,
+        arguments: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Add a subtask to the task state.
+        
+        Args:
+            name: Name of the subtask
+            data: Free-form data of the subtask
+            depends_on: Names of the subtasks that must complete before this one runs
+            server: MCP server the subtask's tool is called on
+            tool: MCP tool the subtask maps to
+            arguments: Arguments of the tool call
+        """
         subtask = {
             'name': name,
             'status': 'pending',
             'data': data or {},
             'created_at': datetime.utcnow().isoformat()
         }
+        if depends_on:
+            subtask['depends_on'] = list(depends_on)
+        if tool is not None:
+            subtask.update(server=server, tool=tool, arguments=arguments or {})
         self.subtasks.append(subtask)
-        self.add_history_entry('subtask_added', subtask) 
\ No newline at end of file
+        self._journal('append', 'subtasks', subtask)
+        # A copy, so later status changes do not rewrite the history entry
+        self.add_history_entry('subtask_added', dict(subtask))
+    
+    def get_subtask(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the first subtask with a name, or None."""
+        index = self._subtask_position(name)
+        return None if index is None else self.subtasks[index]
+    
+    def _subtask_position(self, name: str) -> Optional[int]:
+        """Return the position of the first subtask with a name, or None.
+        
+        The name index catches up with subtasks added since the last lookup,
+        so each lookup costs O(1) plus the subtasks added in between.
+        """
+        indexed, count = self._subtasks_indexed
+        if indexed is not self.subtasks or count > len(self.subtasks):
+            self._subtask_index = {}
+            count = 0
+        for index in range(count, len(self.subtasks)):
+            self._subtask_index.setdefault(self.subtasks[index].get('name'), index)
+        self._subtasks_indexed = (self.subtasks, len(self.subtasks))
+        return self._subtask_index.get(name)
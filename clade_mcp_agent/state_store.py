@@ -0,0 +1,170 @@
+"""Append-only persistence for state models."""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from .serialization import state_classes
+from .state import BaseState
+
+# Journal operations: append a value to a list field, set a field, or
+# update the dict at an index of a list field
+APPEND = 'append'
+SET = 'set'
+PATCH = 'patch'
+
+
+class StateStore:
+    """SQLite store that persists states as a snapshot plus a journal of changes.
+
+    Saving a state writes a full snapshot and attaches the store to it. After
+    that, ``add_history_entry``, ``add_message``, ``update_status`` and
+    ``add_subtask`` append only their change to the journal, so a write costs
+    the size of the entry rather than the size of the state. Once a state has
+    ``compact_every`` journal rows they are folded into a new snapshot.
+    Loading reads the snapshot and replays the journal rows after it.
+
+    Changes made without those methods, such as assigning fields directly, are
+    not journaled; call ``save`` to persist them. The database uses WAL mode
+    with ``synchronous=NORMAL``: a commit does not wait for fsync, and a crash
+    can lose only the most recent commits, never the database itself.
+    """
+
+    def __init__(self, db_path: Union[str, Path], compact_every: int = 1000):
+        """Open or create the store.
+
+        Args:
+            db_path: SQLite database file
+            compact_every: Journal rows per state that trigger a new snapshot
+        """
+        self.compact_every = compact_every
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS snapshots ('
+            'state_id TEXT PRIMARY KEY, state_class TEXT NOT NULL, data TEXT NOT NULL, seq INTEGER NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS journal ('
+            'state_id TEXT NOT NULL, seq INTEGER NOT NULL, op TEXT NOT NULL, field TEXT NOT NULL, '
+            'value TEXT NOT NULL, PRIMARY KEY (state_id, seq))'
+        )
+        self._db.commit()
+        self._lock = threading.RLock()
+        # state_id -> [last journal seq, journal rows since the snapshot]
+        self._positions: Dict[str, List[int]] = {}
+
+    def save(self, state: BaseState) -> None:
+        """Write a full snapshot of a state and journal its later changes here.
+
+        Args:
+            state: The state to persist
+        """
+        self.compact(state)
+        state._store = self
+
+    def compact(self, state: BaseState) -> None:
+        """Fold a state's journal into a new snapshot."""
+        with self._lock:
+            seq = self._position(state.state_id)[0]
+            self._write_snapshot(state, seq)
+            self._db.commit()
+
+    def _write_snapshot(self, state: BaseState, seq: int) -> None:
+        self._db.execute(
+            'INSERT OR REPLACE INTO snapshots (state_id, state_class, data, seq) VALUES (?, ?, ?, ?)',
+            (state.state_id, type(state).__name__, state.model_dump_json(), seq)
+        )
+        self._db.execute('DELETE FROM journal WHERE state_id = ? AND seq <= ?', (state.state_id, seq))
+        self._positions[state.state_id] = [seq, 0]
+
+    def _position(self, state_id: str) -> List[int]:
+        position = self._positions.get(state_id)
+        if position is None:
+            seq, pending = self._db.execute(
+                'SELECT COALESCE(MAX(seq), 0), COUNT(*) FROM journal WHERE state_id = ?', (state_id,)
+            ).fetchone()
+            if not pending:
+                row = self._db.execute('SELECT seq FROM snapshots WHERE state_id = ?', (state_id,)).fetchone()
+                seq = row[0] if row else 0
+            position = self._positions[state_id] = [seq, pending]
+        return position
+
+    def record(self, state: BaseState, op: str, field: str, value: Any) -> None:
+        """Append one change of an attached state to the journal.
+
+        Called by the state's own methods; see ``BaseState._journal``.
+
+        Args:
+            state: The changed state
+            op: ``APPEND`` to add ``value`` to a list field, ``SET`` to assign it,
+                ``PATCH`` to update the item at ``value['index']`` with ``value['changes']``
+            field: Name of the changed field
+            value: The appended or assigned value
+        """
+        with self._lock:
+            position = self._position(state.state_id)
+            position[0] += 1
+            position[1] += 1
+            self._db.execute(
+                'INSERT INTO journal (state_id, seq, op, field, value) VALUES (?, ?, ?, ?, ?)',
+                (state.state_id, position[0], op, field, json.dumps(value, default=str))
+            )
+            if position[1] >= self.compact_every:
+                self._write_snapshot(state, position[0])
+            self._db.commit()
+
+    def load(self, state_id: str) -> Optional[BaseState]:
+        """Rebuild a state from its snapshot and journal and attach it to the store.
+
+        Args:
+            state_id: ID of the state
+
+        Returns:
+            The state, or None if it was never saved
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT state_class, data, seq FROM snapshots WHERE state_id = ?', (state_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            state_class, data, seq = row
+            changes = self._db.execute(
+                'SELECT op, field, value FROM journal WHERE state_id = ? AND seq > ? ORDER BY seq',
+                (state_id, seq)
+            ).fetchall()
+        cls = state_classes().get(state_class, BaseState)
+        state = cls.model_validate_json(data)
+        for op, field, value in changes:
+            value = json.loads(value)
+            if op == APPEND:
+                getattr(state, field).append(value)
+            elif op == SET:
+                setattr(state, field, value)
+            elif op == PATCH:
+                getattr(state, field)[value['index']].update(value['changes'])
+            else:
+                raise ValueError(f"Unknown journal operation: {op}")
+        state._store = self
+        return state
+
+    def delete(self, state_id: str) -> None:
+        """Remove a state's snapshot and journal."""
+        with self._lock:
+            self._db.execute('DELETE FROM snapshots WHERE state_id = ?', (state_id,))
+            self._db.execute('DELETE FROM journal WHERE state_id = ?', (state_id,))
+            self._db.commit()
+            self._positions.pop(state_id, None)
+
+    def state_ids(self) -> List[str]:
+        """Return the IDs of all stored states."""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT state_id FROM snapshots ORDER BY state_id')]
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
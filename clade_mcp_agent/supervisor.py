@@ -0,0 +1,325 @@
+"""Supervision of MCP server processes with health checks and reconnects."""
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+import anyio
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+from .config import ServerConfig
+from .mcp_client import MCPClient
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# Errors that mean the stdio transport is gone rather than the call failing
+TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+    EOFError,
+)
+
+def is_transport_error(error: BaseException) -> bool:
+    """Return whether an error means the connection to the server is gone.
+    
+    A request in flight when the server dies fails with an ``McpError``
+    carrying ``CONNECTION_CLOSED``; later requests hit the closed stream.
+    """
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, TRANSPORT_ERRORS)
+
+class ServerUnavailableError(RuntimeError):
+    """Raised when a supervised server is down and calls cannot wait for it."""
+    pass
+
+class CommandError(RuntimeError):
+    """Raised when a server's command tool reports an error."""
+    pass
+
+class ServerSupervisor:
+    """Keeps one MCP server connected, restarting it when it fails.
+    
+    The supervisor pings the server every ``ping_interval`` seconds and
+    treats a failed ping, or a call failing with a transport error, as a
+    crash. It then reconnects with jittered exponential backoff in its own
+    task, so one failing server never blocks others. While the server is
+    restarting, calls wait up to ``restart_wait`` seconds for it to come
+    back, or fail immediately with ``ServerUnavailableError`` when
+    ``restart_wait`` is 0.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        config: ServerConfig,
+        ping_interval: float = 10.0,
+        ping_timeout: float = 5.0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        restart_wait: float = 5.0,
+        start_timeout: Optional[float] = 10.0,
+        client_factory: Callable[[Optional[str]], MCPClient] = MCPClient,
+    ):
+        """Initialize the supervisor.
+        
+        Args:
+            name: Name of the supervised server
+            config: Configuration used to start the server
+            ping_interval: Seconds between health checks
+            ping_timeout: Seconds a ping may take before the server is considered dead
+            backoff_base: Initial reconnect backoff in seconds
+            backoff_max: Maximum reconnect backoff in seconds
+            restart_wait: Seconds a call waits for a restarting server, 0 to fail fast
+            start_timeout: Seconds ``connect`` waits for the first connection,
+                or None to wait indefinitely
+            client_factory: Callable creating a client for a server name
+        """
+        self.name = name
+        self.config = config
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.restart_wait = restart_wait
+        self.start_timeout = start_timeout
+        self.client_factory = client_factory
+        self.client: Optional[MCPClient] = None
+        self.state = "stopped"
+        self.restart_count = 0
+        self.recovery_times: List[float] = []
+        self._ready = asyncio.Event()
+        self._failed = asyncio.Event()
+        self._stopping = False
+        self._runner: Optional[asyncio.Task] = None
+    
+    def _backoff(self, attempt: int) -> float:
+        """Return a jittered exponential backoff delay for an attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    async def start(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        """Start supervising the server.
+        
+        Args:
+            wait: Whether to wait for the first successful connection
+            timeout: Seconds to wait for it, or None to wait indefinitely
+        
+        Raises:
+            ValueError: If the server's paths are invalid; configs loaded
+                with lazy path checks are checked here
+            ServerUnavailableError: If the server is not up within ``timeout``;
+                the supervisor keeps retrying in the background
+        """
+        if self._runner is None or self._runner.done():
+            self.config.check_paths()
+            self._stopping = False
+            self.state = "starting"
+            self._runner = asyncio.create_task(self._run())
+        if wait:
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._ready.wait()
+            except TimeoutError:
+                raise ServerUnavailableError(f"MCP server {self.name} did not start within {timeout}s")
+    
+    async def stop(self) -> None:
+        """Stop supervising and disconnect from the server."""
+        self._stopping = True
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        self.state = "stopped"
+    
+    async def connect(self) -> None:
+        """Start supervising, waiting at most ``start_timeout`` for the server.
+        
+        This lets a supervisor stand in for a client in ``CladeAgent.mcp_clients``:
+        a server that fails to come up is reported as a startup error but
+        keeps being retried in the background.
+        """
+        await self.start(timeout=self.start_timeout)
+    
+    async def disconnect(self) -> None:
+        """Stop supervising and disconnect from the server."""
+        await self.stop()
+    
+    async def _run(self) -> None:
+        """Connect, monitor and reconnect until stopped.
+        
+        The stdio transport must be closed by the task that opened it, so the
+        whole connection lifecycle happens here.
+        """
+        attempt = 0
+        down_since: Optional[float] = None
+        while not self._stopping:
+            client = self.client_factory(self.name)
+            try:
+                await client.connect_to_server(str(self.config.server_path), self.config.env_vars or None)
+            except asyncio.CancelledError:
+                # Stopped mid-connect: close what was opened, such as the subprocess
+                await self._close_client(client)
+                raise
+            except Exception as e:
+                await self._close_client(client)
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.warning("Failed to connect to supervised MCP server",
+                             server=self.name,
+                             attempt=attempt,
+                             retry_in=delay,
+                             error=str(e))
+                await asyncio.sleep(delay)
+                continue
+            
+            if down_since is not None:
+                self.recovery_times.append(time.monotonic() - down_since)
+                logger.info("Supervised MCP server recovered",
+                           server=self.name,
+                           restarts=self.restart_count,
+                           recovery_seconds=self.recovery_times[-1])
+            attempt = 0
+            self.client = client
+            self.state = "running"
+            self._failed.clear()
+            self._ready.set()
+            try:
+                reason = await self._monitor(client)
+            finally:
+                self._ready.clear()
+                self.client = None
+                await self._close_client(client)
+            
+            down_since = time.monotonic()
+            self.restart_count += 1
+            self.state = "restarting"
+            logger.warning("Supervised MCP server failed, restarting",
+                         server=self.name,
+                         reason=reason,
+                         restarts=self.restart_count)
+    
+    async def _monitor(self, client: MCPClient) -> str:
+        """Wait until the server fails a health check or a call reports a crash.
+        
+        Returns:
+            A description of why the server is considered down
+        """
+        while True:
+            try:
+                async with asyncio.timeout(self.ping_interval):
+                    await self._failed.wait()
+                return "transport error"
+            except TimeoutError:
+                pass
+            try:
+                async with asyncio.timeout(self.ping_timeout):
+                    await client.session.send_ping()
+            except Exception as e:
+                return f"ping failed: {type(e).__name__} {e}".strip()
+    
+    async def _close_client(self, client: MCPClient) -> None:
+        """Disconnect a client whose transport may already be dead."""
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logger.debug("Error closing supervised MCP client",
+                        server=self.name,
+                        error=str(e))
+    
+    async def _get_client(self) -> MCPClient:
+        """Return the connected client, waiting for a restart if allowed."""
+        if not self._ready.is_set():
+            if self._runner is None:
+                raise ServerUnavailableError(f"MCP server {self.name} is not started")
+            if self.restart_wait <= 0:
+                raise ServerUnavailableError(f"MCP server {self.name} is {self.state}")
+            try:
+                async with asyncio.timeout(self.restart_wait):
+                    await self._ready.wait()
+            except TimeoutError:
+                raise ServerUnavailableError(
+                    f"MCP server {self.name} did not recover within {self.restart_wait}s"
+                )
+        return self.client
+    
+    async def _call(self, method: str, *args: Any) -> Any:
+        """Run a client method, flagging the server as failed on transport errors."""
+        client = await self._get_client()
+        try:
+            return await getattr(client, method)(*args)
+        except Exception as e:
+            if is_transport_error(e) and self.client is client:
+                # Hold further calls until the runner has reconnected
+                self._ready.clear()
+                self._failed.set()
+            raise
+    
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """Call a tool on the supervised server.
+        
+        Args:
+            tool_name: Name of the tool to call
+            arguments: Tool arguments
+        
+        Returns:
+            The tool's response
+        """
+        return await self._call("call_tool", tool_name, arguments)
+    
+    async def read_resource(self, resource_path: str) -> Any:
+        """Read a resource from the supervised server.
+        
+        Args:
+            resource_path: Path to the resource
+        
+        Returns:
+            The resource data
+        """
+        return await self._call("read_resource", resource_path)
+    
+    async def get_prompt(self, prompt_name: str, arguments: Dict[str, Any]) -> Any:
+        """Get a prompt from the supervised server.
+        
+        Args:
+            prompt_name: Name of the prompt
+            arguments: Prompt arguments
+        
+        Returns:
+            The prompt template
+        """
+        return await self._call("get_prompt", prompt_name, arguments)
+    
+    async def send_command(self, command: str) -> Any:
+        """Send an agent command as a call to the server's command tool.
+        
+        The tool and the argument holding the command are set by the
+        server's ``command_tool`` and ``command_argument`` config.
+        
+        Args:
+            command: The command to send
+        
+        Returns:
+            The tool's response
+        
+        Raises:
+            CommandError: If the tool reports an error
+        """
+        tool = self.config.command_tool
+        result = await self.call_tool(tool, {self.config.command_argument: command})
+        if getattr(result, "isError", False):
+            text = " ".join(getattr(item, "text", "") for item in getattr(result, "content", ()))
+            raise CommandError(f"Tool {tool} on {self.name} reported an error: {text}")
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return restart and recovery metrics for the server."""
+        return {
+            "server": self.name,
+            "state": self.state,
+            "restarts": self.restart_count,
+            "last_recovery_seconds": self.recovery_times[-1] if self.recovery_times else None,
+            "mean_recovery_seconds": (sum(self.recovery_times) / len(self.recovery_times)
+                                      if self.recovery_times else None),
+        }
@@ -0,0 +1,256 @@
+"""Concurrent execution of a task's subtasks as a dependency graph."""
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Set, Tuple
+from .state import TaskState
+from .tracing import span
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class SubtaskError(RuntimeError):
+    """Raised when a subtask's tool call fails or reports an error."""
+    pass
+
+
+def _check_acyclic(dependents: Dict[str, List[str]], waiting: Dict[str, int]) -> None:
+    """Raise ValueError if the dependencies form a cycle, consuming ``waiting``."""
+    # Kahn's algorithm: every subtask is reached only if there is no cycle
+    ready = [name for name, count in waiting.items() if not count]
+    reached = 0
+    while ready:
+        reached += 1
+        for dependent in dependents[ready.pop()]:
+            waiting[dependent] -= 1
+            if not waiting[dependent]:
+                ready.append(dependent)
+    if reached < len(waiting):
+        cycle = sorted(name for name, count in waiting.items() if count)
+        raise ValueError(f"Subtask dependencies form a cycle among: {', '.join(cycle)}")
+
+
+class SubtaskExecutor:
+    """Runs the subtasks of a ``TaskState`` concurrently in dependency order.
+
+    Each subtask may list the subtasks it ``depends_on`` and the ``server``
+    and ``tool`` it maps to (see ``TaskState.add_subtask``). A subtask starts
+    as soon as all of its dependencies have completed, so independent steps
+    overlap instead of running one after another. At most ``max_concurrency``
+    tool calls run at once, and at most ``per_server_concurrency`` on any one
+    server. The limits are shared by every run of the executor.
+
+    Every status change goes through ``TaskState.update_status``, so it is
+    recorded in the task's history and journaled to an attached store.
+    Subtasks go from "pending" to "running" to "completed" or "failed";
+    dependents of a failed subtask are "skipped". Subtasks that were
+    completed by an earlier run are not run again, so a failed task can be
+    resumed by running it again.
+    """
+
+    def __init__(
+        self,
+        clients: Mapping[str, Any],
+        max_concurrency: int = 8,
+        per_server_concurrency: int = 4,
+        timeout: Optional[float] = None,
+    ):
+        """Initialize the executor.
+
+        Args:
+            clients: MCP clients by server name
+            max_concurrency: Maximum tool calls in flight across all servers
+            per_server_concurrency: Maximum tool calls in flight on one server
+            timeout: Seconds a tool call may take, or None to wait indefinitely
+        """
+        if max_concurrency < 1 or per_server_concurrency < 1:
+            raise ValueError("Concurrency limits must be at least 1")
+        self.clients = clients
+        self.max_concurrency = max_concurrency
+        self.per_server_concurrency = per_server_concurrency
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._server_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _plan(self, task: TaskState) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+        """Check a task's subtask graph.
+
+        Returns:
+            The dependents of each subtask, and the number of dependencies it waits for
+
+        Raises:
+            ValueError: If subtask names repeat, a dependency or server is
+                unknown, or the dependencies form a cycle
+        """
+        dependents: Dict[str, List[str]] = {}
+        for subtask in task.subtasks:
+            if subtask["name"] in dependents:
+                raise ValueError(f"Duplicate subtask name: {subtask['name']}")
+            dependents[subtask["name"]] = []
+        waiting = {}
+        for subtask in task.subtasks:
+            name = subtask["name"]
+            depends_on = set(subtask.get("depends_on", ()))
+            for dependency in depends_on:
+                if dependency not in dependents:
+                    raise ValueError(f"Subtask {name} depends on unknown subtask {dependency}")
+                dependents[dependency].append(name)
+            if subtask.get("tool") is not None and subtask.get("server") not in self.clients:
+                raise ValueError(f"Subtask {name} uses unknown server {subtask.get('server')}")
+            waiting[name] = len(depends_on)
+        _check_acyclic(dependents, dict(waiting))
+        return dependents, waiting
+
+    async def run(self, task: TaskState, fail_fast: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Run a task's pending subtasks.
+
+        The task is "running" while its subtasks run, then "completed" if
+        all of them completed and "failed" otherwise.
+
+        Args:
+            task: The task to run
+            fail_fast: Stop at the first failure, cancelling running subtasks
+                and leaving the rest pending
+
+        Returns:
+            An entry per subtask run or skipped by this call, with its
+            ``status`` and the tool's ``result`` or the ``error``
+
+        Raises:
+            ValueError: If the subtask graph is invalid; nothing is run
+        """
+        dependents, waiting = self._plan(task)
+        ready: Deque[str] = deque(name for name, count in waiting.items() if not count)
+        running: Dict[asyncio.Task, str] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+
+        def release(name: str) -> None:
+            for dependent in dependents[name]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    ready.append(dependent)
+
+        task.update_status("running")
+        try:
+            while ready or running:
+                self._start(task, ready, running, release)
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                if not self._collect(task, done, running, results, dependents, release) and fail_fast:
+                    ready.clear()
+                    await self._cancel(running)
+        except asyncio.CancelledError:
+            await self._cancel(running)
+            task.update_status("cancelled")
+            raise
+
+        failed = sorted(name for name, result in results.items() if result["status"] != "completed")
+        if failed:
+            task.update_status("failed", {"failed": failed})
+        else:
+            task.update_status("completed")
+        return results
+
+    def _start(
+        self, task: TaskState, ready: Deque[str], running: Dict[asyncio.Task, str], release: Callable[[str], None]
+    ) -> None:
+        """Start the ready subtasks, passing over those completed by an earlier run."""
+        while ready:
+            name = ready.popleft()
+            subtask = task.get_subtask(name)
+            if subtask["status"] == "completed":
+                release(name)
+            else:
+                running[asyncio.create_task(self._run_subtask(task, subtask))] = name
+
+    def _collect(
+        self,
+        task: TaskState,
+        done: Set[asyncio.Task],
+        running: Dict[asyncio.Task, str],
+        results: Dict[str, Dict[str, Any]],
+        dependents: Dict[str, List[str]],
+        release: Callable[[str], None],
+    ) -> bool:
+        """Record finished subtasks, releasing or skipping their dependents.
+
+        Returns:
+            False if any of them failed
+        """
+        succeeded = True
+        for finished in done:
+            name = running.pop(finished)
+            results[name] = finished.result()
+            if results[name]["status"] == "completed":
+                release(name)
+            else:
+                succeeded = False
+                self._skip_dependents(task, name, dependents, results)
+        return succeeded
+
+    @staticmethod
+    async def _cancel(running: Dict[asyncio.Task, str]) -> None:
+        """Cancel running subtasks and wait for them to record it."""
+        for pending in running:
+            pending.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        running.clear()
+
+    @staticmethod
+    def _skip_dependents(
+        task: TaskState, failed: str, dependents: Dict[str, List[str]], results: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """Mark every subtask that depends, directly or not, on a failed one as skipped."""
+        stack = list(dependents[failed])
+        while stack:
+            name = stack.pop()
+            if name in results:
+                continue
+            results[name] = {"status": "skipped", "error": f"Dependency {failed} did not complete"}
+            task.update_status("skipped", {"dependency": failed}, subtask=name)
+            stack.extend(dependents[name])
+
+    async def _run_subtask(self, task: TaskState, subtask: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one subtask within the concurrency limits and record its outcome."""
+        name = subtask["name"]
+        server = subtask.get("server")
+        if subtask.get("tool") is None:
+            # A subtask without a tool only groups or orders other subtasks
+            task.update_status("completed", subtask=name)
+            return {"status": "completed", "result": None}
+
+        server_slots = self._server_slots.get(server)
+        if server_slots is None:
+            server_slots = self._server_slots[server] = asyncio.Semaphore(self.per_server_concurrency)
+        try:
+            # The server's slot first: a subtask queued behind a busy server
+            # must not hold a global slot that another server could use
+            async with server_slots, self._slots:
+                task.update_status("running", subtask=name)
+                with span("task.subtask", subtask=name, server=server, tool=subtask["tool"]):
+                    result = await self._call(server, subtask)
+        except asyncio.CancelledError:
+            task.update_status("cancelled", subtask=name)
+            raise
+        except Exception as e:
+            error = f"Tool call timed out after {self.timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.warning("Subtask failed",
+                         task=task.task_name,
+                         subtask=name,
+                         server=server,
+                         error=error)
+            task.update_status("failed", {"error": error}, subtask=name)
+            return {"status": "failed", "error": error}
+        task.update_status("completed", subtask=name)
+        return {"status": "completed", "result": result}
+
+    async def _call(self, server: str, subtask: Dict[str, Any]) -> Any:
+        """Call a subtask's tool, raising ``SubtaskError`` if the tool reports an error."""
+        result = await asyncio.wait_for(
+            self.clients[server].call_tool(subtask["tool"], subtask.get("arguments") or {}),
+            self.timeout
+        )
+        if getattr(result, "isError", False):
+            raise SubtaskError(f"Tool {subtask['tool']} on {server} reported an error: {result}")
+        return result
@@ -0,0 +1,258 @@
+"""Request-scoped tracing carried in contextvars."""
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Union
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("clade_current_span", default=None)
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _new_id(num_bytes: int) -> str:
+    return os.urandom(num_bytes).hex()
+
+
+class Span:
+    """One timed hop of a request."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        """ID of the trace the span belongs to."""
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        """Duration in milliseconds, or None while the span is open."""
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Close the span, recording an error if the hop failed."""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+
+class Trace:
+    """All spans recorded for one request."""
+
+    def __init__(self, name: str):
+        """Initialize an empty trace.
+
+        Args:
+            name: Name of the request, also used for the root span
+        """
+        self.trace_id = _new_id(16)
+        self.name = name
+        self.spans: List[Span] = []
+
+    def start_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        """Open a span in this trace."""
+        span = Span(self, name, parent_id, attributes)
+        self.spans.append(span)
+        return span
+
+    @property
+    def root(self) -> Optional[Span]:
+        """The span covering the whole request."""
+        return self.spans[0] if self.spans else None
+
+    def waterfall(self) -> Dict[str, Any]:
+        """Return the spans as a waterfall, ordered by start and offset from the request start."""
+        root = self.root
+        origin = root.start_ns if root else 0
+        depths = {}
+        rows = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            depth = depths.get(span.parent_id, -1) + 1
+            depths[span.span_id] = depth
+            rows.append({
+                "name": span.name,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "depth": depth,
+                "offset_ms": (span.start_ns - origin) / 1e6,
+                "duration_ms": span.duration_ms,
+                "attributes": span.attributes,
+                "error": span.error,
+            })
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_ms": root.duration_ms if root else None,
+            "spans": rows,
+        }
+
+    def to_otlp_spans(self) -> List[Dict[str, Any]]:
+        """Return the spans in the OTLP/JSON span encoding."""
+        spans = []
+        for span in self.spans:
+            otlp = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns if span.end_ns is not None else span.start_ns),
+                "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                "status": ({"code": STATUS_ERROR, "message": span.error} if span.error
+                           else {"code": STATUS_OK}),
+            }
+            if span.parent_id:
+                otlp["parentSpanId"] = span.parent_id
+            spans.append(otlp)
+        return spans
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+class TraceRecorder:
+    """Keeps the most recent completed traces for export."""
+
+    def __init__(self, max_traces: int = 1000):
+        """Initialize the recorder.
+
+        Args:
+            max_traces: Number of completed traces to keep
+        """
+        self.traces: Deque[Trace] = deque(maxlen=max_traces)
+
+    def record(self, trace: Trace) -> None:
+        """Keep a completed trace."""
+        self.traces.append(trace)
+
+    def clear(self) -> None:
+        """Drop all kept traces."""
+        self.traces.clear()
+
+    def to_otlp(self, service_name: str = "clade-mcp-agent") -> Dict[str, Any]:
+        """Return the kept traces as an OTLP/JSON ``ExportTraceServiceRequest``."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "clade_mcp_agent"},
+                    "spans": [span for trace in self.traces for span in trace.to_otlp_spans()],
+                }],
+            }]
+        }
+
+    def export(self, path: Union[str, Path], format: str = "waterfall") -> None:
+        """Write the kept traces to a file.
+
+        Args:
+            path: File to write
+            format: "waterfall" for a JSON list of per-request waterfalls, or
+                "otlp" for OTLP/JSON that collectors can import
+        """
+        if format == "waterfall":
+            data: Any = [trace.waterfall() for trace in self.traces]
+        elif format == "otlp":
+            data = self.to_otlp()
+        else:
+            raise ValueError(f"Unknown trace export format: {format}")
+        Path(path).write_text(json.dumps(data, indent=2, default=str))
+
+
+TRACES = TraceRecorder()
+
+
+def current_span() -> Optional[Span]:
+    """Return the active span, or None outside of a trace."""
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name: str, /, recorder: TraceRecorder = TRACES, **attributes: Any) -> Iterator[Span]:
+    """Trace a request, making its root span current for everything it calls.
+
+    Args:
+        name: Name of the request
+        recorder: Where the completed trace is kept
+        **attributes: Attributes of the root span
+
+    Yields:
+        The root span
+    """
+    trace = Trace(name)
+    root = trace.start_span(name, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.end(e)
+        raise
+    finally:
+        root.end()
+        _current_span.reset(token)
+        recorder.record(trace)
+
+
+def open_span(name: str, /, **attributes: Any) -> Optional[Span]:
+    """Open a child of the current span without making it current.
+
+    For hops that cannot hold the context across their lifetime, such as
+    async generators; the caller must call ``end`` on the span.
+
+    Returns:
+        The span, or None outside of a trace
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return parent.trace.start_span(name, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, /, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record a hop as a child of the current span and make it current.
+
+    Outside of a trace this does nothing and yields None.
+    """
+    child = open_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    finally:
+        child.end()
+        _current_span.reset(token)
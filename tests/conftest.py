@@ -3,6 +3,7 @@ import pytest
 from pathlib import Path
 from typing import AsyncGenerator
 import aiohttp
+from benchmarks.fake_claude import FakeClaudeServer
 
 @pytest.fixture
 def test_data_dir() -> Path:
@@ -48,4 +49,12 @@ def mock_mcp_server(monkeypatch):
         return MockResponse({"status": "success", "response": "test response"})
     
     monkeypatch.setattr("aiohttp.ClientSession.post", mock_post)
-    return mock_post 
+    return mock_post
+
+@pytest.fixture
+async def fake_claude() -> AsyncGenerator[FakeClaudeServer, None]:
+    """Run a fake Claude Messages API on a local port."""
+    server = FakeClaudeServer()
+    await server.start()
+    yield server
+    await server.stop()
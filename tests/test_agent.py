@@ -0,0 +1,317 @@
+"""Tests for the agent's command fan-out."""
+import asyncio
+import json
+import os
+import sys
+import time
+import pytest
+from benchmarks.suite import FAKE_SERVER
+from clade_mcp_agent.agent import COMMAND_PROMPT, CladeAgent
+from clade_mcp_agent.batcher import EnhancementBatcher
+from clade_mcp_agent.config_handler import ConfigHandler
+
+
+class FakeClaude:
+    """Stand-in for ClaudeClient that echoes the prompt back."""
+    
+    max_tokens = 1024
+    
+    async def get_completion(self, prompt, **params):
+        """Return the prompt unchanged."""
+        return prompt
+
+
+class FakeMCPClient:
+    """Stand-in for MCPClient with a configurable delay and failure."""
+    
+    def __init__(self, delay=0.0, error=None, connect_delay=0.0, connect_error=None):
+        self.delay = delay
+        self.error = error
+        self.connect_delay = connect_delay
+        self.connect_error = connect_error
+        self.connected = False
+        self.commands = []
+    
+    async def connect(self):
+        """Connect after the configured delay."""
+        await asyncio.sleep(self.connect_delay)
+        if self.connect_error:
+            raise self.connect_error
+        self.connected = True
+    
+    async def disconnect(self):
+        """Mark the client as disconnected."""
+        self.connected = False
+    
+    async def send_command(self, command):
+        """Record the command and reply after the configured delay."""
+        self.commands.append(command)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"ok:{command}"
+
+
+@pytest.fixture
+def agent():
+    """Create an agent wired to fake Claude and MCP clients."""
+    agent = CladeAgent()
+    agent.claude = FakeClaude()
+    agent.mcp_clients = {}
+    return agent
+
+
+async def test_fan_out_is_concurrent(agent):
+    """Test that all servers are contacted at the same time."""
+    agent.mcp_clients = {f"server{i}": FakeMCPClient(delay=0.2) for i in range(5)}
+    
+    start = time.monotonic()
+    responses = await agent.process_command("ping")
+    elapsed = time.monotonic() - start
+    
+    assert elapsed < 0.6
+    assert [r["server"] for r in responses] == [f"server{i}" for i in range(5)]
+    assert all(r["status"] == "success" for r in responses)
+    assert responses[0]["response"] == "ok:Process this MCP server command: ping"
+
+
+async def test_per_server_timeout(agent):
+    """Test that a slow server is reported as a timeout."""
+    agent.mcp_clients = {
+        "fast": FakeMCPClient(delay=0.01),
+        "slow": FakeMCPClient(delay=5),
+        "broken": FakeMCPClient(error=RuntimeError("boom")),
+    }
+    
+    start = time.monotonic()
+    responses = await agent.process_command("ping", timeout=0.1)
+    elapsed = time.monotonic() - start
+    
+    assert elapsed < 1
+    by_server = {r["server"]: r for r in responses}
+    assert by_server["fast"]["status"] == "success"
+    assert by_server["slow"] == {"server": "slow", "status": "timeout", "timeout": 0.1}
+    assert by_server["broken"]["status"] == "error"
+    assert by_server["broken"]["error"] == "boom"
+
+
+async def test_overall_deadline(agent):
+    """Test that the overall deadline cuts off servers still running."""
+    agent.mcp_clients = {
+        "fast": FakeMCPClient(delay=0.01),
+        "slow": FakeMCPClient(delay=5),
+    }
+    
+    start = time.monotonic()
+    responses = await agent.process_command("ping", timeout=10, deadline=0.1)
+    elapsed = time.monotonic() - start
+    
+    assert elapsed < 1
+    assert responses[0]["status"] == "success"
+    assert responses[1] == {"server": "slow", "status": "timeout", "timeout": 0.1}
+
+
+async def test_single_server_target(agent):
+    """Test that a named server is the only one contacted."""
+    agent.mcp_clients = {"a": FakeMCPClient(), "b": FakeMCPClient()}
+    
+    responses = await agent.process_command("ping", server="b")
+    
+    assert [r["server"] for r in responses] == ["b"]
+    assert agent.mcp_clients["a"].commands == []
+
+
+async def test_start_connects_in_parallel(agent):
+    """Test that servers connect concurrently and report timings."""
+    agent.mcp_clients = {f"server{i}": FakeMCPClient(connect_delay=0.2) for i in range(5)}
+    agent.mcp_clients["bad"] = FakeMCPClient(connect_error=RuntimeError("no binary"))
+    
+    start = time.monotonic()
+    await agent.start()
+    elapsed = time.monotonic() - start
+    
+    assert elapsed < 0.6
+    assert all(c.connected for name, c in agent.mcp_clients.items() if name != "bad")
+    assert agent.startup_timings["server0"]["status"] == "connected"
+    assert agent.startup_timings["server0"]["duration"] >= 0.2
+    assert agent.startup_timings["bad"]["status"] == "error"
+    assert agent.startup_timings["bad"]["error"] == "no binary"
+
+
+async def test_start_concurrency_limit(agent):
+    """Test that the concurrency limit bounds parallel connections."""
+    agent.mcp_clients = {f"server{i}": FakeMCPClient(connect_delay=0.1) for i in range(4)}
+    
+    start = time.monotonic()
+    await agent.start(max_concurrency=2)
+    elapsed = time.monotonic() - start
+    
+    assert 0.2 <= elapsed < 0.4
+
+
+async def test_start_ready_count(agent):
+    """Test that start returns once enough servers are ready."""
+    agent.mcp_clients = {
+        "fast1": FakeMCPClient(connect_delay=0.01),
+        "fast2": FakeMCPClient(connect_delay=0.01),
+        "straggler": FakeMCPClient(connect_delay=0.3),
+    }
+    
+    await agent.start(ready_count=2)
+    assert not agent.mcp_clients["straggler"].connected
+    
+    # Stragglers are skipped by broadcasts until they finish connecting
+    responses = await agent.process_command("ping")
+    assert [r["server"] for r in responses] == ["fast1", "fast2"]
+    
+    timings = await agent.wait_until_started()
+    assert agent.mcp_clients["straggler"].connected
+    assert set(timings) == {"fast1", "fast2", "straggler"}
+
+
+async def test_stop_cancels_pending_startup(agent):
+    """Test that stopping the agent abandons servers still connecting."""
+    agent.mcp_clients = {
+        "fast": FakeMCPClient(),
+        "slow": FakeMCPClient(connect_delay=5),
+    }
+    
+    await agent.start(ready_count=1)
+    await agent.stop()
+    
+    assert agent._startup.done()
+    assert not agent.mcp_clients["slow"].connected
+
+
+async def test_enhancements_are_batched(agent):
+    """Test that concurrent commands share one enhancement request when batching."""
+    class BatchingClaude(FakeClaude):
+        def __init__(self):
+            self.prompts = []
+        
+        async def get_completion(self, prompt, **params):
+            """Echo the batched commands back as a JSON array."""
+            self.prompts.append(prompt)
+            return json.dumps(json.loads(prompt.splitlines()[-1]))
+    
+    claude = BatchingClaude()
+    agent.enhancer = EnhancementBatcher(claude, max_delay=0.01)
+    agent.mcp_clients = {"server": FakeMCPClient()}
+    
+    results = await asyncio.gather(*(agent.process_command(f"cmd{i}") for i in range(3)))
+    
+    assert len(claude.prompts) == 1
+    assert [r[0]["response"] for r in results] == ["ok:cmd0", "ok:cmd1", "ok:cmd2"]
+
+
+def write_servers(path, servers):
+    """Write a config with the given servers and a fresh mtime."""
+    path.write_text(json.dumps({"servers": servers}))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+async def test_watch_config_reconciles_servers(agent, tmp_path):
+    """Test that a config change starts, stops and restarts only the servers it touches."""
+    server_path = tmp_path / "server"
+    server_path.touch(mode=0o755)
+    config_file = tmp_path / "config.json"
+    servers = {name: {"server_path": str(server_path)} for name in ("keep", "change", "drop")}
+    write_servers(config_file, servers)
+    
+    created = []
+    
+    def factory(name, config):
+        client = FakeMCPClient()
+        client.config = config
+        created.append(name)
+        return client
+    
+    agent.server_factory = factory
+    await agent.watch_config(ConfigHandler(), config_file, interval=0.01)
+    assert sorted(created) == ["change", "drop", "keep"]
+    assert all(client.connected for client in agent.mcp_clients.values())
+    keep, drop = agent.mcp_clients["keep"], agent.mcp_clients["drop"]
+    
+    servers["change"]["port"] = 9000
+    del servers["drop"]
+    servers["new"] = {"server_path": str(server_path)}
+    write_servers(config_file, servers)
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if "new" in agent.mcp_clients and agent.mcp_clients["new"].connected:
+            break
+    
+    assert sorted(created) == ["change", "change", "drop", "keep", "new"]
+    assert set(agent.mcp_clients) == {"keep", "change", "new"}
+    assert agent.mcp_clients["keep"] is keep and keep.connected
+    assert agent.mcp_clients["change"].config.port == 9000
+    assert not drop.connected
+    
+    # A broken config leaves the running servers alone
+    write_servers(config_file, {"keep": {"server_path": str(server_path), "port": -1}})
+    await asyncio.sleep(0.05)
+    assert set(agent.mcp_clients) == {"keep", "change", "new"}
+    
+    await agent.stop()
+    assert agent._config_watch is None
+    assert not keep.connected
+
+
+async def test_watch_config_survives_failed_apply(agent, tmp_path):
+    """Test that a change failing to apply keeps the watcher alive and is diffed again later."""
+    server_path = tmp_path / "server"
+    server_path.touch(mode=0o755)
+    config_file = tmp_path / "config.json"
+    servers = {"a": {"server_path": str(server_path)}}
+    write_servers(config_file, servers)
+    broken = {"b"}
+    
+    def factory(name, config):
+        if name in broken:
+            raise ValueError(f"cannot start {name}")
+        return FakeMCPClient()
+    
+    agent.server_factory = factory
+    handler = ConfigHandler()
+    await agent.watch_config(handler, config_file, interval=0.01)
+    
+    servers["b"] = {"server_path": str(server_path)}
+    write_servers(config_file, servers)
+    await asyncio.sleep(0.05)
+    assert not agent._config_watch.done()
+    assert set(handler.server_configs) == {"a"}
+    
+    broken.clear()
+    servers["c"] = {"server_path": str(server_path)}
+    write_servers(config_file, servers)
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if set(handler.server_configs) == {"a", "b", "c"}:
+            break
+    
+    assert set(agent.mcp_clients) == {"a", "b", "c"}
+    assert set(handler.server_configs) == {"a", "b", "c"}
+    await agent.stop()
+
+
+async def test_default_server_factory_runs_commands(agent, tmp_path):
+    """Test that servers started from a config by the default factory answer commands."""
+    env = {"BENCH_PAYLOAD_BYTES": "0", "PATH": os.pathsep.join([os.path.dirname(sys.executable), os.environ["PATH"]])}
+    server = {"server_path": str(FAKE_SERVER), "command_tool": "echo", "command_argument": "text"}
+    config_file = tmp_path / "config.json"
+    write_servers(config_file, {
+        "echo": dict(server, env_vars=env),
+        "failing": dict(server, env_vars=dict(env, BENCH_FAILURE_RATE="1")),
+    })
+    
+    await agent.watch_config(ConfigHandler(), config_file, interval=60)
+    try:
+        responses = {r["server"]: r for r in await agent.process_command("ping")}
+    finally:
+        await agent.stop()
+    
+    assert responses["echo"]["status"] == "success"
+    assert responses["echo"]["response"].content[0].text == COMMAND_PROMPT.format(command="ping")
+    assert responses["failing"]["status"] == "error"
+    assert "Tool echo on failing reported an error" in responses["failing"]["error"]
@@ -0,0 +1,84 @@
+"""Tests for batched tool calls on MCPClient."""
+import asyncio
+import pytest
+from clade_mcp_agent.mcp_client import MCPClient
+
+
+class CountingSession:
+    """Stand-in for ClientSession that tracks how many calls overlap."""
+    
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    async def call_tool(self, tool_name, arguments):
+        """Return the row id after a delay that shrinks with the id."""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001 * (10 - arguments["row"] % 10))
+            if tool_name == "broken":
+                raise RuntimeError(f"bad row {arguments['row']}")
+            return arguments["row"]
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def client():
+    """Create a client with a counting fake session."""
+    client = MCPClient("rows")
+    client.session = CountingSession()
+    return client
+
+
+async def test_batch_results_in_input_order(client):
+    """Test that results come back in the order of the calls."""
+    calls = [("lookup", {"row": i}) for i in range(100)]
+    
+    results = await client.call_tools_batch(calls, window=16)
+    
+    assert [r["response"] for r in results] == list(range(100))
+    assert [r["index"] for r in results] == list(range(100))
+    assert client.session.max_in_flight == 16
+
+
+async def test_batch_captures_errors(client):
+    """Test that a failing call does not fail the rest of the batch."""
+    calls = [("lookup", {"row": 0}), ("broken", {"row": 1}), ("lookup", {"row": 2})]
+    
+    results = await client.call_tools_batch(calls)
+    
+    assert [r["status"] for r in results] == ["success", "error", "success"]
+    assert results[1]["error"] == "bad row 1"
+    assert results[1]["tool"] == "broken"
+
+
+async def test_iter_batch_yields_as_completed(client):
+    """Test that the iterator yields faster calls first."""
+    calls = [("lookup", {"row": i}) for i in range(10)]
+    
+    order = [item["index"] async for item in client.iter_tools_batch(calls, window=10)]
+    
+    assert sorted(order) == list(range(10))
+    assert order[0] == 9
+
+
+async def test_iter_batch_early_exit_cancels_workers(client):
+    """Test that leaving the iterator early stops outstanding calls."""
+    calls = [("lookup", {"row": i}) for i in range(50)]
+    
+    batch = client.iter_tools_batch(calls, window=4)
+    async for _ in batch:
+        break
+    await batch.aclose()
+    await asyncio.sleep(0.02)
+    
+    assert client.session.in_flight == 0
+
+
+async def test_batch_requires_connection():
+    """Test that batching on a disconnected client fails fast."""
+    client = MCPClient()
+    with pytest.raises(RuntimeError):
+        await client.call_tools_batch([("lookup", {})])
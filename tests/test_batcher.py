@@ -0,0 +1,96 @@
+"""Tests for micro-batching of command enhancements."""
+import asyncio
+import json
+import pytest
+from clade_mcp_agent.batcher import EnhancementBatcher, parse_batch_reply
+from clade_mcp_agent.claude_client import ClaudeClient
+
+
+def enhance_reply(body):
+    """Answer single prompts with the command and batched prompts with a JSON array."""
+    prompt = body["messages"][-1]["content"]
+    if prompt.startswith("Process this MCP server command: "):
+        return prompt.rsplit(": ", 1)[1].upper()
+    commands = json.loads(prompt.splitlines()[-1])
+    return "Here you go: " + json.dumps([c.upper() for c in commands])
+
+
+@pytest.fixture
+def claude(fake_claude):
+    """Create a client pointed at the fake Claude server."""
+    fake_claude.reply = enhance_reply
+    return ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0)
+
+
+async def test_concurrent_commands_share_one_request(claude, fake_claude):
+    """Test that commands arriving together are sent as one request and split back."""
+    batcher = EnhancementBatcher(claude, max_batch=16, max_delay=0.01, max_output_tokens=16 * 1024)
+    
+    results = await asyncio.gather(*(batcher.enhance(f"cmd {i}") for i in range(10)))
+    
+    assert results == [f"CMD {i}" for i in range(10)]
+    assert len(fake_claude.requests) == 1
+    assert batcher.batches_sent == 1
+
+
+async def test_batches_are_capped(claude, fake_claude):
+    """Test that a full batch is sent without waiting for the delay."""
+    batcher = EnhancementBatcher(claude, max_batch=4, max_delay=10)
+    
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.enhance(f"c{i}") for i in range(8))), timeout=2
+    )
+    
+    assert results == [f"C{i}" for i in range(8)]
+    assert len(fake_claude.requests) == 2
+
+
+async def test_single_command_uses_plain_prompt(claude, fake_claude):
+    """Test that a lone command is sent with the single-command prompt."""
+    batcher = EnhancementBatcher(claude, max_delay=0.001, temperature=0)
+    
+    assert await batcher.enhance("solo") == "SOLO"
+    assert fake_claude.requests[0]["messages"][0]["content"] == "Process this MCP server command: solo"
+    assert fake_claude.requests[0]["temperature"] == 0
+
+
+async def test_unsplittable_reply_falls_back(claude, fake_claude):
+    """Test that a malformed batched reply is retried one command at a time."""
+    fake_claude.reply = lambda body: ("not json" if "JSON array" in body["messages"][-1]["content"]
+                                      else enhance_reply(body))
+    batcher = EnhancementBatcher(claude, max_delay=0.01)
+    
+    results = await asyncio.gather(batcher.enhance("a"), batcher.enhance("b"))
+    
+    assert results == ["A", "B"]
+    assert len(fake_claude.requests) == 3
+    assert batcher.fallbacks == 1
+
+
+async def test_errors_reach_every_caller(claude, fake_claude):
+    """Test that a failed batch request fails each waiting caller."""
+    fake_claude.errors.append((400, {}))
+    batcher = EnhancementBatcher(claude, max_delay=0.01)
+    
+    results = await asyncio.gather(batcher.enhance("a"), batcher.enhance("b"), return_exceptions=True)
+    
+    assert all(isinstance(r, Exception) for r in results)
+
+
+def test_parse_batch_reply():
+    """Test extracting answers from batched replies."""
+    assert parse_batch_reply('```json\n["x", "y"]\n```', 2) == ["x", "y"]
+    assert parse_batch_reply('["x"]', 2) is None
+    assert parse_batch_reply("no array", 1) is None
+    assert parse_batch_reply('[{"tool": "t"}]', 1) == ['{"tool": "t"}']
+
+
+async def test_batched_requests_scale_max_tokens(fake_claude):
+    """Test that a combined request gets max_tokens per command, within the output cap."""
+    fake_claude.reply = enhance_reply
+    claude = ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0, max_tokens=100)
+    batcher = EnhancementBatcher(claude, max_batch=16, max_delay=0.01, max_output_tokens=500)
+    assert batcher.max_batch == 5
+    
+    await asyncio.gather(*(batcher.enhance(f"c{i}") for i in range(6)))
+    assert sorted(request["max_tokens"] for request in fake_claude.requests) == [100, 500]
@@ -0,0 +1,63 @@
+"""Tests for the benchmark harness."""
+import json
+from benchmarks.harness import compare, load_baseline, measure_memory, percentile, run_sync, summarize, write_report
+
+
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles."""
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize():
+    """Test that latencies are reported in milliseconds with throughput."""
+    summary = summarize([0.001, 0.002, 0.003, 0.004], wall_time=0.5, errors=1)
+    
+    assert summary["p50_ms"] == 2.0
+    assert summary["p99_ms"] == 4.0
+    assert summary["throughput_per_s"] == 8.0
+    assert summary["errors"] == 1
+
+
+def test_run_sync_counts_errors():
+    """Test that raising operations are timed and counted."""
+    calls = iter(range(100))
+    
+    def flaky():
+        if next(calls) % 2:
+            raise ValueError()
+    
+    result = run_sync(flaky, iterations=10, warmup=0)
+    assert result["iterations"] == 10
+    assert result["errors"] == 5
+
+
+def test_compare_flags_regressions(tmp_path):
+    """Test that slower latencies and lower throughput beyond the threshold are flagged."""
+    base = {"a": {"p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "throughput_per_s": 100}}
+    path = tmp_path / "baseline.json"
+    write_report(path, base, {"iterations": 1})
+    assert json.loads(path.read_text())["params"] == {"iterations": 1}
+    
+    current = {"a": {"p50_ms": 11, "p95_ms": 30, "p99_ms": 30, "throughput_per_s": 70},
+               "b": {"p50_ms": 1, "p95_ms": 1, "p99_ms": 1, "throughput_per_s": 1}}
+    rows = {row["metric"]: row for row in compare(current, load_baseline(path), threshold=0.2)}
+    
+    assert not rows["p50_ms"]["regression"]
+    assert rows["p95_ms"]["regression"]
+    assert rows["throughput_per_s"]["regression"]
+    assert all(row["benchmark"] == "a" for row in rows.values())
+
+
+def test_measure_memory_reports_retained_size():
+    """Test that memory held by the built objects is reported and compared."""
+    result = measure_memory(lambda: [bytearray(1024) for _ in range(100)])
+    assert result["retained_kib"] >= 100
+    assert result["peak_kib"] >= result["retained_kib"]
+    
+    rows = compare({"a": {"retained_kib": 200}}, {"a": {"retained_kib": 100}})
+    assert rows == [{"benchmark": "a", "metric": "retained_kib", "baseline": 100,
+                     "current": 200, "change": 1.0, "regression": True}]
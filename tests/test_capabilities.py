@@ -0,0 +1,165 @@
+"""Tests for the capability registry and its use by MCPClient."""
+import os
+from contextlib import asynccontextmanager
+import pytest
+from mcp import types
+from clade_mcp_agent import mcp_client
+from clade_mcp_agent.capabilities import CapabilityRegistry
+from clade_mcp_agent.mcp_client import MCPClient
+
+
+class FakeSession:
+    """Stand-in for ClientSession that counts discovery calls."""
+    
+    instances = []
+    
+    def __init__(self, read, write, message_handler=None):
+        self.message_handler = message_handler
+        self.list_calls = 0
+        FakeSession.instances.append(self)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def initialize(self):
+        """Pretend to run the MCP handshake."""
+    
+    async def list_tools(self):
+        """Return a single tool."""
+        self.list_calls += 1
+        return types.ListToolsResult(tools=[types.Tool(name="search", inputSchema={"type": "object"})])
+    
+    async def list_resources(self):
+        """Return a single resource."""
+        self.list_calls += 1
+        return types.ListResourcesResult(resources=[types.Resource(name="readme", uri="file:///readme")])
+    
+    async def list_prompts(self):
+        """Return no prompts."""
+        self.list_calls += 1
+        return types.ListPromptsResult(prompts=[])
+
+
+@pytest.fixture
+def fake_transport(monkeypatch):
+    """Replace the stdio transport and session with in-process fakes."""
+    @asynccontextmanager
+    async def fake_stdio_client(server_params):
+        yield None, None
+    
+    FakeSession.instances = []
+    monkeypatch.setattr(mcp_client, "stdio_client", fake_stdio_client)
+    monkeypatch.setattr(mcp_client, "ClientSession", FakeSession)
+
+
+@pytest.fixture
+def server_script(tmp_path):
+    """Create a server script to fingerprint."""
+    script = tmp_path / "server.py"
+    script.write_text("print('server')\n")
+    return script
+
+
+def test_fingerprint_tracks_binary_and_env(server_script):
+    """Test that the fingerprint changes with the executable and env."""
+    registry = CapabilityRegistry()
+    key = registry.fingerprint(server_script, {"A": "1"})
+    
+    assert registry.fingerprint(server_script, {"A": "1"}) == key
+    assert registry.fingerprint(server_script, {"A": "2"}) != key
+    
+    server_script.write_text("print('server v2')\n")
+    os.utime(server_script, ns=(0, 12345))
+    assert registry.fingerprint(server_script, {"A": "1"}) != key
+
+
+def test_registry_persistence(server_script, tmp_path):
+    """Test that entries survive a reload from disk."""
+    cache_file = tmp_path / "cache" / "capabilities.json"
+    registry = CapabilityRegistry(cache_file)
+    key = registry.fingerprint(server_script)
+    registry.put(key, "docs", {"tools": [{"name": "search"}], "prompts": []})
+    
+    reloaded = CapabilityRegistry(cache_file)
+    assert reloaded.get(key) == {"tools": [{"name": "search"}], "prompts": []}
+    assert reloaded.lookup("docs")["tools"] == [{"name": "search"}]
+    assert reloaded.find_tool("search") == ["docs"]
+    assert reloaded.find_tool("missing") == []
+    
+    reloaded.invalidate(key, "tools")
+    assert CapabilityRegistry(cache_file).get(key) == {"prompts": []}
+
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    """Test that a corrupt cache file starts an empty registry."""
+    cache_file = tmp_path / "capabilities.json"
+    cache_file.write_text("{not json")
+    
+    registry = CapabilityRegistry(cache_file)
+    assert registry.lookup("anything") == {}
+
+
+async def test_connect_skips_cached_discovery(fake_transport, server_script):
+    """Test that reconnecting reuses cached capabilities."""
+    registry = CapabilityRegistry()
+    
+    client = MCPClient("docs", capability_registry=registry)
+    await client.connect_to_server(str(server_script))
+    assert FakeSession.instances[-1].list_calls == 3
+    assert [t["name"] for t in client.capabilities["tools"]] == ["search"]
+    await client.disconnect()
+    
+    client = MCPClient("docs", capability_registry=registry)
+    await client.connect_to_server(str(server_script))
+    assert FakeSession.instances[-1].list_calls == 0
+    assert registry.find_tool("search") == ["docs"]
+
+
+async def test_list_changed_invalidates(fake_transport, server_script):
+    """Test that a list_changed notification refreshes only that kind."""
+    registry = CapabilityRegistry()
+    client = MCPClient("docs", capability_registry=registry)
+    await client.connect_to_server(str(server_script))
+    session = FakeSession.instances[-1]
+    
+    notification = types.ServerNotification(
+        types.ToolListChangedNotification(method="notifications/tools/list_changed")
+    )
+    await session.message_handler(notification)
+    assert "tools" not in client.capabilities
+    assert "tools" not in registry.lookup("docs")
+    
+    tools = await client.list_capabilities("tools")
+    assert [t["name"] for t in tools] == ["search"]
+    assert session.list_calls == 4
+
+
+async def test_connect_without_registry(fake_transport, server_script):
+    """Test that discovery always runs when no registry is configured."""
+    client = MCPClient()
+    await client.connect_to_server(str(server_script))
+    await client.disconnect()
+    await client.connect_to_server(str(server_script))
+    
+    assert [s.list_calls for s in FakeSession.instances] == [3, 3]
+
+
+async def test_connect_saves_registry_once(fake_transport, server_script, tmp_path):
+    """Test that discovery on connect writes the cache file once, not per kind."""
+    registry = CapabilityRegistry(tmp_path / "capabilities.json")
+    writes = []
+    real_write = registry._write
+    registry._write = lambda entries: writes.append(entries) or real_write(entries)
+    
+    client = MCPClient("docs", capability_registry=registry)
+    await client.connect_to_server(str(server_script))
+    assert len(writes) == 1
+    assert set(writes[0][client._capability_key]) == {"tools", "resources", "prompts", "server"}
+    
+    # Nothing changed, so a cached listing writes nothing
+    await client.list_capabilities("tools")
+    assert len(writes) == 1
+    assert CapabilityRegistry(tmp_path / "capabilities.json").lookup("docs")["tools"][0]["name"] == "search"
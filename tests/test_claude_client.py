@@ -0,0 +1,139 @@
+"""Tests for the async streaming Claude client."""
+import asyncio
+import pytest
+from clade_mcp_agent.claude_client import ClaudeClient
+from clade_mcp_agent.completion_cache import CompletionCache
+from clade_mcp_agent.state import ConversationState
+
+
+@pytest.fixture
+def claude(fake_claude):
+    """Create a client pointed at the fake Claude server."""
+    return ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0)
+
+
+async def test_process_message_streams_deltas(claude, fake_claude):
+    """Test that text deltas arrive one by one."""
+    fake_claude.reply = "the quick brown fox"
+    
+    stream = claude.process_message("hello", {"task": "test"})
+    deltas = [delta async for delta in stream]
+    
+    assert deltas == ["the", " quick", " brown", " fox"]
+    request = fake_claude.requests[0]
+    assert request["stream"] is True
+    assert request["messages"] == [{"role": "user", "content": "hello"}]
+    assert '"task": "test"' in request["system"]
+
+
+async def test_stream_stats(claude, fake_claude):
+    """Test that time-to-first-token and throughput are measured."""
+    fake_claude.reply = "one two three four five"
+    fake_claude.chunk_delay = 0.02
+    
+    stream = claude.process_message("hello")
+    await stream.text()
+    stats = stream.stats
+    
+    assert stats.output_tokens == 5
+    assert stats.input_tokens > 0
+    assert 0 < stats.time_to_first_token < stats.total_time
+    assert stats.tokens_per_second > 0
+    assert stats.as_dict()["model"] == claude.model
+
+
+async def test_get_completion(claude, fake_claude):
+    """Test that get_completion returns the joined reply."""
+    assert await claude.get_completion("echo me", temperature=0) == "echo me"
+    assert fake_claude.requests[0]["temperature"] == 0
+
+
+async def test_streaming_does_not_block_event_loop(claude, fake_claude):
+    """Test that other tasks keep running while a reply streams."""
+    fake_claude.reply = "a b c d e"
+    fake_claude.chunk_delay = 0.02
+    ticks = 0
+    
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+    
+    task = asyncio.create_task(ticker())
+    await claude.get_completion("hi")
+    task.cancel()
+    
+    assert ticks >= 5
+
+
+async def test_cache_serves_repeated_deterministic_requests(fake_claude):
+    """Test that an identical temperature 0 request is answered from the cache."""
+    claude = ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0,
+                          cache=CompletionCache())
+    
+    first = await claude.get_completion("same", {"k": 1}, temperature=0)
+    stream = claude.process_message("same", {"k": 1}, temperature=0)
+    second = await stream.text()
+    
+    assert first == second == "same"
+    assert len(fake_claude.requests) == 1
+    assert stream.stats.cached is True
+    assert claude.cache.stats()["hits"] == 1
+
+
+async def test_cache_skips_nondeterministic_and_different_requests(fake_claude):
+    """Test that sampling requests and changed context are not served from the cache."""
+    claude = ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0,
+                          cache=CompletionCache())
+    
+    await claude.get_completion("same")
+    await claude.get_completion("same")
+    await claude.get_completion("same", {"k": 1}, temperature=0)
+    await claude.get_completion("same", {"k": 2}, temperature=0)
+    
+    assert len(fake_claude.requests) == 4
+
+
+async def test_cache_disk_tier_survives_restart(fake_claude, tmp_path):
+    """Test that completions stored on disk are reused by a new cache."""
+    db_path = tmp_path / "completions.db"
+    cache = CompletionCache(db_path=db_path)
+    claude = ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0, cache=cache)
+    await claude.get_completion("persist", temperature=0)
+    cache.close()
+    
+    claude.cache = CompletionCache(db_path=db_path)
+    assert await claude.get_completion("persist", temperature=0) == "persist"
+    assert len(fake_claude.requests) == 1
+    assert claude.cache.stats()["disk_hits"] == 1
+
+
+async def test_cache_bounds_and_ttl(tmp_path):
+    """Test that the cache evicts least recently used and expired entries."""
+    cache = CompletionCache(max_entries=2, ttl=0.05, db_path=tmp_path / "c.db", max_db_entries=2)
+    for key in ("a", "b", "c"):
+        await cache.put(key, key)
+    
+    assert list(cache._memory) == ["b", "c"]
+    assert cache._db_count == 2
+    await asyncio.sleep(0.06)
+    assert await cache.get("c") is None
+
+
+async def test_process_state_sends_compiled_history(claude, fake_claude):
+    """Test that a state's conversation precedes the new message."""
+    state = ConversationState(current_task="support", relevant_facts=["plan: pro"])
+    state.add_message("user", "hi")
+    state.add_message("assistant", "hello")
+    fake_claude.reply = "ok"
+    
+    assert await claude.process_state(state, "help me").text() == "ok"
+    request = fake_claude.requests[0]
+    assert request["messages"] == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "help me"},
+    ]
+    assert "Current task: support" in request["system"]
+    assert "- plan: pro" in request["system"]
@@ -1,7 +1,7 @@
 """Tests for configuration management."""
 import os
 import pytest
-from clade_mcp_agent.config import ServerConfig, Settings
+from clade_mcp_agent.config import PathChecks, ServerConfig, Settings
 
 @pytest.fixture(autouse=True)
 def setup_test_env(monkeypatch):
@@ -184,3 +184,31 @@ def test_settings_from_env():
     assert settings.claude_api_key == "test_key"
     assert settings.mcp_servers == ["server1:8080", "server2:8080"]
     assert settings.log_level == "DEBUG" 
+
+def test_path_checks_are_shared(temp_server_file, monkeypatch):
+    """Test that configs validated with one PathChecks check each path once."""
+    calls = []
+    real_access = os.access
+    monkeypatch.setattr(os, "access", lambda path, mode: calls.append(path) or real_access(path, mode))
+    
+    context = {"path_checks": PathChecks()}
+    for i in range(5):
+        ServerConfig.model_validate({"host": f"s{i}", "server_path": str(temp_server_file)}, context=context)
+    assert calls == [temp_server_file]
+
+def test_lazy_path_checks(tmp_path, monkeypatch):
+    """Test that lazy validation expands paths but checks them only in check_paths."""
+    monkeypatch.setenv("SERVER_DIR", str(tmp_path))
+    config = ServerConfig.model_validate(
+        {"host": "lazy", "server_path": "${SERVER_DIR}/server"}, context={"lazy_paths": True}
+    )
+    assert config.server_path == tmp_path / "server"
+    with pytest.raises(ValueError, match="Server executable not found"):
+        config.check_paths()
+    
+    (tmp_path / "server").touch(mode=0o755)
+    config.check_paths()
+    
+    # Relative paths are still rejected up front
+    with pytest.raises(ValueError, match="must be absolute"):
+        ServerConfig.model_validate({"host": "lazy", "server_path": "server"}, context={"lazy_paths": True})
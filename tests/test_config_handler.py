@@ -1,5 +1,6 @@
 """Tests for configuration file handling."""
 import json
+import os
 import pytest
 from clade_mcp_agent.config_handler import ConfigHandler, ConfigLoadError
 
@@ -171,3 +172,122 @@ def test_deep_merge(tmp_path):
     assert server1["env_vars"]["BASE_VAR"] == "base"  # From base
     assert server1["env_vars"]["OVERLAY_VAR"] == "overlay"  # From overlay
     assert server1["env_vars"]["SHARED_VAR"] == "overlay_value"  # Overlay wins 
+
+def write_servers(path, servers):
+    """Write a config with the given servers and a fresh mtime."""
+    path.write_text(json.dumps({"servers": servers}))
+    stat = path.stat()
+    # Ensure the change is visible even on filesystems with coarse mtimes
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_parsed_files_are_cached(tmp_path, monkeypatch):
+    """Test that an unchanged file is parsed once and a changed one again."""
+    config_file = tmp_path / "config.json"
+    write_servers(config_file, {})
+    parses = []
+    real_load = json.load
+    monkeypatch.setattr(json, "load", lambda f: parses.append(f.name) or real_load(f))
+    
+    handler = ConfigHandler()
+    handler.load_config(config_file)
+    config = handler.load_config(config_file)
+    config["servers"]["added"] = {}
+    assert handler.load_config(config_file) == {"servers": {}}
+    assert len(parses) == 1
+    
+    write_servers(config_file, {"a": {"server_path": "/bin/sh"}})
+    assert "a" in handler.load_config(config_file)["servers"]
+    assert len(parses) == 2
+
+def test_reload_server_configs_diff(tmp_path):
+    """Test that reloads report added, removed and changed servers per name."""
+    server_path = tmp_path / "server"
+    server_path.touch(mode=0o755)
+    config_file = tmp_path / "config.json"
+    servers = {name: {"server_path": str(server_path)} for name in ("keep", "change", "drop")}
+    write_servers(config_file, servers)
+    
+    handler = ConfigHandler()
+    diff = handler.reload_server_configs(config_file)
+    assert sorted(diff.added) == ["change", "drop", "keep"]
+    assert not diff.removed and not diff.changed
+    assert handler.reload_server_configs(config_file) is None
+    
+    servers["change"]["port"] = 9000
+    del servers["drop"]
+    servers["new"] = {"server_path": str(server_path)}
+    write_servers(config_file, servers)
+    diff = handler.reload_server_configs(config_file)
+    assert list(diff.added) == ["new"]
+    assert list(diff.removed) == ["drop"]
+    assert diff.changed["change"].port == 9000
+    assert set(handler.server_configs) == {"keep", "change", "new"}
+    
+    # Rewriting the same servers is a change of the file but not of any server
+    write_servers(config_file, servers)
+    diff = handler.reload_server_configs(config_file)
+    assert diff is not None and not diff
+
+def test_reload_keeps_configs_on_error(tmp_path):
+    """Test that a broken config raises and leaves the loaded servers in place."""
+    server_path = tmp_path / "server"
+    server_path.touch(mode=0o755)
+    config_file = tmp_path / "config.json"
+    write_servers(config_file, {"a": {"server_path": str(server_path)}})
+    handler = ConfigHandler()
+    handler.reload_server_configs(config_file)
+    
+    write_servers(config_file, {"a": {"server_path": str(server_path), "port": -1}})
+    with pytest.raises(ConfigLoadError):
+        handler.reload_server_configs(config_file)
+    assert list(handler.server_configs) == ["a"]
+    assert handler.server_configs["a"].port == 8080
+
+def test_uncommitted_reload_is_diffed_again(tmp_path):
+    """Test that a reload without commit leaves the baseline until it is committed."""
+    server_path = tmp_path / "server"
+    server_path.touch(mode=0o755)
+    config_file = tmp_path / "config.json"
+    write_servers(config_file, {"a": {"server_path": str(server_path)}})
+    handler = ConfigHandler()
+    
+    assert list(handler.reload_server_configs(config_file, commit=False).added) == ["a"]
+    assert handler.server_configs == {}
+    assert list(handler.reload_server_configs(config_file, commit=False).added) == ["a"]
+    
+    handler.commit_server_configs()
+    assert list(handler.server_configs) == ["a"]
+    assert handler.reload_server_configs(config_file) is None
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_all_invalid_servers_are_reported(tmp_path, workers):
+    """Test that bulk validation reports every invalid server at once, inline or threaded."""
+    server_path = tmp_path / "server"
+    server_path.touch(mode=0o755)
+    config_file = tmp_path / "config.json"
+    servers = {f"s{i}": {"server_path": str(server_path)} for i in range(10)}
+    servers["s3"]["port"] = -1
+    servers["s7"]["server_path"] = str(tmp_path / "missing")
+    write_servers(config_file, servers)
+    
+    handler = ConfigHandler(validation_workers=workers)
+    with pytest.raises(ConfigLoadError) as exc_info:
+        handler.load_server_configs(config_file)
+    assert list(exc_info.value.errors) == ["s3", "s7"]
+    assert "Server executable not found" in exc_info.value.errors["s7"]
+    assert "Invalid config for server s3" in str(exc_info.value)
+    
+    del servers["s3"], servers["s7"]
+    write_servers(config_file, servers)
+    assert list(handler.load_server_configs(config_file)) == list(servers)
+
+def test_lazy_paths_load_missing_servers(tmp_path):
+    """Test that lazy loading accepts servers whose files do not exist yet."""
+    config_file = tmp_path / "config.json"
+    write_servers(config_file, {"later": {"server_path": str(tmp_path / "server")}})
+    
+    configs = ConfigHandler(lazy_paths=True).load_server_configs(config_file)
+    with pytest.raises(ValueError):
+        configs["later"].check_paths()
+    with pytest.raises(ConfigLoadError):
+        ConfigHandler().load_server_configs(config_file)
@@ -0,0 +1,104 @@
+"""Tests for the state-to-context compiler."""
+import pytest
+from clade_mcp_agent.context import MESSAGE_OVERHEAD, ContextCompiler, estimate_tokens
+from clade_mcp_agent.state import BaseState, ConversationState, TaskState
+
+
+def conversation(turns):
+    """Create a conversation of alternating user and assistant messages of 40 characters."""
+    state = ConversationState(current_task="chat", state_id="chat")
+    for i in range(turns):
+        state.add_message("user" if i % 2 == 0 else "assistant", f"{i:040d}")
+    return state
+
+
+def test_estimate_tokens_rounds_up():
+    """Test the four characters per token estimate."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_conversation_fits_budget():
+    """Test that a small conversation is rendered whole."""
+    compiled = ContextCompiler().compile(conversation(3))
+    
+    assert compiled.system == "Current task: chat"
+    assert [m["role"] for m in compiled.messages] == ["user", "assistant", "user"]
+    assert compiled.dropped == 0
+    assert compiled.tokens == estimate_tokens("Current task: chat") + 3 * (10 + MESSAGE_OVERHEAD)
+
+
+def test_truncation_drops_oldest_and_starts_with_user():
+    """Test that the newest messages that fit are kept, starting with a user turn."""
+    state = conversation(10)
+    # System is 5 tokens; room for three 14-token messages
+    compiler = ContextCompiler(budget_tokens=5 + 3 * 14)
+    
+    compiled = compiler.compile(state)
+    # Messages 7, 8, 9 fit, but 7 is an assistant turn
+    assert [m["content"] for m in compiled.messages] == [f"{8:040d}", f"{9:040d}"]
+    assert compiled.dropped == 8
+    assert compiled.tokens <= compiler.budget_tokens
+    assert compiler.compile(state).messages == compiled.messages
+
+
+def test_reserve_tokens_shrink_the_window():
+    """Test that reserved tokens are kept out of the window."""
+    compiler = ContextCompiler(budget_tokens=5 + 4 * 14)
+    assert len(compiler.compile(conversation(10)).messages) == 4
+    assert len(compiler.compile(conversation(10), reserve_tokens=28).messages) == 2
+
+
+def test_only_new_messages_are_rendered():
+    """Test that appending a message renders just that message."""
+    compiler = ContextCompiler()
+    state = conversation(1000)
+    compiler.compile(state)
+    assert compiler.rendered_entries == 1000
+    
+    state.add_message("user", "one more")
+    compiled = compiler.compile(state)
+    assert compiler.rendered_entries == 1001
+    assert compiled.messages[-1] == {"role": "user", "content": "one more"}
+
+
+def test_replaced_history_is_rendered_again():
+    """Test that a state loaded under the same id does not reuse stale renderings."""
+    compiler = ContextCompiler()
+    compiler.compile(conversation(4))
+    other = ConversationState(current_task="chat", state_id="chat")
+    other.add_message("user", "different")
+    
+    assert compiler.compile(other).messages == [{"role": "user", "content": "different"}]
+
+
+def test_other_roles_become_user_turns():
+    """Test that roles outside the messages format are folded into user turns."""
+    state = ConversationState(current_task="chat")
+    state.add_message("system", "be brief")
+    assert ContextCompiler().compile(state).messages == [{"role": "user", "content": "[system] be brief"}]
+
+
+def test_task_state_lists_recent_activity():
+    """Test that a task's fields and latest history entries go into the system prompt."""
+    task = TaskState(task_name="deploy", task_data={"env": "prod"})
+    task.add_subtask("build")
+    task.update_status("running")
+    
+    compiled = ContextCompiler().compile(task)
+    assert compiled.messages == []
+    assert "Task: deploy\nStatus: running" in compiled.system
+    assert "- build: pending" in compiled.system
+    assert "subtask_added" in compiled.system and "status_update" in compiled.system
+    
+    small = ContextCompiler(budget_tokens=estimate_tokens(compiled.system) - 5).compile(task)
+    assert "status_update" in small.system and "subtask_added" not in small.system
+    assert small.dropped == 1
+
+
+def test_over_budget_state_is_rejected():
+    """Test that a state whose own fields do not fit raises."""
+    state = BaseState(metadata={"blob": "x" * 400})
+    with pytest.raises(ValueError, match="over the budget"):
+        ContextCompiler(budget_tokens=50).compile(state)
@@ -0,0 +1,164 @@
+"""Tests for the persistent history log."""
+import copy
+from datetime import datetime
+import pickle
+import pytest
+from clade_mcp_agent.history import CompactHistoryLog, HistoryLog, ns_to_timestamp, timestamp_to_ns
+
+
+def entry(i):
+    """Build a history entry."""
+    return {"type": "step", "data": {"index": i}}
+
+
+def test_fork_shares_prefix():
+    """Test that forks see the entries before the fork and only their own after it."""
+    parent = HistoryLog([entry(0), entry(1)])
+    child = parent.fork()
+    child.append(entry(2))
+    parent.append(entry(99))
+    
+    assert child == [entry(0), entry(1), entry(2)]
+    assert parent == [entry(0), entry(1), entry(99)]
+    assert child.own_entries() == [entry(2)]
+    assert child[0] is parent[0]
+    assert child.depth == 1
+
+
+def test_indexing_and_slicing():
+    """Test list-style access across segments."""
+    log = HistoryLog([entry(0)])
+    for i in range(1, 10):
+        log = log.fork()
+        log.append(entry(i))
+    
+    assert len(log) == 10
+    assert log[3] == entry(3)
+    assert log[-1] == entry(9)
+    assert log[2:5] == [entry(2), entry(3), entry(4)]
+    assert log[::3] == [entry(0), entry(3), entry(6), entry(9)]
+    assert list(reversed(log)) == [entry(i) for i in range(9, -1, -1)]
+    assert entry(5) in log
+    with pytest.raises(IndexError):
+        log[10]
+
+
+def test_fork_without_own_entries_skips_level():
+    """Test that forking an empty fork does not lengthen the chain."""
+    root = HistoryLog([entry(0)])
+    child = root.fork()
+    grandchild = child.fork()
+    
+    assert grandchild.depth == 1
+    assert grandchild == [entry(0)]
+
+
+def test_deep_chain_has_no_recursion():
+    """Test that a chain deeper than the recursion limit can be read, copied and pickled."""
+    log = HistoryLog()
+    for i in range(20000):
+        log.append(entry(i))
+        log = log.fork()
+    
+    assert log.depth == 20000
+    assert log[0] == entry(0)
+    assert sum(1 for _ in log) == 20000
+    
+    flat = copy.deepcopy(log)
+    assert flat == log and flat.depth == 0
+    assert flat[0] is not log[0]
+    assert pickle.loads(pickle.dumps(log)) == log
+
+
+def stamped(i):
+    """Build an entry as add_history_entry does."""
+    return {"type": "step", "data": {"index": i}, "timestamp": f"2024-05-01T12:00:{i % 60:02d}.{i + 1:06d}"}
+
+
+def test_timestamp_conversion_round_trips():
+    """Test that isoformat timestamps convert to nanoseconds and back exactly."""
+    for value in ("2024-05-01T12:00:00.000123", "2024-05-01T12:00:00", "1969-12-31T23:59:59.999999"):
+        assert ns_to_timestamp(timestamp_to_ns(value)) == value
+    assert timestamp_to_ns("2024-05-01T12:00:00.000000") is None
+    assert timestamp_to_ns("2024-05-01T12:00:00+00:00") is None
+    assert timestamp_to_ns("yesterday") is None
+
+
+def test_compact_log_reads_like_plain_log():
+    """Test that compact storage returns the same entries as a plain log."""
+    odd = {"type": "note", "data": {}, "timestamp": "not a time"}
+    extra = {"type": "note", "data": {}, "timestamp": "2024-05-01T12:00:00", "by": "me"}
+    entries = [stamped(i) for i in range(5)] + [odd, extra]
+    log = CompactHistoryLog(entries)
+    
+    assert log == entries
+    assert log[-1] is extra and log[5] is odd
+    assert log[2]["data"] is entries[2]["data"]
+    assert log._raw.keys() == {5, 6}
+    assert list(reversed(log)) == entries[::-1]
+
+
+def test_compact_log_forks_and_mixes_with_plain():
+    """Test that compact logs fork into compact logs and can extend a plain chain."""
+    plain = HistoryLog([stamped(0)])
+    compact = CompactHistoryLog()
+    compact._parent, compact._parent_len = plain, 1
+    compact.append(stamped(1))
+    child = compact.fork()
+    child.append(stamped(2))
+    
+    assert isinstance(child, CompactHistoryLog)
+    assert child == [stamped(0), stamped(1), stamped(2)]
+    assert pickle.loads(pickle.dumps(child)) == child
+
+
+def test_compact_log_stamps_only_raw_entries():
+    """Test that entries missing a timestamp are kept as given and can be stamped."""
+    log = CompactHistoryLog([stamped(0), {"type": "bare", "data": {}}])
+    log.stamp_missing("2024-01-01T00:00:00")
+    assert log[1] == {"type": "bare", "data": {}, "timestamp": "2024-01-01T00:00:00"}
+    assert log[0] == stamped(0)
+
+
+def typed(entry_type, second):
+    """Build an entry of a type stamped at a second past noon."""
+    return {"type": entry_type, "data": {"second": second}, "timestamp": f"2024-05-01T12:00:{second:02d}"}
+
+
+@pytest.mark.parametrize("log_class", [HistoryLog, CompactHistoryLog])
+def test_type_queries_respect_forks(log_class):
+    """Test that type lookups see the parent's entries only up to the fork."""
+    parent = log_class([typed("a", 1), typed("b", 2)])
+    assert parent.latest("a") == typed("a", 1)
+    child = parent.fork()
+    child.append(typed("a", 3))
+    parent.append(typed("a", 4))
+    
+    assert child.by_type("a") == [typed("a", 1), typed("a", 3)]
+    assert parent.by_type("a") == [typed("a", 1), typed("a", 4)]
+    assert child.latest("b") == typed("b", 2)
+    assert child.latest("missing") is None
+    assert child.by_type("missing") == []
+
+
+@pytest.mark.parametrize("log_class", [HistoryLog, CompactHistoryLog])
+def test_time_range_queries(log_class):
+    """Test half-open time ranges across segments and out-of-order timestamps."""
+    log = log_class([typed("a", 10), typed("b", 20)])
+    log = log.fork()
+    log.extend([typed("a", 30), typed("b", 15), typed("a", 40)])
+    
+    assert log.between("2024-05-01T12:00:15", "2024-05-01T12:00:40") == [
+        typed("b", 15), typed("b", 20), typed("a", 30)]
+    assert log.between(end=datetime(2024, 5, 1, 12, 0, 15)) == [typed("a", 10)]
+    assert log.between("2024-05-01T12:00:12+00:00", entry_type="a") == [typed("a", 30), typed("a", 40)]
+    with pytest.raises(ValueError):
+        log.between("soon")
+
+
+def test_index_is_rebuilt_after_stamping():
+    """Test that entries stamped after indexing become visible to time queries."""
+    log = HistoryLog([{"type": "bare", "data": {}}])
+    assert log.between() == []
+    log.stamp_missing("2024-01-01T00:00:00")
+    assert log.between() == [{"type": "bare", "data": {}, "timestamp": "2024-01-01T00:00:00"}]
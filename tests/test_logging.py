@@ -1,7 +1,12 @@
 """Tests for logging configuration and functionality."""
 import json
+import logging
+import threading
+import time
+from pathlib import Path
 import pytest
-from clade_mcp_agent.logging import configure_logging, get_logger
+import clade_mcp_agent.logging as clade_logging
+from clade_mcp_agent.logging import BackgroundLogHandler, configure_logging, dumps_json, get_logger
 
 @pytest.fixture
 def temp_log_file(tmp_path):
@@ -125,3 +130,82 @@ def test_exception_logging(temp_log_file):
     assert log_entry["event"] == "Error occurred"
     assert "ValueError: Test error" in log_entry["exception"]
     assert "test_logging.py" in log_entry["exception"]  # Stack trace 
+
+class BlockingHandler(logging.Handler):
+    """Target handler that holds the writer thread until released."""
+    
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.messages = []
+    
+    def emit(self, record):
+        """Wait for release, then keep the message."""
+        self.release.wait(timeout=5)
+        self.messages.append(record.getMessage())
+
+def test_background_mode_writes_json(temp_log_file):
+    """Test that background mode renders JSON off the calling thread."""
+    handler = configure_logging(log_file=temp_log_file, background=True)
+    logger = get_logger("test")
+    
+    for i in range(5):
+        logger.info("Background message", index=i)
+    handler.flush()
+    
+    entries = [json.loads(line) for line in temp_log_file.read_text().splitlines()]
+    assert [e["index"] for e in entries] == list(range(5))
+    assert entries[0]["event"] == "Background message"
+    assert entries[0]["level"] == "info"
+    assert handler.dropped == 0
+    handler.close()
+
+def test_background_mode_rotates(tmp_path):
+    """Test that batched writes still rotate the log file."""
+    log_file = tmp_path / "rotating.log"
+    handler = configure_logging(log_file=log_file, max_bytes=200, backup_count=3, background=True)
+    logger = get_logger("test")
+    
+    for _ in range(20):
+        logger.info("x" * 50)
+    handler.flush()
+    
+    rotated = list(tmp_path.glob("rotating.log.*"))
+    assert 0 < len(rotated) <= 3
+    for path in [log_file, *rotated]:
+        assert all(json.loads(line)["event"] == "x" * 50 for line in path.read_text().splitlines())
+    handler.close()
+
+@pytest.mark.parametrize("overflow,kept", [("drop_new", ["m0", "m1", "m2"]), ("drop_old", ["m0", "m8", "m9"])])
+def test_overflow_policy(overflow, kept):
+    """Test that a full queue drops records and counts them instead of blocking."""
+    target = BlockingHandler()
+    handler = BackgroundLogHandler([target], queue_size=2, batch_size=1, overflow=overflow)
+    logger = logging.getLogger(f"overflow.{overflow}")
+    logger.propagate = False
+    logger.addHandler(handler)
+    
+    logger.warning("m0")
+    time.sleep(0.05)  # Let the writer take m0 and block on it
+    started = time.perf_counter()
+    for i in range(1, 10):
+        logger.warning(f"m{i}")
+    elapsed = time.perf_counter() - started
+    target.release.set()
+    handler.flush()
+    
+    assert elapsed < 0.1
+    assert handler.dropped == 7
+    assert target.messages == kept
+    logger.removeHandler(handler)
+    handler.close()
+
+def test_invalid_overflow_policy():
+    """Test that an unknown overflow policy is rejected."""
+    with pytest.raises(ValueError):
+        BackgroundLogHandler([], overflow="block")
+
+def test_dumps_json_without_orjson(monkeypatch):
+    """Test that JSON rendering falls back to the standard library."""
+    monkeypatch.setattr(clade_logging, "orjson", None)
+    assert json.loads(dumps_json({"a": 1, 2: Path("/x")})) == {"a": 1, "2": "/x"}
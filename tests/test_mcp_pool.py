@@ -0,0 +1,138 @@
+"""Tests for the MCP session pool."""
+import asyncio
+import pytest
+from clade_mcp_agent.config import ServerConfig
+from clade_mcp_agent.mcp_pool import MCPClientPool
+
+
+class FakeClient:
+    """Stand-in for MCPClient that records calls and tracks its own load."""
+    
+    instances = []
+    
+    def __init__(self, server_name=None):
+        self.server_name = server_name
+        self.connected = False
+        self.calls = []
+        FakeClient.instances.append(self)
+    
+    async def connect_to_server(self, server_script_path, env=None):
+        """Pretend to spawn the server."""
+        self.connected = True
+    
+    async def disconnect(self):
+        """Pretend to stop the server."""
+        self.connected = False
+    
+    async def call_tool(self, tool_name, arguments):
+        """Hold the call open for the requested time."""
+        self.calls.append(tool_name)
+        await asyncio.sleep(arguments.get("delay", 0))
+        return id(self)
+    
+    async def read_resource(self, resource_path):
+        """Return the resource path."""
+        return resource_path
+    
+    async def get_prompt(self, prompt_name, arguments):
+        """Return the prompt name."""
+        return prompt_name
+
+
+@pytest.fixture
+def server_config(tmp_path):
+    """Create a server config pointing at a temporary executable."""
+    server_file = tmp_path / "server.py"
+    server_file.touch(mode=0o755)
+    FakeClient.instances = []
+    return ServerConfig(host="pooled", server_path=server_file)
+
+
+async def test_pool_opens_min_size(server_config):
+    """Test that starting the pool opens min_size sessions."""
+    pool = MCPClientPool(server_config, min_size=2, max_size=4, client_factory=FakeClient)
+    await pool.start()
+    
+    assert pool.size == 2
+    assert all(c.connected and c.server_name == "pooled" for c in FakeClient.instances)
+    
+    await pool.close()
+    assert pool.size == 0
+    assert not any(c.connected for c in FakeClient.instances)
+
+
+async def test_pool_grows_under_load(server_config):
+    """Test that concurrent calls spread across new sessions up to max_size."""
+    pool = MCPClientPool(server_config, min_size=1, max_size=3, client_factory=FakeClient)
+    await pool.start()
+    
+    results = await asyncio.gather(
+        *(pool.call_tool("work", {"delay": 0.05}) for _ in range(6))
+    )
+    
+    assert pool.size == 3
+    assert len(set(results)) == 3
+    assert sorted(len(c.calls) for c in FakeClient.instances) == [2, 2, 2]
+    await pool.close()
+
+
+async def test_pool_prefers_idle_session(server_config):
+    """Test that an idle session is reused before growing the pool."""
+    pool = MCPClientPool(server_config, min_size=1, max_size=3, client_factory=FakeClient)
+    await pool.start()
+    
+    for _ in range(3):
+        await pool.call_tool("work", {})
+    assert await pool.read_resource("res://a") == "res://a"
+    assert await pool.get_prompt("greet", {}) == "greet"
+    
+    assert pool.size == 1
+    await pool.close()
+
+
+async def test_pool_reaps_idle_sessions(server_config):
+    """Test that idle sessions above min_size are closed."""
+    pool = MCPClientPool(
+        server_config, min_size=1, max_size=3, idle_timeout=0.05, client_factory=FakeClient
+    )
+    await pool.start()
+    await asyncio.gather(*(pool.call_tool("work", {"delay": 0.01}) for _ in range(3)))
+    assert pool.size == 3
+    
+    await asyncio.sleep(0.2)
+    
+    assert pool.size == 1
+    assert sum(c.connected for c in FakeClient.instances) == 1
+    await pool.close()
+
+
+def test_pool_rejects_bad_sizes(server_config):
+    """Test validation of pool size bounds."""
+    with pytest.raises(ValueError):
+        MCPClientPool(server_config, min_size=3, max_size=2)
+
+
+async def test_failed_growth_backs_off(server_config):
+    """Test that a session that cannot start is not respawned in a tight loop."""
+    class SingleProcessClient(FakeClient):
+        async def connect_to_server(self, server_script_path, env=None):
+            """Start only the first server process."""
+            if len(FakeClient.instances) > 1:
+                raise OSError("cannot start another process")
+            self.connected = True
+    
+    pool = MCPClientPool(server_config, min_size=1, max_size=3, client_factory=SingleProcessClient,
+                         grow_backoff=10)
+    await pool.start()
+    busy = asyncio.create_task(pool.call_tool("work", {"delay": 0.2}))
+    await asyncio.sleep(0)
+    
+    # Each call tries one new session, then both fall back to the busy one
+    results = await asyncio.gather(pool.call_tool("a", {}), pool.call_tool("b", {}))
+    assert len(FakeClient.instances) == 3
+    assert await pool.call_tool("c", {}) == id(FakeClient.instances[0])
+    await busy
+    assert len(FakeClient.instances) == 3
+    assert set(results) == {id(FakeClient.instances[0])}
+    assert pool.size == 1
+    await pool.close()
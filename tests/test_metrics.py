@@ -0,0 +1,190 @@
+"""Tests for the metrics registry and client instrumentation."""
+import time
+import aiohttp
+import pytest
+from clade_mcp_agent.claude_client import ClaudeClient
+from clade_mcp_agent.mcp_client import MCPClient
+from clade_mcp_agent.metrics import REGISTRY, MetricsRegistry, measure_payloads, start_metrics_server
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    """Start every test with empty metrics."""
+    REGISTRY.reset()
+    yield
+    REGISTRY.reset()
+    measure_payloads(False)
+
+
+class ToolResult:
+    """Minimal stand-in for CallToolResult."""
+    
+    def __init__(self, text, is_error=False):
+        self.text = text
+        self.isError = is_error
+    
+    def model_dump_json(self):
+        """Serialize like a pydantic model."""
+        return f'{{"text": "{self.text}"}}'
+
+
+class FakeSession:
+    """Stand-in for ClientSession with a failing and an erroring tool."""
+    
+    async def call_tool(self, tool_name, arguments):
+        """Answer, fail or report a tool error depending on the tool."""
+        if tool_name == "crash":
+            raise ConnectionError("pipe closed")
+        return ToolResult("hello", is_error=tool_name == "broken")
+    
+    async def read_resource(self, uri):
+        """Return the resource's URI."""
+        return ToolResult(uri)
+
+
+def samples(name):
+    """Return a metric's samples keyed by label values."""
+    return {tuple(s["labels"].values()): s for s in REGISTRY.snapshot()[name]["samples"]}
+
+
+def test_render_prometheus_text():
+    """Test the text exposition of each metric type."""
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs run", ("queue",)).labels('a"b').inc(2)
+    registry.gauge("workers", "Busy workers").labels().set(3)
+    latency = registry.histogram("latency_seconds", "Latency", ("op",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        latency.labels("get").observe(value)
+    
+    text = registry.render()
+    
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{queue="a\\"b"} 2' in text
+    assert "workers 3" in text
+    assert 'latency_seconds_bucket{op="get",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{op="get",le="1"} 2' in text
+    assert 'latency_seconds_bucket{op="get",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{op="get"} 3' in text
+    assert 'latency_seconds_sum{op="get"} 5.55' in text
+
+
+def test_snapshot_quantiles():
+    """Test that histogram snapshots include estimated quantiles."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.01, 0.1, 1))
+    for _ in range(90):
+        latency.labels().observe(0.005)
+    for _ in range(10):
+        latency.labels().observe(0.5)
+    
+    sample = registry.snapshot()["latency_seconds"]["samples"][0]
+    
+    assert sample["count"] == 100
+    assert sample["p50"] <= 0.01
+    assert 0.1 < sample["p99"] <= 1
+
+
+def test_reregistering_must_match():
+    """Test that a metric name can only be registered with one shape."""
+    registry = MetricsRegistry()
+    first = registry.counter("calls_total", "Calls", ("server",))
+    assert registry.counter("calls_total", "Calls", ("server",)) is first
+    with pytest.raises(ValueError):
+        registry.gauge("calls_total", "Calls", ("server",))
+    with pytest.raises(ValueError):
+        first.labels("a", "b")
+
+
+async def test_mcp_client_records_calls():
+    """Test that tool calls update latency, errors, in-flight and byte metrics."""
+    measure_payloads()
+    client = MCPClient("metered")
+    client.session = FakeSession()
+    
+    await client.call_tool("echo", {"text": "hi"})
+    await client.call_tool("broken", {})
+    with pytest.raises(ConnectionError):
+        await client.call_tool("crash", {})
+    
+    latency = samples("mcp_request_duration_seconds")
+    assert latency[("metered", "call_tool", "echo")]["count"] == 1
+    assert latency[("metered", "call_tool", "crash")]["count"] == 1
+    errors = samples("mcp_request_errors_total")
+    assert errors[("metered", "call_tool", "ToolError")]["value"] == 1
+    assert errors[("metered", "call_tool", "ConnectionError")]["value"] == 1
+    assert samples("mcp_requests_in_flight")[("metered", "call_tool")]["value"] == 0
+    assert samples("mcp_sent_bytes_total")[("metered",)]["value"] == len('{"text": "hi"}') + 2
+    assert samples("mcp_received_bytes_total")[("metered",)]["value"] == 2 * len('{"text": "hello"}')
+
+
+async def test_mcp_payloads_are_not_measured_by_default():
+    """Test that results are not serialized again unless payload metrics are on."""
+    client = MCPClient("metered")
+    client.session = FakeSession()
+    
+    await client.call_tool("echo", {"text": "hi"})
+    
+    assert not REGISTRY.snapshot()["mcp_sent_bytes_total"]["samples"]
+    assert not REGISTRY.snapshot()["mcp_received_bytes_total"]["samples"]
+
+
+async def test_resource_reads_are_labelled_by_scheme():
+    """Test that resource URIs do not become metric labels."""
+    client = MCPClient("metered")
+    client.session = FakeSession()
+    
+    await client.read_resource("file:///logs/1.txt")
+    await client.read_resource("file:///logs/2.txt")
+    
+    latency = samples("mcp_request_duration_seconds")
+    assert list(latency) == [("metered", "read_resource", "file")]
+    assert latency[("metered", "read_resource", "file")]["count"] == 2
+
+
+async def test_claude_client_records_requests(fake_claude):
+    """Test that streamed completions update Claude metrics."""
+    claude = ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0)
+    fake_claude.reply = "one two three"
+    
+    await claude.get_completion("hello")
+    fake_claude.errors.append((429, {}))
+    with pytest.raises(Exception):
+        await claude.get_completion("again")
+    
+    model = (claude.model,)
+    assert samples("claude_request_duration_seconds")[model]["count"] == 2
+    assert samples("claude_time_to_first_token_seconds")[model]["count"] == 1
+    assert samples("claude_tokens_total")[(claude.model, "output")]["value"] == 3
+    assert samples("claude_received_bytes_total")[model]["value"] == len("one two three")
+    # Counted by the HTTP transport, for the failed request as well
+    assert samples("claude_sent_bytes_total")[model]["value"] > 2 * len('{"model": "%s"}' % claude.model)
+    assert samples("claude_request_errors_total")[(claude.model, "RateLimitError")]["value"] == 1
+    assert samples("claude_requests_in_flight")[model]["value"] == 0
+
+
+async def test_metrics_endpoint():
+    """Test that /metrics serves the registry over HTTP."""
+    REGISTRY.counter("mcp_request_errors_total", "", ("server", "method", "error")).labels("s", "m", "E").inc()
+    runner = await start_metrics_server(port=0)
+    try:
+        host, port = runner.addresses[0][:2]
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://{host}:{port}/metrics") as response:
+                body = await response.text()
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    finally:
+        await runner.cleanup()
+    
+    assert 'mcp_request_errors_total{server="s",method="m",error="E"} 1' in body
+
+
+def test_observation_overhead():
+    """Test that recording a labelled observation stays in the microsecond range."""
+    histogram = MetricsRegistry().histogram("overhead_seconds", "", ("server", "method", "name"))
+    n = 20000
+    started = time.perf_counter()
+    for _ in range(n):
+        histogram.labels("server", "call_tool", "echo").observe(0.003)
+    per_call = (time.perf_counter() - started) / n
+    
+    assert per_call < 20e-6
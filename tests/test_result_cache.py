@@ -0,0 +1,114 @@
+"""Tests for the MCP result cache."""
+import time
+import pytest
+from mcp import types
+from clade_mcp_agent.mcp_client import MCPClient
+from clade_mcp_agent.result_cache import ResultCache
+
+
+class FakeSession:
+    """Stand-in for ClientSession that counts upstream calls."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def call_tool(self, tool_name, arguments):
+        """Echo the arguments back as text."""
+        self.calls.append(("tool", tool_name))
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text=str(arguments))],
+            isError=tool_name == "fails",
+        )
+    
+    async def read_resource(self, resource_path):
+        """Return the resource path as its content."""
+        self.calls.append(("resource", resource_path))
+        return {"uri": resource_path}
+
+
+@pytest.fixture
+def client():
+    """Create a client with a fake session and a result cache."""
+    client = MCPClient(
+        "docs",
+        result_cache=ResultCache(cacheable_tools=["lookup", "fails"], tool_ttls={"short": 0.01}),
+    )
+    client.session = FakeSession()
+    return client
+
+
+def test_key_is_canonical():
+    """Test that argument order does not change the cache key."""
+    assert (ResultCache.make_key("s", "tool", "t", {"a": 1, "b": [1, 2]})
+            == ResultCache.make_key("s", "tool", "t", {"b": [1, 2], "a": 1}))
+    assert ResultCache.make_key("s", "tool", "t", {"a": 1}) != ResultCache.make_key("s2", "tool", "t", {"a": 1})
+
+
+def test_ttl_expiry():
+    """Test that expired entries are treated as misses."""
+    cache = ResultCache()
+    cache.put("k", {"v": 1}, ttl=0.01)
+    assert cache.get("k") == (True, {"v": 1})
+    
+    time.sleep(0.02)
+    assert cache.get("k") == (False, None)
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_by_size():
+    """Test that the least recently used entries go first when over budget."""
+    cache = ResultCache(max_bytes=25)
+    cache.put("a", "x" * 8, ttl=60)
+    cache.put("b", "y" * 8, ttl=60)
+    cache.get("a")
+    cache.put("c", "z" * 8, ttl=60)
+    
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0]
+    assert cache.get("c")[0]
+    assert cache.stats()["evictions"] == 1
+    assert cache.size_bytes <= 25
+
+
+def test_oversized_value_is_not_cached():
+    """Test that a value larger than the whole budget is skipped."""
+    cache = ResultCache(max_bytes=4)
+    cache.put("a", "x" * 10, ttl=60)
+    assert cache.stats()["entries"] == 0
+
+
+async def test_client_caches_allowed_tools(client):
+    """Test that only allow-listed tools are served from the cache."""
+    first = await client.call_tool("lookup", {"id": 1, "field": "name"})
+    second = await client.call_tool("lookup", {"field": "name", "id": 1})
+    await client.call_tool("write", {"id": 1})
+    await client.call_tool("write", {"id": 1})
+    
+    assert first is second
+    assert client.session.calls == [("tool", "lookup"), ("tool", "write"), ("tool", "write")]
+    assert client.result_cache.stats()["hits"] == 1
+
+
+async def test_client_skips_error_results(client):
+    """Test that tool errors are never cached."""
+    await client.call_tool("fails", {})
+    await client.call_tool("fails", {})
+    assert client.session.calls == [("tool", "fails"), ("tool", "fails")]
+
+
+async def test_client_caches_resources(client):
+    """Test that resource reads are cached."""
+    await client.read_resource("file:///a")
+    await client.read_resource("file:///a")
+    await client.read_resource("file:///b")
+    assert client.session.calls == [("resource", "file:///a"), ("resource", "file:///b")]
+
+
+async def test_client_without_cache():
+    """Test that calls pass straight through without a cache."""
+    client = MCPClient()
+    client.session = FakeSession()
+    await client.read_resource("file:///a")
+    await client.read_resource("file:///a")
+    assert len(client.session.calls) == 2
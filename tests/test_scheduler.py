@@ -0,0 +1,147 @@
+"""Tests for the Claude request scheduler."""
+import asyncio
+import json
+import time
+import anthropic
+import pytest
+from clade_mcp_agent.claude_client import ClaudeClient
+from clade_mcp_agent.context import MESSAGE_OVERHEAD, estimate_tokens
+from clade_mcp_agent.scheduler import BACKGROUND, INTERACTIVE, ClaudeScheduler, TokenBucket
+
+
+@pytest.fixture
+def claude(fake_claude):
+    """Create a client that leaves retries to the scheduler."""
+    return ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0, max_tokens=16)
+
+
+async def test_honors_retry_after(claude, fake_claude):
+    """Test that a 429 pauses all requests for its retry-after and is retried."""
+    scheduler = ClaudeScheduler(claude)
+    fake_claude.errors.append((429, {"retry-after": "0.2"}))
+    
+    started = time.monotonic()
+    results = await asyncio.gather(scheduler.get_completion("first"),
+                                   scheduler.get_completion("second"))
+    
+    assert results == ["first", "second"]
+    assert time.monotonic() - started >= 0.2
+    assert len(fake_claude.requests) == 3
+    assert scheduler.stats()["rate_limited"] == 1
+
+
+async def test_rate_limited_attempts_are_refunded(claude, fake_claude):
+    """Test that tokens charged for a rejected attempt go back to the bucket."""
+    scheduler = ClaudeScheduler(claude, tokens_per_minute=60_000)
+    bucket = scheduler.token_bucket
+    fake_claude.errors.extend([(429, {"retry-after": "0"})] * 2)
+    
+    stream = scheduler.process_message("hello", max_tokens=5000)
+    assert await stream.text() == "hello"
+    
+    # Only the answered attempt's usage is spent, not three 5000-token estimates
+    used = stream.stats.input_tokens + stream.stats.output_tokens
+    assert bucket.tokens >= bucket.capacity - used - 100
+
+
+async def test_scheduled_stream_has_stats(claude, fake_claude):
+    """Test that a scheduled stream reports the stats of the answered request."""
+    scheduler = ClaudeScheduler(claude)
+    fake_claude.reply = "one two three"
+    fake_claude.errors.append((429, {"retry-after": "0"}))
+    
+    stream = scheduler.process_message("hi")
+    deltas = [delta async for delta in stream]
+    
+    assert "".join(deltas) == "one two three"
+    assert stream.stats.output_tokens == 3
+    assert stream.stats.time_to_first_token is not None
+    assert stream.stats.total_time >= stream.stats.time_to_first_token
+
+
+async def test_gives_up_after_max_retries(claude, fake_claude):
+    """Test that a request still rate limited after its retries fails."""
+    scheduler = ClaudeScheduler(claude, max_retries=2)
+    fake_claude.errors.extend([(429, {"retry-after": "0"})] * 3)
+    
+    with pytest.raises(anthropic.RateLimitError):
+        await scheduler.get_completion("never")
+    assert len(fake_claude.requests) == 3
+    assert scheduler.stats()["in_flight"] == 0
+
+
+async def test_request_rate_limit(claude, fake_claude):
+    """Test that requests are spread out to the requests/min quota."""
+    scheduler = ClaudeScheduler(claude, requests_per_minute=600, burst_seconds=0.1)
+    
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.get_completion(f"call {i}") for i in range(5)))
+    
+    # One request fits the burst, the other four wait 0.1s each
+    assert time.monotonic() - started >= 0.35
+
+
+def test_token_estimate_matches_context(claude):
+    """Test that requests are estimated with the context compiler's token counting."""
+    scheduler = ClaudeScheduler(claude)
+    context = {"task": "x" * 10}
+    
+    assert scheduler.estimate_tokens("hello", None, {}) == estimate_tokens("hello") + MESSAGE_OVERHEAD + 16
+    assert scheduler.estimate_tokens("hello", context, {"max_tokens": 2}) == (
+        estimate_tokens("hello") + MESSAGE_OVERHEAD + estimate_tokens(json.dumps(context)) + 2
+    )
+
+
+async def test_token_estimate_corrected_by_usage():
+    """Test that over-estimated tokens are returned to the bucket."""
+    bucket = TokenBucket(per_minute=6000)
+    bucket.take(1000)
+    bucket.adjust(1000 - 10)
+    
+    assert bucket.tokens == pytest.approx(bucket.capacity - 10, abs=1)
+    assert bucket.wait_time(bucket.capacity + 500, time.monotonic()) > 0
+
+
+async def test_max_concurrency(claude, fake_claude):
+    """Test that no more than max_concurrency requests are in flight."""
+    fake_claude.reply = "a b c"
+    fake_claude.chunk_delay = 0.01
+    scheduler = ClaudeScheduler(claude, max_concurrency=2)
+    
+    await asyncio.gather(*(scheduler.get_completion(str(i)) for i in range(6)))
+    
+    assert scheduler.stats()["max_in_flight"] == 2
+
+
+async def test_interactive_before_background(claude, fake_claude):
+    """Test that queued interactive requests are admitted before background ones."""
+    fake_claude.chunk_delay = 0.02
+    scheduler = ClaudeScheduler(claude, max_concurrency=1)
+    
+    first = asyncio.create_task(scheduler.get_completion("busy"))
+    await asyncio.sleep(0.01)
+    background = [asyncio.create_task(scheduler.get_completion(f"bg {i}", priority=BACKGROUND))
+                  for i in range(2)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(scheduler.get_completion("fg", priority=INTERACTIVE))
+    await asyncio.gather(first, interactive, *background)
+    
+    order = [request["messages"][0]["content"] for request in fake_claude.requests]
+    assert order == ["busy", "fg", "bg 0", "bg 1"]
+
+
+async def test_cancelled_waiter_frees_queue(claude, fake_claude):
+    """Test that cancelling a queued request does not leak its slot."""
+    fake_claude.chunk_delay = 0.02
+    scheduler = ClaudeScheduler(claude, max_concurrency=1)
+    
+    first = asyncio.create_task(scheduler.get_completion("busy"))
+    queued = asyncio.create_task(scheduler.get_completion("dropped"))
+    await asyncio.sleep(0.01)
+    queued.cancel()
+    await first
+    
+    assert await scheduler.get_completion("after") == "after"
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.stats()["queued"] == 0
+    assert [r["messages"][0]["content"] for r in fake_claude.requests] == ["busy", "after"]
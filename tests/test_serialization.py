@@ -0,0 +1,76 @@
+"""Tests for state serialization."""
+import json
+from datetime import datetime
+import pytest
+from clade_mcp_agent.serialization import MSGPACK_MAGIC, dump_msgpack, load_msgpack
+from clade_mcp_agent.state import BaseState, ConversationState, TaskState
+
+msgpack = pytest.importorskip("msgpack")
+
+
+@pytest.fixture
+def conversation():
+    """Create a conversation with messages, facts and nested metadata."""
+    state = ConversationState(current_task="chat", relevant_facts=["sky is blue"],
+                              user_preferences={"units": "metric", "limits": [1, 2.5, None]})
+    state.add_message("user", "héllo")
+    state.add_message("assistant", "hi")
+    state.metadata["nested"] = {"a": {"b": [True, False]}}
+    return state
+
+
+@pytest.fixture
+def task():
+    """Create a task with status updates and subtasks."""
+    state = TaskState(task_name="deploy", task_data={"retries": 3})
+    state.update_status("running", {"step": 1})
+    state.add_subtask("build", {"target": "x86"})
+    return state.create_child_state(task_name="deploy-child")
+
+
+@pytest.mark.parametrize("fixture", ["conversation", "task"])
+def test_round_trips_are_exact(fixture, request):
+    """Test that JSON and msgpack both rebuild an identical state."""
+    state = request.getfixturevalue(fixture)
+    cls = type(state)
+    
+    from_json = cls.model_validate_json(state.model_dump_json())
+    from_msgpack = load_msgpack(dump_msgpack(state))
+    
+    assert type(from_msgpack) is cls
+    assert from_json.model_dump() == state.model_dump()
+    assert from_msgpack.model_dump() == state.model_dump()
+
+
+def test_json_falls_back_to_str():
+    """Test that values JSON cannot represent are written as strings."""
+    state = BaseState(metadata={"when": datetime(2024, 1, 2, 3, 4, 5), "path": object})
+    data = json.loads(state.model_dump_json())
+    assert data["metadata"]["when"] == "2024-01-02T03:04:05"
+    assert data["metadata"]["path"] == str(object)
+
+
+def test_msgpack_fields_match_json(conversation):
+    """Test that the packed fields equal the JSON ones, including converted values."""
+    conversation.metadata["when"] = datetime(2024, 1, 2, 3, 4, 5)
+    conversation.metadata["path"] = object
+    child = conversation.create_child_state(current_task="next")
+    child.add_message("user", "more")
+    
+    class_name, fields = msgpack.unpackb(dump_msgpack(child)[6:])
+    
+    assert class_name == "ConversationState"
+    assert fields == json.loads(child.model_dump_json())
+
+
+def test_msgpack_header_is_checked(conversation):
+    """Test that data without the header or with another version is rejected."""
+    data = dump_msgpack(conversation)
+    assert data.startswith(MSGPACK_MAGIC)
+    
+    with pytest.raises(ValueError, match="not a serialized state"):
+        load_msgpack(b"XXXX" + data[4:])
+    with pytest.raises(ValueError, match="version"):
+        load_msgpack(data[:4] + b"\x00\x63" + data[6:])
+    with pytest.raises(ValueError, match="too short"):
+        load_msgpack(b"CL")
@@ -0,0 +1,134 @@
+"""Tests for single-flight coalescing of MCP requests."""
+import asyncio
+import pytest
+from clade_mcp_agent.mcp_client import MCPClient
+from clade_mcp_agent.singleflight import SingleFlight
+
+
+class SlowSession:
+    """Stand-in for ClientSession whose calls take a while to finish."""
+    
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+    
+    async def read_resource(self, resource_path):
+        """Return the resource path after a delay."""
+        self.calls.append(("read_resource", resource_path))
+        await asyncio.sleep(self.delay)
+        return {"uri": resource_path}
+    
+    async def get_prompt(self, prompt_name, arguments):
+        """Return the prompt name and arguments after a delay."""
+        self.calls.append(("get_prompt", prompt_name))
+        await asyncio.sleep(self.delay)
+        return {"prompt": prompt_name, "arguments": arguments}
+
+
+@pytest.fixture
+def client():
+    """Create a client with a slow fake session."""
+    client = MCPClient("docs")
+    client.session = SlowSession()
+    return client
+
+
+async def test_identical_reads_share_one_call(client):
+    """Test that concurrent identical reads hit the server once."""
+    results = await asyncio.gather(*(client.read_resource("file:///a") for _ in range(10)))
+    
+    assert client.session.calls == [("read_resource", "file:///a")]
+    assert all(r is results[0] for r in results)
+
+
+async def test_different_arguments_are_not_shared(client):
+    """Test that prompts with different arguments are fetched separately."""
+    await asyncio.gather(
+        client.get_prompt("greet", {"name": "a", "tone": "warm"}),
+        client.get_prompt("greet", {"tone": "warm", "name": "a"}),
+        client.get_prompt("greet", {"name": "b"}),
+    )
+    assert client.session.calls == [("get_prompt", "greet"), ("get_prompt", "greet")]
+
+
+async def test_sequential_calls_are_not_shared(client):
+    """Test that a finished call is not reused by later callers."""
+    await client.read_resource("file:///a")
+    await client.read_resource("file:///a")
+    assert len(client.session.calls) == 2
+
+
+async def test_cancelled_waiter_does_not_cancel_others():
+    """Test that one waiter giving up leaves the shared call running."""
+    group = SingleFlight()
+    started = []
+    
+    async def call():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+    
+    quitter = asyncio.create_task(group.do("k", call))
+    stayer = asyncio.create_task(group.do("k", call))
+    await asyncio.sleep(0.01)
+    quitter.cancel()
+    
+    assert await stayer == "done"
+    assert quitter.cancelled()
+    assert started == [1]
+    assert len(group) == 0
+
+
+async def test_last_waiter_cancels_shared_call():
+    """Test that the upstream call stops once nobody is waiting."""
+    group = SingleFlight()
+    cancelled = asyncio.Event()
+    
+    async def call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    waiter = asyncio.create_task(group.do("k", call))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert len(group) == 0
+
+
+async def test_errors_reach_every_waiter():
+    """Test that a failed call raises in all waiters."""
+    group = SingleFlight()
+    
+    async def call():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream failed")
+    
+    results = await asyncio.gather(group.do("k", call), group.do("k", call), return_exceptions=True)
+    assert [str(r) for r in results] == ["upstream failed", "upstream failed"]
+
+
+async def test_caller_after_last_cancel_starts_fresh():
+    """Test that a call arriving while the abandoned flight winds down is not cancelled with it."""
+    group = SingleFlight()
+    calls = []
+    
+    async def call():
+        calls.append(1)
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            # Take a while to cancel, as a real request would
+            await asyncio.sleep(0.01)
+            raise
+        return len(calls)
+    
+    waiter = asyncio.create_task(group.do("k", call))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    second = asyncio.create_task(group.do("k", call))
+    assert await second == 2
+    assert not second.cancelled()
@@ -2,6 +2,7 @@
 import pytest
 from datetime import datetime
 import json
+from clade_mcp_agent.history import CompactHistoryLog, HistoryLog
 from clade_mcp_agent.state import BaseState, ConversationState, TaskState
 
 
@@ -10,7 +11,8 @@ def test_base_state_creation():
     state = BaseState()
     assert state.state_type == "base"
     assert state.state_id.startswith("state_")
-    assert isinstance(state.history, list)
+    assert isinstance(state.history, HistoryLog)
+    assert state.history == []
     assert isinstance(state.metadata, dict)
     assert state.parent_state_id is None
 
@@ -145,4 +147,134 @@ def test_complex_state_operations():
     
     # Verify both can be parsed back to JSON
     assert json.loads(task_json)
-    assert json.loads(conv_json) 
\ No newline at end of file
+    assert json.loads(conv_json) 
+
+
+def test_child_states_share_history():
+    """Test that a deep chain of child states shares, rather than copies, its history."""
+    state = ConversationState(current_task="root")
+    state.add_message("user", "hello")
+    for i in range(5000):
+        state = state.create_child_state(current_task=f"step {i}")
+        state.add_history_entry("step", {"index": i})
+    
+    assert len(state.history) == 5001
+    assert len(state.history.own_entries()) == 1
+    assert state.history[0]["type"] == "message"
+    assert state.history[-1]["data"] == {"index": 4999}
+    assert [e["data"]["index"] for e in state.history[1:4]] == [0, 1, 2]
+    
+    data = json.loads(state.model_dump_json())
+    assert len(data["history"]) == 5001
+    restored = ConversationState(**data)
+    assert restored.history == state.history
+    assert restored.history.depth == 0
+
+
+def test_passed_history_is_not_shared():
+    """Test that a state built from another state's history log does not append to it."""
+    first = ConversationState(current_task="a")
+    first.add_message("user", "hello")
+    second = ConversationState(current_task="b", history=first.history)
+    second.add_history_entry("note", {"text": "only b"})
+    first.add_history_entry("note", {"text": "only a"})
+    
+    assert second.history is not first.history
+    assert [e["data"] for e in first.history[1:]] == [{"text": "only a"}]
+    assert [e["data"] for e in second.history[1:]] == [{"text": "only b"}]
+    assert second.history[0] == first.history[0]
+
+
+@pytest.mark.parametrize("log_class", [HistoryLog, CompactHistoryLog])
+def test_passed_history_log_is_stamped(log_class):
+    """Test that entries of a log passed in get timestamps, like entries passed as a list."""
+    from_log = BaseState(history=log_class([{"type": "x", "data": {}}]))
+    from_list = BaseState(history=[{"type": "x", "data": {}}])
+    
+    assert "timestamp" in from_log.history[0]
+    assert "timestamp" in from_list.history[0]
+    
+    # Entries appended to the source later are stamped when it is passed again
+    source = from_log.history
+    source.append({"type": "y", "data": {}})
+    assert "timestamp" in BaseState(history=source).history[1]
+
+
+class CompactConversation(ConversationState):
+    """Conversation state with compact history storage."""
+    
+    compact_history = True
+
+
+def test_compact_history_state_round_trips():
+    """Test that compact history stays compatible with add_history_entry and serialization."""
+    state = CompactConversation(current_task="long")
+    state.add_message("user", "hello")
+    state.add_history_entry("note", {"text": "hi"})
+    child = state.create_child_state(current_task="child")
+    child.add_message("assistant", "bye")
+    
+    assert isinstance(state.history, CompactHistoryLog)
+    assert isinstance(child.history, CompactHistoryLog)
+    assert child.history[1] == state.history[1]
+    assert child.history[-1]["data"]["content"] == "bye"
+    
+    restored = CompactConversation.model_validate_json(child.model_dump_json())
+    assert isinstance(restored.history, CompactHistoryLog)
+    assert restored.model_dump() == child.model_dump()
+    assert ConversationState.model_validate_json(child.model_dump_json()).history == child.history
+
+
+def test_history_queries():
+    """Test indexed history lookups on a state."""
+    task = TaskState(task_name="deploy")
+    task.update_status("running")
+    task.add_subtask("build")
+    task.update_status("done")
+    
+    assert [e["data"]["status"] for e in task.history_by_type("status_update")] == ["running", "done"]
+    assert task.latest_history_entry("status_update")["data"]["status"] == "done"
+    assert task.latest_history_entry("message") is None
+    
+    first = task.history[0]["timestamp"]
+    assert task.history_between(start=first, entry_type="subtask_added")[0]["data"]["name"] == "build"
+    assert len(task.history_between(end=first)) == 0
+
+
+def test_get_subtask():
+    """Test subtask lookup by name, including subtasks added behind the index's back."""
+    task = TaskState(task_name="deploy")
+    task.add_subtask("build", {"target": "x86"})
+    task.add_subtask("build", {"target": "arm"})
+    assert task.get_subtask("build")["data"] == {"target": "x86"}
+    assert task.get_subtask("test") is None
+    
+    task.add_subtask("test")
+    task.subtasks.append({"name": "lint", "status": "pending", "data": {}})
+    assert task.get_subtask("test")["status"] == "pending"
+    assert task.get_subtask("lint") is not None
+    
+    task.subtasks = [{"name": "other", "status": "done", "data": {}}]
+    assert task.get_subtask("build") is None
+    assert task.get_subtask("other")["status"] == "done"
+
+
+def test_subtask_dependencies_and_status():
+    """Test that subtasks record their graph and tool, and take status updates by name."""
+    task = TaskState(task_name="deploy")
+    task.add_subtask("build", server="ci", tool="make", arguments={"target": "all"})
+    task.add_subtask("ship", depends_on=["build"])
+    assert task.get_subtask("build")["tool"] == "make"
+    assert task.get_subtask("ship")["depends_on"] == ["build"]
+    assert "tool" not in task.get_subtask("ship")
+    
+    task.update_status("failed", {"error": "boom"}, subtask="build")
+    assert task.get_subtask("build")["status"] == "failed"
+    assert task.task_status == "pending"
+    assert task.latest_history_entry("status_update")["data"] == {
+        "status": "failed", "subtask": "build", "error": "boom"
+    }
+    # The history entry of the addition keeps the original status
+    assert task.history_by_type("subtask_added")[0]["data"]["status"] == "pending"
+    with pytest.raises(ValueError):
+        task.update_status("running", subtask="missing")
@@ -0,0 +1,94 @@
+"""Tests for the journaled state store."""
+import pytest
+from clade_mcp_agent.state import BaseState, ConversationState, TaskState
+from clade_mcp_agent.state_store import StateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Create a store in a temporary directory."""
+    store = StateStore(tmp_path / "states.db", compact_every=5)
+    yield store
+    store.close()
+
+
+def journal_rows(store, state_id):
+    """Count the journal rows of a state."""
+    return store._db.execute("SELECT COUNT(*) FROM journal WHERE state_id = ?", (state_id,)).fetchone()[0]
+
+
+def test_changes_are_journaled_and_replayed(store):
+    """Test that mutator calls after save append deltas that load replays."""
+    state = TaskState(task_name="deploy")
+    store.save(state)
+    state.update_status("running", {"step": 1})
+    state.add_subtask("build")
+    
+    assert journal_rows(store, state.state_id) == 4
+    loaded = store.load(state.state_id)
+    assert isinstance(loaded, TaskState)
+    assert loaded.task_status == "running"
+    assert loaded.subtasks == state.subtasks
+    assert loaded.history == state.history
+    assert loaded.model_dump() == state.model_dump()
+
+
+def test_compaction_writes_snapshot(store, tmp_path):
+    """Test that the journal is folded into a snapshot every compact_every rows."""
+    state = ConversationState(current_task="chat")
+    store.save(state)
+    for i in range(3):
+        state.add_message("user", f"message {i}")
+    
+    # Two rows per message: the conversation entry and the history entry
+    assert journal_rows(store, state.state_id) == 1
+    
+    reopened = StateStore(tmp_path / "states.db", compact_every=5)
+    loaded = reopened.load(state.state_id)
+    assert loaded.model_dump() == state.model_dump()
+    loaded.add_message("assistant", "reply")
+    assert reopened.load(state.state_id).conversation_history[-1]["content"] == "reply"
+    reopened.close()
+
+
+def test_loaded_state_keeps_journaling(store):
+    """Test that a loaded state is attached to the store."""
+    state = BaseState(state_id="base")
+    store.save(state)
+    loaded = store.load("base")
+    loaded.add_history_entry("note", {"text": "hi"})
+    
+    assert store.load("base").history[-1]["data"] == {"text": "hi"}
+
+
+def test_unsaved_and_deleted_states(store):
+    """Test listing, deleting and loading unknown states."""
+    assert store.load("missing") is None
+    state = BaseState(state_id="gone")
+    store.save(state)
+    state.add_history_entry("note", {})
+    assert store.state_ids() == ["gone"]
+    
+    store.delete("gone")
+    assert store.load("gone") is None
+    assert journal_rows(store, "gone") == 0
+
+
+def test_unattached_state_is_not_journaled(store):
+    """Test that states never saved to a store do not write to it."""
+    state = ConversationState(current_task="local")
+    state.add_message("user", "hi")
+    assert store.state_ids() == []
+
+
+def test_subtask_status_changes_are_replayed(store):
+    """Test that subtask status updates are journaled as patches and replayed."""
+    state = TaskState(task_name="deploy")
+    state.add_subtask("build", server="ci", tool="make", arguments={"target": "all"})
+    store.save(state)
+    state.update_status("running", subtask="build")
+    state.update_status("completed", subtask="build")
+    
+    loaded = store.load(state.state_id)
+    assert loaded.get_subtask("build")["status"] == "completed"
+    assert loaded.model_dump() == state.model_dump()
@@ -0,0 +1,244 @@
+"""Tests for supervised MCP server connections."""
+import asyncio
+import anyio
+import pytest
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, ErrorData
+from clade_mcp_agent.config import ServerConfig
+from clade_mcp_agent.supervisor import ServerSupervisor, ServerUnavailableError
+
+
+class FakeServer:
+    """Shared state of a fake server process that can crash and refuse starts."""
+    
+    def __init__(self, failed_starts=0):
+        self.failed_starts = failed_starts
+        self.alive = False
+        self.starts = 0
+
+
+class FakeSession:
+    """Stand-in for ClientSession that answers pings while the server is alive."""
+    
+    def __init__(self, server):
+        self.server = server
+    
+    async def send_ping(self):
+        """Fail once the server has crashed."""
+        if not self.server.alive:
+            raise anyio.ClosedResourceError()
+
+
+class FakeClient:
+    """Stand-in for MCPClient backed by a FakeServer."""
+    
+    def __init__(self, server):
+        self.server = server
+        self.session = None
+    
+    async def connect_to_server(self, server_script_path, env=None):
+        """Start the fake server unless it is set to refuse."""
+        if self.server.failed_starts > 0:
+            self.server.failed_starts -= 1
+            raise RuntimeError("spawn failed")
+        self.server.alive = True
+        self.server.starts += 1
+        self.session = FakeSession(self.server)
+    
+    async def disconnect(self):
+        """Drop the session."""
+        self.session = None
+    
+    async def call_tool(self, tool_name, arguments):
+        """Answer while alive, fail like a closed pipe after a crash."""
+        if not self.server.alive:
+            raise anyio.ClosedResourceError()
+        return f"{tool_name}:{self.server.starts}"
+
+
+@pytest.fixture
+def server_config(tmp_path):
+    """Create a server config pointing at a temporary executable."""
+    server_file = tmp_path / "server.py"
+    server_file.touch(mode=0o755)
+    return ServerConfig(host="supervised", server_path=server_file)
+
+
+def make_supervisor(server_config, server, **kwargs):
+    """Create a supervisor with short intervals around a fake server."""
+    options = dict(ping_interval=0.02, ping_timeout=0.05, backoff_base=0.01, backoff_max=0.02)
+    options.update(kwargs)
+    return ServerSupervisor("fake", server_config, client_factory=lambda _: FakeClient(server), **options)
+
+
+async def test_retries_initial_connection(server_config):
+    """Test that failed starts are retried with backoff."""
+    server = FakeServer(failed_starts=3)
+    supervisor = make_supervisor(server_config, server)
+    
+    await supervisor.start(timeout=1)
+    
+    assert supervisor.state == "running"
+    assert await supervisor.call_tool("echo", {}) == "echo:1"
+    await supervisor.stop()
+    assert supervisor.state == "stopped"
+
+
+async def test_ping_detects_crash_and_recovers(server_config):
+    """Test that a crash found by health checks triggers a restart."""
+    server = FakeServer()
+    supervisor = make_supervisor(server_config, server)
+    await supervisor.start()
+    
+    server.alive = False
+    await asyncio.sleep(0.1)
+    
+    assert await supervisor.call_tool("echo", {}) == "echo:2"
+    stats = supervisor.stats()
+    assert stats["restarts"] == 1
+    assert stats["state"] == "running"
+    assert stats["last_recovery_seconds"] is not None
+    await supervisor.stop()
+
+
+async def test_transport_error_triggers_fast_restart(server_config):
+    """Test that a call hitting a dead pipe restarts without waiting for a ping."""
+    server = FakeServer()
+    supervisor = make_supervisor(server_config, server, ping_interval=60)
+    await supervisor.start()
+    
+    server.alive = False
+    with pytest.raises(anyio.ClosedResourceError):
+        await supervisor.call_tool("echo", {})
+    
+    # Calls made during the restart wait for the new connection
+    assert await supervisor.call_tool("echo", {}) == "echo:2"
+    assert supervisor.restart_count == 1
+    await supervisor.stop()
+
+
+async def test_fast_fail_during_restart(server_config):
+    """Test that calls fail immediately while restarting when restart_wait is 0."""
+    server = FakeServer()
+    supervisor = make_supervisor(server_config, server, ping_interval=60, restart_wait=0,
+                                 backoff_base=0.2, backoff_max=0.2)
+    await supervisor.start()
+    
+    server.alive = False
+    # Keep the server down: the jittered backoff may be shorter than the sleep below
+    server.failed_starts = 1000
+    with pytest.raises(anyio.ClosedResourceError):
+        await supervisor.call_tool("echo", {})
+    await asyncio.sleep(0.01)
+    
+    with pytest.raises(ServerUnavailableError):
+        await supervisor.call_tool("echo", {})
+    await supervisor.stop()
+
+
+async def test_start_timeout_keeps_retrying(server_config):
+    """Test that a start timeout is reported while retries continue."""
+    server = FakeServer(failed_starts=1000)
+    supervisor = make_supervisor(server_config, server, start_timeout=0.05)
+    
+    with pytest.raises(ServerUnavailableError):
+        await supervisor.connect()
+    assert supervisor.state == "starting"
+    
+    server.failed_starts = 0
+    await supervisor.start(timeout=1)
+    assert supervisor.state == "running"
+    await supervisor.disconnect()
+
+
+async def test_connect_is_bounded_when_calls_fail_fast(server_config):
+    """Test that restart_wait=0 does not make connect wait forever for a dead server."""
+    server = FakeServer(failed_starts=1000)
+    supervisor = make_supervisor(server_config, server, restart_wait=0, start_timeout=0.05)
+    
+    async with asyncio.timeout(1):
+        with pytest.raises(ServerUnavailableError):
+            await supervisor.connect()
+    await supervisor.disconnect()
+
+
+async def test_calls_require_start(server_config):
+    """Test that calls on a supervisor that was never started fail fast."""
+    supervisor = make_supervisor(server_config, FakeServer())
+    with pytest.raises(ServerUnavailableError):
+        await supervisor.call_tool("echo", {})
+
+
+async def test_start_checks_lazily_validated_paths(tmp_path):
+    """Test that a config loaded without path checks is checked when the server starts."""
+    config = ServerConfig.model_validate(
+        {"host": "lazy", "server_path": str(tmp_path / "missing")}, context={"lazy_paths": True}
+    )
+    supervisor = make_supervisor(config, FakeServer())
+    with pytest.raises(ValueError, match="Server executable not found"):
+        await supervisor.start()
+    assert supervisor.state == "stopped"
+
+
+async def test_connection_closed_during_call_triggers_restart(server_config):
+    """Test that a call in flight when the server dies flags the crash, as a real session reports it."""
+    class DyingClient(FakeClient):
+        async def call_tool(self, tool_name, arguments):
+            """Kill the server mid-call the first time."""
+            if tool_name == "exit":
+                self.server.alive = False
+                raise McpError(ErrorData(code=CONNECTION_CLOSED, message="Connection closed"))
+            return await super().call_tool(tool_name, arguments)
+    
+    server = FakeServer()
+    supervisor = ServerSupervisor("fake", server_config, ping_interval=60, backoff_base=0.01,
+                                  client_factory=lambda _: DyingClient(server))
+    await supervisor.start()
+    with pytest.raises(McpError):
+        await supervisor.call_tool("exit", {})
+    # Further calls wait for the restart instead of hitting the dead session
+    assert not supervisor._ready.is_set()
+    assert await supervisor.call_tool("echo", {}) == "echo:2"
+    assert supervisor.restart_count == 1
+    await supervisor.stop()
+
+
+async def test_tool_errors_do_not_restart(server_config):
+    """Test that an McpError other than a closed connection leaves the server up."""
+    class RejectingClient(FakeClient):
+        async def call_tool(self, tool_name, arguments):
+            """Reject every call."""
+            raise McpError(ErrorData(code=-32602, message="Invalid params"))
+    
+    server = FakeServer()
+    supervisor = ServerSupervisor("fake", server_config, ping_interval=60,
+                                  client_factory=lambda _: RejectingClient(server))
+    await supervisor.start()
+    with pytest.raises(McpError):
+        await supervisor.call_tool("echo", {})
+    await asyncio.sleep(0.01)
+    assert supervisor.state == "running"
+    assert supervisor.restart_count == 0
+    await supervisor.stop()
+
+
+async def test_stop_during_connect_closes_client(server_config):
+    """Test that stopping while the server is still starting closes the half-open client."""
+    clients = []
+    
+    class SlowClient(FakeClient):
+        async def connect_to_server(self, server_script_path, env=None):
+            """Spawn the server, then hang in the handshake."""
+            self.session = FakeSession(self.server)
+            await asyncio.sleep(10)
+    
+    def factory(_):
+        clients.append(SlowClient(FakeServer()))
+        return clients[-1]
+    
+    supervisor = ServerSupervisor("fake", server_config, client_factory=factory)
+    await supervisor.start(wait=False)
+    await asyncio.sleep(0.01)
+    await supervisor.stop()
+    assert len(clients) == 1
+    assert clients[0].session is None
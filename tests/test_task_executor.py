@@ -0,0 +1,229 @@
+"""Tests for the concurrent subtask executor."""
+import asyncio
+import time
+import pytest
+from clade_mcp_agent.agent import CladeAgent
+from clade_mcp_agent.state import TaskState
+from clade_mcp_agent.task_executor import SubtaskExecutor
+
+
+class ToolResult:
+    """Minimal stand-in for CallToolResult."""
+
+    def __init__(self, text, is_error=False):
+        self.text = text
+        self.isError = is_error
+
+
+class FakeToolClient:
+    """Stand-in for MCPClient whose tools sleep, tracking how many calls overlap."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def call_tool(self, tool_name, arguments):
+        """Answer after the delay; "crash" raises and "broken" reports a tool error."""
+        self.calls.append(tool_name)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(arguments.get("delay", self.delay))
+        finally:
+            self.active -= 1
+        if tool_name == "crash":
+            raise ConnectionError("pipe closed")
+        return ToolResult(f"{tool_name}:done", is_error=tool_name == "broken")
+
+
+def statuses(task):
+    """Return the status of each subtask by name."""
+    return {subtask["name"]: subtask["status"] for subtask in task.subtasks}
+
+
+async def test_independent_subtasks_overlap():
+    """Test that independent branches run concurrently and dependents wait for them."""
+    client = FakeToolClient(delay=0.1)
+    task = TaskState(task_name="release")
+    task.add_subtask("build", server="a", tool="build")
+    task.add_subtask("docs", server="a", tool="docs")
+    task.add_subtask("lint", server="a", tool="lint")
+    task.add_subtask("ship", server="a", tool="ship", depends_on=["build", "docs", "lint"])
+
+    start = time.perf_counter()
+    results = await SubtaskExecutor({"a": client}).run(task)
+    elapsed = time.perf_counter() - start
+
+    # Two rounds of 0.1s, not four
+    assert elapsed < 0.3
+    assert client.calls[-1] == "ship"
+    assert results["ship"]["result"].text == "ship:done"
+    assert set(statuses(task).values()) == {"completed"}
+    assert task.task_status == "completed"
+    updates = [entry["data"] for entry in task.history_by_type("status_update")]
+    assert updates[0] == {"status": "running"}
+    assert {"status": "running", "subtask": "ship"} in updates
+    assert updates[-1] == {"status": "completed"}
+
+
+async def test_concurrency_limits():
+    """Test the global and per-server limits on calls in flight."""
+    first, second = FakeToolClient(), FakeToolClient()
+    task = TaskState(task_name="fan-out")
+    for i in range(6):
+        task.add_subtask(f"a{i}", server="first", tool="work")
+        task.add_subtask(f"b{i}", server="second", tool="work")
+
+    executor = SubtaskExecutor({"first": first, "second": second}, max_concurrency=3, per_server_concurrency=2)
+    await executor.run(task)
+    assert first.max_active == 2
+    assert second.max_active == 2
+    assert len(first.calls) == len(second.calls) == 6
+
+
+async def test_global_limit():
+    """Test that the global limit holds across servers."""
+    clients = {name: FakeToolClient() for name in "abcd"}
+    task = TaskState(task_name="fan-out")
+    for name in clients:
+        for i in range(3):
+            task.add_subtask(f"{name}{i}", server=name, tool="work")
+
+    active = []
+
+    async def watch():
+        while True:
+            active.append(sum(client.active for client in clients.values()))
+            await asyncio.sleep(0.005)
+
+    watcher = asyncio.create_task(watch())
+    await SubtaskExecutor(clients, max_concurrency=3, per_server_concurrency=2).run(task)
+    watcher.cancel()
+    assert max(active) == 3
+
+
+async def test_busy_server_does_not_delay_others():
+    """Test that subtasks queued on a saturated server leave global slots to other servers."""
+    busy, idle = FakeToolClient(delay=0.1), FakeToolClient(delay=0.1)
+    task = TaskState(task_name="fan-out")
+    for i in range(8):
+        task.add_subtask(f"a{i}", server="busy", tool="work")
+    task.add_subtask("b", server="idle", tool="work")
+    finished = {}
+    
+    async def call_idle(tool_name, arguments):
+        result = await FakeToolClient.call_tool(idle, tool_name, arguments)
+        finished["b"] = time.perf_counter()
+        return result
+    
+    idle.call_tool = call_idle
+    start = time.perf_counter()
+    await SubtaskExecutor({"busy": busy, "idle": idle}, max_concurrency=4, per_server_concurrency=3).run(task)
+    
+    # Only three of the four global slots go to the busy server, so b runs in the first round
+    assert finished["b"] - start < 0.15
+    assert busy.max_active == 3
+
+
+async def test_failure_skips_dependents():
+    """Test that a failing or erroring tool fails its subtask and skips what depends on it."""
+    client = FakeToolClient(delay=0.01)
+    task = TaskState(task_name="release")
+    task.add_subtask("build", server="a", tool="crash")
+    task.add_subtask("test", server="a", tool="test", depends_on=["build"])
+    task.add_subtask("ship", server="a", tool="ship", depends_on=["test"])
+    task.add_subtask("check", server="a", tool="broken")
+    task.add_subtask("docs", server="a", tool="docs")
+
+    results = await SubtaskExecutor({"a": client}).run(task)
+    assert statuses(task) == {
+        "build": "failed", "test": "skipped", "ship": "skipped", "check": "failed", "docs": "completed"
+    }
+    assert results["build"] == {"status": "failed", "error": "pipe closed"}
+    assert "reported an error" in results["check"]["error"]
+    assert "test" not in client.calls
+    assert task.task_status == "failed"
+    assert task.latest_history_entry("status_update")["data"]["failed"] == ["build", "check", "ship", "test"]
+
+
+async def test_rerun_resumes_after_failure():
+    """Test that a second run only runs the subtasks that did not complete."""
+    client = FakeToolClient(delay=0.01)
+    task = TaskState(task_name="release")
+    task.add_subtask("build", server="a", tool="build")
+    task.add_subtask("ship", server="a", tool="crash", depends_on=["build"])
+    executor = SubtaskExecutor({"a": client})
+    await executor.run(task)
+    assert statuses(task) == {"build": "completed", "ship": "failed"}
+
+    task.subtasks[1]["tool"] = "ship"
+    results = await executor.run(task)
+    assert list(results) == ["ship"]
+    assert client.calls == ["build", "crash", "ship"]
+    assert task.task_status == "completed"
+
+
+async def test_fail_fast_cancels_running_subtasks():
+    """Test that fail_fast cancels subtasks in flight and starts no more."""
+    client = FakeToolClient()
+    task = TaskState(task_name="release")
+    task.add_subtask("slow", server="a", tool="slow", arguments={"delay": 1.0})
+    task.add_subtask("crash", server="a", tool="crash", arguments={"delay": 0.01})
+    task.add_subtask("after", server="a", tool="after", depends_on=["slow"])
+
+    start = time.perf_counter()
+    await SubtaskExecutor({"a": client}).run(task, fail_fast=True)
+    assert time.perf_counter() - start < 0.5
+    assert statuses(task) == {"slow": "cancelled", "crash": "failed", "after": "pending"}
+    assert task.task_status == "failed"
+
+
+async def test_timeout_fails_subtask():
+    """Test that a tool call over the timeout fails its subtask."""
+    task = TaskState(task_name="release")
+    task.add_subtask("hang", server="a", tool="hang", arguments={"delay": 1.0})
+    results = await SubtaskExecutor({"a": FakeToolClient()}, timeout=0.05).run(task)
+    assert results["hang"]["status"] == "failed"
+    assert "timed out" in results["hang"]["error"]
+
+
+async def test_subtask_without_tool_orders_others():
+    """Test that a subtask without a tool completes once its dependencies do."""
+    client = FakeToolClient(delay=0.01)
+    task = TaskState(task_name="release")
+    task.add_subtask("build", server="a", tool="build")
+    task.add_subtask("milestone", depends_on=["build"])
+    task.add_subtask("ship", server="a", tool="ship", depends_on=["milestone"])
+    results = await SubtaskExecutor({"a": client}).run(task)
+    assert results["milestone"] == {"status": "completed", "result": None}
+    assert client.calls == ["build", "ship"]
+
+
+@pytest.mark.parametrize("setup, message", [
+    (lambda t: (t.add_subtask("x", depends_on=["y"]),), "unknown subtask"),
+    (lambda t: (t.add_subtask("x", server="nowhere", tool="t"),), "unknown server"),
+    (lambda t: (t.add_subtask("x"), t.add_subtask("x")), "Duplicate"),
+    (lambda t: (t.add_subtask("x", depends_on=["z"]), t.add_subtask("y", depends_on=["x"]),
+                t.add_subtask("z", depends_on=["y"]), t.add_subtask("w")), "cycle among: x, y, z"),
+])
+async def test_invalid_graphs_are_rejected(setup, message):
+    """Test that invalid graphs raise before anything runs."""
+    task = TaskState(task_name="broken")
+    setup(task)
+    with pytest.raises(ValueError, match=message):
+        await SubtaskExecutor({"a": FakeToolClient()}).run(task)
+    assert task.task_status == "pending"
+
+
+async def test_agent_runs_task_on_its_clients():
+    """Test that the agent runs a task through its MCP clients."""
+    agent = CladeAgent()
+    client = FakeToolClient(delay=0.01)
+    agent.mcp_clients = {"a": client}
+    task = TaskState(task_name="release")
+    task.add_subtask("build", server="a", tool="build")
+    results = await agent.run_task(task)
+    assert results["build"]["status"] == "completed"
+    assert client.calls == ["build"]
@@ -0,0 +1,163 @@
+"""Tests for request-scoped tracing."""
+import asyncio
+import json
+import pytest
+from clade_mcp_agent.agent import CladeAgent
+from clade_mcp_agent.claude_client import ClaudeClient
+from clade_mcp_agent.logging import add_context_processor
+from clade_mcp_agent.mcp_client import MCPClient
+from clade_mcp_agent.tracing import TRACES, TraceRecorder, current_span, span, start_trace
+
+
+@pytest.fixture(autouse=True)
+def clean_traces():
+    """Start every test without recorded traces."""
+    TRACES.clear()
+    yield
+    TRACES.clear()
+
+
+class FakeClaude:
+    """Stand-in for ClaudeClient that records a span like the real client."""
+    
+    async def get_completion(self, prompt, **params):
+        """Echo the prompt after a short delay."""
+        with span("claude.messages", model="fake"):
+            await asyncio.sleep(0.01)
+        return prompt
+
+
+class FakeSession:
+    """Stand-in for ClientSession whose tools succeed or fail by name."""
+    
+    async def call_tool(self, tool_name, arguments):
+        """Answer after a delay that depends on the tool."""
+        await asyncio.sleep(arguments.get("delay", 0))
+        if tool_name == "crash":
+            raise ConnectionError("pipe closed")
+        return tool_name
+
+
+class ToolCommandClient:
+    """Agent-facing client that turns commands into MCPClient tool calls."""
+    
+    def __init__(self, name, delay):
+        self.client = MCPClient(name)
+        self.client.session = FakeSession()
+        self.delay = delay
+    
+    async def connect(self):
+        """Nothing to connect."""
+    
+    async def disconnect(self):
+        """Nothing to disconnect."""
+    
+    async def send_command(self, command):
+        """Call the echo tool."""
+        return await self.client.call_tool("echo", {"delay": self.delay})
+
+
+async def test_process_command_waterfall():
+    """Test that a command's hops form one trace with parent links."""
+    agent = CladeAgent()
+    agent.claude = FakeClaude()
+    agent.mcp_clients = {"fast": ToolCommandClient("fast", 0.01), "slow": ToolCommandClient("slow", 0.05)}
+    
+    await agent.process_command("ping")
+    
+    waterfall = TRACES.traces[-1].waterfall()
+    spans = {(row["name"], row["attributes"].get("server")): row for row in waterfall["spans"]}
+    root = spans[("process_command", None)]
+    enhance = spans[("agent.enhance", None)]
+    claude = spans[("claude.messages", None)]
+    slow_send = spans[("agent.send_command", "slow")]
+    slow_call = spans[("mcp.call_tool", "slow")]
+    
+    assert root["depth"] == 0 and root["attributes"]["command"] == "ping"
+    assert claude["parent_id"] == enhance["span_id"]
+    assert slow_send["parent_id"] == root["span_id"]
+    assert slow_call["parent_id"] == slow_send["span_id"] and slow_call["depth"] == 2
+    assert slow_call["attributes"]["tool"] == "echo"
+    assert slow_send["attributes"]["status"] == "success"
+    # Servers are called in parallel after the enhancement
+    assert slow_send["offset_ms"] >= enhance["offset_ms"] + enhance["duration_ms"]
+    assert abs(spans[("agent.send_command", "fast")]["offset_ms"] - slow_send["offset_ms"]) < 10
+    assert slow_call["duration_ms"] >= 50
+    assert waterfall["duration_ms"] >= slow_send["offset_ms"] + slow_send["duration_ms"]
+
+
+async def test_failed_hop_is_marked():
+    """Test that an exception is recorded on the span it escaped from."""
+    client = MCPClient("broken")
+    client.session = FakeSession()
+    
+    with start_trace("request"):
+        with pytest.raises(ConnectionError):
+            await client.call_tool("crash", {})
+    
+    failed = TRACES.traces[-1].spans[1]
+    assert failed.name == "mcp.call_tool"
+    assert failed.error == "ConnectionError: pipe closed"
+    assert failed.attributes == {"server": "broken", "tool": "crash"}
+
+
+async def test_claude_span_does_not_leak_into_consumer(fake_claude):
+    """Test that streaming records a span without changing the consumer's context."""
+    claude = ClaudeClient(api_key="test_key", base_url=fake_claude.url, max_retries=0)
+    fake_claude.reply = "one two three"
+    
+    with start_trace("request") as root:
+        async for _ in claude.process_message("hi"):
+            assert current_span() is root
+    
+    hop = TRACES.traces[-1].spans[1]
+    assert hop.name == "claude.messages"
+    assert hop.parent_id == root.span_id
+    assert hop.attributes["output_tokens"] == 3
+    assert hop.duration_ms > 0
+
+
+async def test_no_trace_records_nothing():
+    """Test that spans outside of a trace are no-ops."""
+    with span("orphan") as hop:
+        assert hop is None
+    assert current_span() is None
+    assert len(TRACES.traces) == 0
+
+
+def test_log_events_carry_trace_context():
+    """Test that log events get the request and server from the trace context."""
+    assert add_context_processor(None, "info", {"event": "idle"}) == {"event": "idle"}
+    
+    with start_trace("request") as root:
+        with span("mcp.call_tool", server="weather"):
+            event = add_context_processor(None, "info", {"event": "calling"})
+        bound = add_context_processor(None, "info", {"event": "bound", "request_id": "explicit"})
+    
+    assert event["request_id"] == root.trace_id
+    assert event["server_id"] == "weather"
+    assert bound["request_id"] == "explicit"
+    assert "server_id" not in bound
+
+
+def test_export_formats(tmp_path):
+    """Test the waterfall and OTLP exports."""
+    recorder = TraceRecorder()
+    with start_trace("request", recorder=recorder, command="ping"):
+        with span("mcp.call_tool", server="s", attempts=2, cached=False):
+            pass
+    
+    recorder.export(tmp_path / "waterfall.json")
+    recorder.export(tmp_path / "trace.otlp.json", format="otlp")
+    
+    waterfall = json.loads((tmp_path / "waterfall.json").read_text())
+    assert [row["name"] for row in waterfall[0]["spans"]] == ["request", "mcp.call_tool"]
+    otlp = json.loads((tmp_path / "trace.otlp.json").read_text())
+    spans = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(spans[0]["traceId"]) == 32 and len(spans[1]["spanId"]) == 16
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+    assert {"key": "attempts", "value": {"intValue": "2"}} in spans[1]["attributes"]
+    assert {"key": "cached", "value": {"boolValue": False}} in spans[1]["attributes"]
+    assert int(spans[1]["endTimeUnixNano"]) >= int(spans[1]["startTimeUnixNano"])
+    with pytest.raises(ValueError):
+        recorder.export(tmp_path / "x", format="zipkin")